@@ -0,0 +1,116 @@
+"""
+Microbenchmark of in-process priority queue implementations.
+Compares heap based PriorityQueue with previous implementation that sorted scores on every pop.
+
+Usage (from repository root):
+    python docs/scripts/priority_queue_benchmark.py [--sizes 10000 100000 1000000] [--pops 100]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from otl_interpreter.utils.priority_queue.priority_queue import PriorityQueue  # noqa: E402
+
+
+class SortedPriorityQueue:
+    """
+    Previous implementation of in-process priority queue, sorts all scores on every pop
+    """
+    def __init__(self):
+        self._score_dict = defaultdict(set)
+        self._elements = dict()
+
+    def __len__(self):
+        return len(self._elements)
+
+    def add(self, score, *elements):
+        score = float(score)
+        elements = [element.encode() if isinstance(element, str) else element for element in elements]
+        self._score_dict[score].update(elements)
+        self._elements.update(
+            {element: score for element in elements}
+        )
+
+    def pop(self, count=1, min_score=False):
+        if count < 1 or len(self._elements) < 1:
+            return []
+
+        sorted_score_list = sorted(self._score_dict.keys(), reverse=not min_score)
+
+        index_in_score_list = 0
+        elements_counter = 0
+        for score in sorted_score_list:
+            elements_counter += len(self._score_dict[score])
+            index_in_score_list += 1
+            if elements_counter >= count:
+                break
+
+        result_elements = list()
+        for index in range(index_in_score_list-1):
+            score = sorted_score_list[index]
+            for element in sorted(self._score_dict[score], reverse=not min_score):
+                result_elements.append((element, score, ))
+            del self._score_dict[score]
+
+        score = sorted_score_list[index_in_score_list-1]
+        for element in sorted(self._score_dict[score], reverse=not min_score):
+            if len(result_elements) == count:
+                break
+            result_elements.append((element, score, ))
+            self._score_dict[score].discard(element)
+            if len(self._score_dict[score]) == 0:
+                del self._score_dict[score]
+
+        for element, score in result_elements:
+            self._elements.pop(element)
+
+        return result_elements
+
+
+def benchmark(queue_class, elements, pops):
+    queue = queue_class()
+
+    start = time.perf_counter()
+    for score, element in elements:
+        queue.add(score, element)
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(pops):
+        queue.pop(min_score=True)
+    pop_time = time.perf_counter() - start
+
+    return add_time, pop_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='In-process priority queue benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--pops', type=int, default=100, help='number of pops for every queue size')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print(f'{"implementation":<22}{"size":>10}{"add, s":>12}{"pop, ms":>12}')
+    for size in args.sizes:
+        # timestamps as scores, like node job queue does
+        now = time.time()
+        elements = [
+            (now + random.random() * size, f'{i:032x}'.encode())
+            for i in range(size)
+        ]
+        for queue_class in (SortedPriorityQueue, PriorityQueue):
+            add_time, pop_time = benchmark(queue_class, elements, args.pops)
+            print(
+                f'{queue_class.__name__:<22}{size:>10}{add_time:>12.3f}{pop_time / args.pops * 1000:>12.4f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,16 @@
 import re
+import json
 import datetime
 import logging
 import hashlib
 
 from uuid import UUID
-from redis import Redis
 from pottery import RedisDict
 
-from core.settings import REDIS_CONNECTION_STRING
+from otl_interpreter.utils.redis_connection import get_redis
 from otl_interpreter.otl_job_manager import otl_job_manager, QueryError
 from otl_interpreter.interpreter_db.enums import ResultStatus
-from otl_interpreter.interpreter_db import otl_job_manager as db_otl_job_manager
+from otl_interpreter.interpreter_db import otl_job_manager as db_otl_job_manager, node_job_manager as db_node_job_manager
 
 log = logging.getLogger('ot_simple_rest_job_proxy')
 
@@ -29,13 +29,13 @@ new_status_to_old_status = {
 
 class JobProxyManager:
     def __init__(self):
-        redis = Redis.from_url(REDIS_CONNECTION_STRING)
+        self.redis = get_redis()
 
         # dictionary where key - hash of otl and tws, twf (otl_query_dict_key), value - query dictionary
-        self.new_platform_queries = RedisDict(redis=redis, key='job_proxy_manager_queries')
+        self.new_platform_queries = RedisDict(redis=self.redis, key='job_proxy_manager_queries')
 
         # mapping jobid hex string to otl_query_dict_key
-        self.new_platform_queries_job_id = RedisDict(redis=redis, key='job_proxy_manager_queries_id')
+        self.new_platform_queries_job_id = RedisDict(redis=self.redis, key='job_proxy_manager_queries_id')
 
     def makejob(self, otl_query, user_guid: UUID, tws: str, twf: str, cache_ttl: str, timeout: str):
         """
@@ -49,15 +49,18 @@ class JobProxyManager:
         timeout = int(timeout)
 
         cache_ttl = int(cache_ttl)
-        if otl_query_dict_key in self.new_platform_queries and\
-                self.new_platform_queries[otl_query_dict_key]['status'] != 'failed':
-            query = self.new_platform_queries[otl_query_dict_key]
-            # get result object from database
-            end_node_job_result = db_otl_job_manager.get_result(UUID(query['job_id']))
+        query = self.new_platform_queries.get(otl_query_dict_key)
+        if query is not None and query['status'] != 'failed':
+            # result status is read from result registry, database is queried only if registry doesn't know it
+            if 'storage_type' in query and 'path' in query:
+                end_node_job_result_status = db_node_job_manager.get_result_status(query['storage_type'], query['path'])
+            else:
+                end_node_job_result = db_otl_job_manager.get_result(UUID(query['job_id']))
+                end_node_job_result_status = end_node_job_result.status if end_node_job_result else None
 
             # if result already exists and calculating or already calculated return success status
             # because check query will be return result of previous task
-            if end_node_job_result and end_node_job_result.status in (ResultStatus.CALCULATING, ResultStatus.CALCULATED):
+            if end_node_job_result_status in (ResultStatus.CALCULATING, ResultStatus.CALCULATED):
                 log.info(f'Otl query  {otl_query} already calculating or calculated')
                 return {'status': 'success', 'timestamp': datetime.datetime.now().isoformat()}
 
@@ -65,15 +68,17 @@ class JobProxyManager:
         try:
             job_id, storage_type, path = otl_job_manager.makejob(otl_query, user_guid, tws, twf, cache_ttl, timeout)
 
-            self.new_platform_queries_job_id[job_id.hex] = otl_query_dict_key
-
-            self.new_platform_queries[otl_query_dict_key] = {
+            # both dictionaries are written with one round trip
+            pipeline = self.redis.pipeline()
+            self._set_in_pipeline(pipeline, self.new_platform_queries_job_id, job_id.hex, otl_query_dict_key)
+            self._set_in_pipeline(pipeline, self.new_platform_queries, otl_query_dict_key, {
                 'job_id': job_id.hex,
                 'storage_type': storage_type,
                 'path': path,
                 'status': 'new',
                 'status_text': 'Job created'
-            }
+            })
+            pipeline.execute()
             log.debug(f'Makejob: Otl query {otl_query} has id: {job_id.hex} in new architecture')
 
         except QueryError as err:
@@ -92,9 +97,9 @@ class JobProxyManager:
         """
         otl_query_dict_key = self._make_key_for_query(otl_query, tws, twf)
 
-        if otl_query_dict_key not in self.new_platform_queries:
+        query = self.new_platform_queries.get(otl_query_dict_key)
+        if query is None:
             return {"status": "notfound", "error": "Job proxy manager: Job is not found in arch2.0 job list"}
-        query = self.new_platform_queries[otl_query_dict_key]
 
         if query['status'] == 'failed':
             return {'status': 'failed', 'error': query['status_text']}
@@ -123,10 +128,10 @@ class JobProxyManager:
         """
         Use otl job manager to get results
         """
-        if cid not in self.new_platform_queries_job_id:
+        query_key = self.new_platform_queries_job_id.get(cid)
+        if query_key is None:
             return {'status': 'failed', 'error': f'No cache with id={cid} '}
 
-        query_key = self.new_platform_queries_job_id[cid]
         query = self.new_platform_queries[query_key]
         job_id = UUID(query['job_id'])
 
@@ -168,10 +173,33 @@ class JobProxyManager:
         """
         Removes query info with specified job_id from self.new_platform_queries
         """
-        if job_id in self.new_platform_queries_job_id:
-            query_key = self.new_platform_queries_job_id[job_id]
-            del self.new_platform_queries[query_key]
-            del self.new_platform_queries_job_id[job_id]
+        query_key = self.new_platform_queries_job_id.get(job_id)
+        if query_key is not None:
+            pipeline = self.redis.pipeline()
+            self._delete_in_pipeline(pipeline, self.new_platform_queries, query_key)
+            self._delete_in_pipeline(pipeline, self.new_platform_queries_job_id, job_id)
+            pipeline.execute()
+
+    @staticmethod
+    def _encode(value) -> str:
+        """
+        Encodes key or value of redis dictionary item as JSON with sorted keys, the format RedisDict reads
+        """
+        return json.dumps(value, sort_keys=True)
+
+    @classmethod
+    def _set_in_pipeline(cls, pipeline, redis_dict: RedisDict, key, value):
+        """
+        Adds setting of redis dictionary item to pipeline
+        """
+        pipeline.hset(redis_dict.key, cls._encode(key), cls._encode(value))
+
+    @classmethod
+    def _delete_in_pipeline(cls, pipeline, redis_dict: RedisDict, key):
+        """
+        Adds deleting of redis dictionary item to pipeline
+        """
+        pipeline.hdel(redis_dict.key, cls._encode(key))
 
 
 job_proxy_manager = JobProxyManager()
@@ -1,28 +1,37 @@
+import heapq
 import random
 import logging
+import threading
 
 from uuid import UUID
 from datetime import datetime, timedelta
 from collections import defaultdict
 from otl_interpreter.settings import ini_config
+from otl_interpreter.utils.synchronized import synchronized
 
 log = logging.getLogger('otl_interpreter.dispatcher.computing_node_pool')
 
 
 class ComputingNode:
-    def __init__(self, uuid: UUID, node_type, total_resources, local):
+    def __init__(self, uuid: UUID, node_type, total_resources, local, protocol_version=1):
         """
         :param uuid: node uuid
         :param node_type: node type
         :param total_resources: dictionary, node resources
         :param local: True if computing node runs on the same host
+        :param protocol_version: version of job topic message protocol supported by computing node
         :return:
         """
         self.uuid: UUID = uuid
         self.type = node_type
         self.local = local
+        self.protocol_version = protocol_version
         self.total_resources = total_resources
         self.used_resources = {key: 0 for key in total_resources.keys()}
+        # resources of node jobs sent to computing node after its last resource status
+        self.reserved_resources = {key: 0 for key in total_resources.keys()}
+        # node job uuid -> resources reserved for node job
+        self.node_job_reservations = {}
         self.last_modified = datetime.now()
 
     def __gt__(self, other):
@@ -47,30 +56,197 @@ class ComputingNode:
                 return False
         return False
 
+    def load_key(self):
+        """
+        Returns tuple of used and reserved resources. Tuples are compared the same way as computing nodes
+        """
+        return tuple(
+            value + self.reserved_resources.get(resource, 0) for resource, value in self.used_resources.items()
+        )
+
     def update_used_resources(self, resources):
+        """
+        Sets resources reported by computing node, reported usage includes all reserved resources
+        """
         self.used_resources.update(resources)
+        self.reserved_resources = {key: 0 for key in self.total_resources.keys()}
+        self.node_job_reservations = {}
         self.last_modified = datetime.now()
 
+    def available_resources(self):
+        """
+        Returns dictionary with amount of every resource that is neither used nor reserved
+        """
+        return {
+            resource: total_resource_value - self.used_resources[resource] - self.reserved_resources[resource]
+            for resource, total_resource_value in self.total_resources.items()
+        }
+
+    def fits(self, demand):
+        """
+        Returns True if available resources are enough for node job demand.
+        Resources not mentioned in demand are needed in one unit
+        """
+        return all(
+            available_value >= demand.get(resource, 1)
+            for resource, available_value in self.available_resources().items()
+        )
+
+    def reserve_resources(self, demand, node_job_uuid=None):
+        """
+        Reserves resources for node job demand
+        :param demand: dictionary resource name: amount, resources not mentioned are needed in one unit
+        :param node_job_uuid: if given, reservation can be released before next resource status
+        """
+        reservation = {resource: demand.get(resource, 1) for resource in self.total_resources.keys()}
+        for resource, amount in reservation.items():
+            self.reserved_resources[resource] += amount
+        if node_job_uuid is not None:
+            self.node_job_reservations[node_job_uuid] = reservation
+
+    def release_resources(self, node_job_uuid):
+        """
+        Releases resources reserved for node job. Returns False if node job has no reservation
+        """
+        reservation = self.node_job_reservations.pop(node_job_uuid, None)
+        if reservation is None:
+            return False
+        for resource, amount in reservation.items():
+            self.reserved_resources[resource] = max(self.reserved_resources[resource] - amount, 0)
+        return True
+
+    def free_slots(self):
+        """
+        Returns number of node jobs computing node can take if every node job takes one unit of each resource
+        """
+        if not self.total_resources:
+            return 1 if self.all_resources_available() else 0
+        return max(min(self.available_resources().values()), 0)
+
     def all_resources_available(self):
         """
         Return True if computing node have at least one resources of each type.
         False otherwise
         """
-        for resource, total_resource_value in self.total_resources.items():
-            if self.used_resources[resource] >= self.total_resources[resource]:
+        for resource, available_value in self.available_resources().items():
+            if available_value <= 0:
                 return False
         return True
 
 
+class ComputingNodeLoadIndex:
+    """
+    Index of computing nodes ordered by resource usage.
+    Keeps heap of distinct load keys and set of node uuids for every load key,
+    so finding least loaded node takes O(log n) and random choice among equally loaded nodes takes O(1)
+    """
+    def __init__(self):
+        # load key -> list of node uuids with that load
+        self._uuids_by_load = {}
+        # node uuid -> (load key, position in list of uuids with that load)
+        self._node_positions = {}
+        # heap of load keys, key may stay in heap after all nodes with that load were removed
+        self._load_heap = []
+        self._empty_load_keys_number = 0
+
+    def __len__(self):
+        return len(self._node_positions)
+
+    def __contains__(self, uuid):
+        return uuid in self._node_positions
+
+    def add(self, uuid, load_key):
+        """
+        Adds node or updates node load
+        """
+        if uuid in self._node_positions:
+            if self._node_positions[uuid][0] == load_key:
+                return
+            self.remove(uuid)
+
+        if load_key not in self._uuids_by_load:
+            self._uuids_by_load[load_key] = []
+            heapq.heappush(self._load_heap, load_key)
+        elif not self._uuids_by_load[load_key]:
+            self._empty_load_keys_number -= 1
+
+        uuids = self._uuids_by_load[load_key]
+        self._node_positions[uuid] = (load_key, len(uuids))
+        uuids.append(uuid)
+
+    def remove(self, uuid):
+        if uuid not in self._node_positions:
+            return
+        load_key, position = self._node_positions.pop(uuid)
+        uuids = self._uuids_by_load[load_key]
+
+        # move last uuid to the place of removed one
+        last_uuid = uuids.pop()
+        if last_uuid != uuid:
+            uuids[position] = last_uuid
+            self._node_positions[last_uuid] = (load_key, position)
+
+        if not uuids:
+            self._empty_load_keys_number += 1
+            if self._empty_load_keys_number > len(self._load_heap) // 2:
+                self._compact()
+
+    def _compact(self):
+        """
+        Removes load keys without nodes from heap
+        """
+        self._uuids_by_load = {
+            load_key: uuids for load_key, uuids in self._uuids_by_load.items() if uuids
+        }
+        self._load_heap = list(self._uuids_by_load.keys())
+        heapq.heapify(self._load_heap)
+        self._empty_load_keys_number = 0
+
+    def _min_load_uuids(self):
+        """
+        Returns list of node uuids with minimal load
+        """
+        while self._load_heap:
+            uuids = self._uuids_by_load[self._load_heap[0]]
+            if uuids:
+                return uuids
+            del self._uuids_by_load[heapq.heappop(self._load_heap)]
+            self._empty_load_keys_number -= 1
+        return []
+
+    def get_least_loaded(self):
+        """
+        Returns uuid of node with minimal load or None. If several nodes have the same load returns random one
+        """
+        uuids = self._min_load_uuids()
+        if not uuids:
+            return None
+        if len(uuids) == 1:
+            return uuids[0]
+        return random.choice(uuids)
+
+
 class ComputingNodePool:
-    def __init__(self, health_check_period=10):
+    def __init__(self, health_check_period=10, node_placement='least_loaded'):
         """
         :param health_check_period: health check period in seconds
         If computing node pool didn't receive resource information in that interval computing node considering inactive
+        :param node_placement: how computing node for node job is chosen among nodes with enough resources,
+        least_loaded - node with lowest resource usage, best_fit - node with least resources left after placement
         """
+        self.node_placement = node_placement
         self.nodes_by_types = defaultdict(dict)
         self.nodes = {}
 
+        # indexes of nodes with available resources, key is (node type, only local nodes flag)
+        self._load_indexes = defaultdict(ComputingNodeLoadIndex)
+
+        # node job uuid -> uuid of computing node where resources for node job are reserved
+        self._node_job_reservations = {}
+
+        # pool is changed by message handlers and by database worker threads
+        self._lock = threading.RLock()
+
         self.health_check_period: timedelta = timedelta(seconds=health_check_period)
 
     def __contains__(self, uuid: UUID):
@@ -79,20 +255,27 @@ class ComputingNodePool:
         """
         return uuid in self.nodes
 
-    def add_computing_node(self, uuid: UUID, node_type: str, resources, local):
+    @synchronized
+    def add_computing_node(self, uuid: UUID, node_type: str, resources, local, protocol_version=1):
         """
         :param uuid: node uuid
         :param node_type: node type
         :param resources: dictionary, node resources
         :param local: True if node runs on local host
+        :param protocol_version: version of job topic message protocol supported by node
         :return:
         """
         computing_node = ComputingNode(
-            uuid, node_type, resources, local
+            uuid, node_type, resources, local, protocol_version
         )
+        if uuid in self.nodes:
+            self._forget_reservations(self.nodes[uuid])
+            self._remove_from_load_indexes(self.nodes[uuid])
         self.nodes_by_types[node_type][uuid] = computing_node
         self.nodes[uuid] = computing_node
+        self._update_load_indexes(computing_node)
 
+    @synchronized
     def del_computing_node(self, uuid: UUID):
         """
         ;:param uuid: node uuid
@@ -100,56 +283,163 @@ class ComputingNodePool:
         """
         if uuid in self.nodes:
             node_type = self.nodes[uuid].type
+            self._forget_reservations(self.nodes[uuid])
+            self._remove_from_load_indexes(self.nodes[uuid])
             del self.nodes_by_types[node_type][uuid]
             del self.nodes[uuid]
 
+    @synchronized
+    def protocol_version(self, uuid: UUID):
+        """
+        Returns version of job topic message protocol supported by node, 1 for unknown node
+        """
+        if uuid not in self.nodes:
+            return 1
+        return self.nodes[uuid].protocol_version
+
+    @synchronized
     def get_least_loaded_node(self, node_type, only_local_nodes=False):
         """
         Returns uuid of node with lowest resource usage or None
         """
-        # exclude nodes with full usage resources
-        nodes = tuple(filter(
-            lambda node: node.all_resources_available(),
-            self.nodes_by_types[node_type].values()
-        ))
-
-        # filter locals
-        if only_local_nodes:
-            nodes = tuple(filter(
-                lambda node: node.local,
-                nodes
-            ))
-
-        if len(nodes) == 1:
-            return nodes[0].uuid
-        if len(nodes) == 0:
-            return None
+        return self._load_indexes[(node_type, only_local_nodes)].get_least_loaded()
 
-        min_resources_computing_nodes_uuids = {nodes[0].uuid, }
-        min_computing_node = nodes[0]
+    @synchronized
+    def free_slots(self, node_type):
+        """
+        Returns number of node jobs computing nodes of node type can take
+        if every node job takes one unit of each resource
+        """
+        return sum(node.free_slots() for node in self.nodes_by_types[node_type].values())
+
+    @synchronized
+    def has_fitting_node(self, node_type, demand, only_local_nodes=False):
+        """
+        Returns True if there is computing node with enough available resources for demand
+        """
+        return any(
+            node.fits(demand) for node in self.nodes_by_types[node_type].values()
+            if node.local or not only_local_nodes
+        )
 
-        for i in range(1, len(nodes)):
-            if nodes[i] < min_computing_node:
-                min_resources_computing_nodes_uuids.clear()
-                min_resources_computing_nodes_uuids.add(nodes[i].uuid)
-                min_computing_node = nodes[i]
-            elif nodes[i] == min_computing_node:
-                min_resources_computing_nodes_uuids.add(nodes[i].uuid)
+    @synchronized
+    def reserve_node(self, node_type, demand=None, only_local_nodes=False, node_job_uuid=None):
+        """
+        Chooses computing node with enough available resources for node job demand
+        and reserves resources on it until node sends resource status or node job reservation is released
+        :param node_type: node type
+        :param demand: dictionary resource name: amount, resources not mentioned are needed in one unit
+        :param only_local_nodes: choose only nodes on local host
+        :param node_job_uuid: uuid of node job resources are reserved for
+        Returns uuid of chosen node or None
+        """
+        demand = demand or {}
 
-        if len(min_resources_computing_nodes_uuids) == 1:
-            return min_resources_computing_nodes_uuids.pop()
+        if self.node_placement == 'best_fit':
+            node_uuid = self._find_fitting_node(node_type, demand, only_local_nodes, self._best_fit_key)
         else:
-            # if two equals nodes return random
-            return random.choice(tuple(min_resources_computing_nodes_uuids))
+            node_uuid = self.get_least_loaded_node(node_type, only_local_nodes)
+            if node_uuid is None or not self.nodes[node_uuid].fits(demand):
+                node_uuid = self._find_fitting_node(
+                    node_type, demand, only_local_nodes, lambda node, demand: node.load_key()
+                )
+
+        if node_uuid is None:
+            return None
+        node = self.nodes[node_uuid]
+        if node_job_uuid is not None:
+            node_job_uuid = self._node_job_key(node_job_uuid)
+            # node job placed again, for example after it was declined
+            self.release_node_job(node_job_uuid)
+            self._node_job_reservations[node_job_uuid] = node_uuid
+        node.reserve_resources(demand, node_job_uuid)
+        self._update_load_indexes(node)
+        return node_uuid
 
+    @synchronized
+    def release_node_job(self, node_job_uuid):
+        """
+        Releases resources reserved for node job, invoked when node job finished, failed, was declined or canceled.
+        Does nothing if reservation was already dropped by resource status of computing node
+        :return: True if resources were released
+        """
+        node_job_uuid = self._node_job_key(node_job_uuid)
+        node_uuid = self._node_job_reservations.pop(node_job_uuid, None)
+        if node_uuid is None or node_uuid not in self.nodes:
+            return False
+        node = self.nodes[node_uuid]
+        if node.release_resources(node_job_uuid):
+            self._update_load_indexes(node)
+            return True
+        return False
+
+    @staticmethod
+    def _node_job_key(node_job_uuid) -> str:
+        """
+        Node job uuid comes as UUID object or string with or without dashes, reservations are kept by hex
+        """
+        if isinstance(node_job_uuid, UUID):
+            return node_job_uuid.hex
+        return UUID(str(node_job_uuid)).hex
+
+    def _forget_reservations(self, node: ComputingNode):
+        for node_job_uuid in node.node_job_reservations.keys():
+            self._node_job_reservations.pop(node_job_uuid, None)
+
+    def _find_fitting_node(self, node_type, demand, only_local_nodes, key):
+        """
+        Returns uuid of node with minimal key among nodes with enough resources or None
+        If several nodes have the same key returns random one
+        """
+        fitting_nodes = [
+            node for node in self.nodes_by_types[node_type].values()
+            if (node.local or not only_local_nodes) and node.fits(demand)
+        ]
+        if not fitting_nodes:
+            return None
+        return min(fitting_nodes, key=lambda node: (key(node, demand), random.random())).uuid
+
+    @staticmethod
+    def _best_fit_key(node, demand):
+        """
+        Sum of resources fractions left on node after placement
+        """
+        return sum(
+            (available_value - demand.get(resource, 1)) / node.total_resources[resource]
+            for resource, available_value in node.available_resources().items()
+            if node.total_resources[resource] > 0
+        )
+
+    @synchronized
     def update_node_resources(self, node_uuid: UUID, resources):
         if node_uuid in self.nodes:
+            # reported usage includes node jobs sent to computing node before
+            self._forget_reservations(self.nodes[node_uuid])
             self.nodes[node_uuid].update_used_resources(
                 resources
             )
+            self._update_load_indexes(self.nodes[node_uuid])
         else:
             log.error(f'Computing node with uuid={node_uuid} hasn\'t been added in node pool')
 
+    def _update_load_indexes(self, node: ComputingNode):
+        """
+        Puts node with available resources in load indexes, removes node with full resource usage
+        """
+        if not node.all_resources_available():
+            self._remove_from_load_indexes(node)
+            return
+
+        load_key = node.load_key()
+        self._load_indexes[(node.type, False)].add(node.uuid, load_key)
+        if node.local:
+            self._load_indexes[(node.type, True)].add(node.uuid, load_key)
+
+    def _remove_from_load_indexes(self, node: ComputingNode):
+        self._load_indexes[(node.type, False)].remove(node.uuid)
+        self._load_indexes[(node.type, True)].remove(node.uuid)
+
+    @synchronized
     def get_inactive_node_uuids(self):
         """
         Returns uuids list of nodes whose last_modified timestamp was earlier than health_check interval ago
@@ -163,5 +453,6 @@ class ComputingNodePool:
 
 
 computing_node_pool = ComputingNodePool(
-    int(ini_config['dispatcher']['health_check_period'])
+    int(ini_config['dispatcher']['health_check_period']),
+    ini_config['dispatcher']['node_placement'],
 )
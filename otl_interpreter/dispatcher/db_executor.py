@@ -0,0 +1,51 @@
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from otl_interpreter.settings import ini_config
+
+log = logging.getLogger('otl_interpreter.dispatcher.db_executor')
+
+
+class DatabaseExecutor:
+    """
+    Runs synchronous dispatcher code working with database from coroutines.
+    Without workers all code runs in one thread shared by all coroutines, like sync_to_async does.
+    With workers code runs in thread pool, every worker thread has its own database connection,
+    so slow queries of one coroutine don't block others
+    """
+    def __init__(self, workers=0):
+        """
+        :param workers: number of database worker threads, 0 means one shared thread
+        """
+        self.workers = workers
+        self._executor = None
+        if workers > 0:
+            log.info(f'Dispatcher uses {workers} database worker threads')
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dispatcher_db')
+
+    def __call__(self, func):
+        """
+        Decorator, returns coroutine function that runs func in database thread
+        """
+        if self._executor is None:
+            return sync_to_async(func)
+
+        @wraps(func)
+        def run_in_worker(*args, **kwargs):
+            # worker connection may be broken or outlive CONN_MAX_AGE since previous call
+            close_old_connections()
+            return func(*args, **kwargs)
+
+        return sync_to_async(run_in_worker, thread_sensitive=False, executor=self._executor)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+db_executor = DatabaseExecutor(int(ini_config['dispatcher']['db_workers']))
@@ -0,0 +1,132 @@
+import atexit
+import threading
+import logging
+
+from uuid import UUID
+
+from rest_framework.renderers import JSONRenderer
+from message_broker import Producer
+
+from otl_interpreter.settings import ini_config
+
+log = logging.getLogger('otl_interpreter.dispatcher')
+
+# computing node gets every node job or cancel message separately
+SINGLE_MESSAGE_PROTOCOL_VERSION = 1
+# computing node gets messages in batch message {'protocol_version': 2, 'messages': [...]}
+BATCH_PROTOCOL_VERSION = 2
+
+
+class JobMessageSender:
+    """
+    Sends node job and cancel messages to job topics of computing nodes.
+    Messages to computing nodes supporting batch protocol are collected per computing node
+    and sent in one batch message when batch_size messages are collected or batch_delay seconds passed
+    since the first message of batch. Messages to other computing nodes are sent immediately.
+    One sender is shared by all node job status managers of process, so messages to computing node
+    are sent in order they were made
+    """
+    def __init__(self, producer=None, batch_size=100, batch_delay=0.005):
+        """
+        :param producer: message broker producer, if None producer is created and started on first message,
+        so worker processes forked by supervisor start their own producers
+        :param batch_size: max number of messages in batch, 1 disables batching
+        :param batch_delay: max seconds message waits in batch
+        """
+        self.producer = producer
+        self._own_producer = producer is None
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+
+        # computing node uuid -> list of messages waiting to be sent
+        self._batches = {}
+        # computing node uuid -> timer flushing its batch
+        self._timers = {}
+        # batches are sent under lock, so messages to computing node keep order
+        self._lock = threading.Lock()
+
+        self.sent_messages = 0
+        self.sent_batches = 0
+
+    def _get_producer(self):
+        # invoked holding lock
+        if self.producer is None:
+            producer = Producer()
+            producer.start()
+            self.producer = producer
+        return self.producer
+
+    def stop(self):
+        """
+        Sends collected messages and stops producer started by sender
+        """
+        self.flush()
+        with self._lock:
+            if self._own_producer and self.producer is not None:
+                self.producer.stop()
+                self.producer = None
+
+    @staticmethod
+    def _topic(computing_node_uuid: UUID):
+        return f'{computing_node_uuid.hex}_job'
+
+    def send(self, computing_node_uuid: UUID, message: dict, protocol_version=SINGLE_MESSAGE_PROTOCOL_VERSION):
+        """
+        Sends message to computing node or puts it to computing node batch
+        :param computing_node_uuid: computing node uuid
+        :param message: node job or cancel message dictionary
+        :param protocol_version: version of job topic message protocol supported by computing node
+        """
+        if protocol_version < BATCH_PROTOCOL_VERSION or self.batch_size <= 1:
+            with self._lock:
+                self._get_producer().send(self._topic(computing_node_uuid), JSONRenderer().render(message))
+                self.sent_messages += 1
+            return
+
+        with self._lock:
+            batch = self._batches.setdefault(computing_node_uuid, [])
+            batch.append(message)
+            if len(batch) >= self.batch_size:
+                self._send_batch(computing_node_uuid)
+            elif computing_node_uuid not in self._timers:
+                timer = threading.Timer(self.batch_delay, self.flush, args=(computing_node_uuid,))
+                timer.daemon = True
+                self._timers[computing_node_uuid] = timer
+                timer.start()
+
+    def flush(self, computing_node_uuid: UUID = None):
+        """
+        Sends collected messages of computing node, or of all computing nodes if uuid is None
+        """
+        with self._lock:
+            computing_node_uuids = list(self._batches) if computing_node_uuid is None else [computing_node_uuid]
+            for uuid in computing_node_uuids:
+                self._send_batch(uuid)
+
+    def _send_batch(self, computing_node_uuid):
+        timer = self._timers.pop(computing_node_uuid, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._batches.pop(computing_node_uuid, None)
+        if not batch:
+            return
+
+        try:
+            self._get_producer().send(
+                self._topic(computing_node_uuid),
+                JSONRenderer().render({'protocol_version': BATCH_PROTOCOL_VERSION, 'messages': batch})
+            )
+        except Exception as err:
+            log.error(f'Failed to send {len(batch)} messages to computing node {computing_node_uuid}: {err}')
+            return
+        self.sent_messages += len(batch)
+        self.sent_batches += 1
+        log.debug(f'Sent batch of {len(batch)} messages to computing node {computing_node_uuid}')
+
+
+job_message_sender = JobMessageSender(
+    batch_size=int(ini_config['dispatcher']['job_message_batch_size']),
+    batch_delay=int(ini_config['dispatcher']['job_message_batch_delay']) / 1000,
+)
+atexit.register(job_message_sender.stop)
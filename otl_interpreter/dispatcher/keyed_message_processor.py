@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import traceback
+import zlib
+
+log = logging.getLogger('otl_interpreter.dispatcher')
+
+
+def key_index(ordering_key, size) -> int:
+    """
+    Returns index in range [0, size) for ordering key, index is the same in every process.
+    None key always has zero index
+    """
+    if ordering_key is None:
+        return 0
+    return zlib.crc32(str(ordering_key).encode()) % size
+
+
+class KeyedMessageProcessor:
+    """
+    Processes messages concurrently with bounded number of workers.
+    Every worker has its own bounded queue, messages with the same ordering key
+    always go to the same worker, so they are processed in order they were received.
+    Messages without ordering key go to the first worker
+    """
+    def __init__(self, message_handler, concurrency=1, queue_size=100):
+        """
+        :param message_handler: handler with process_message and ordering_key coroutines
+        :param concurrency: number of workers
+        :param queue_size: max number of messages waiting in worker queue, receiving waits when queue is full
+        """
+        self.message_handler = message_handler
+        self.concurrency = max(concurrency, 1)
+        self.queue_size = queue_size
+        self._queues = []
+        self._workers = []
+
+        self.processed_messages = 0
+        self.failed_messages = 0
+
+    async def __aenter__(self):
+        if self.concurrency > 1:
+            self._queues = [asyncio.Queue(self.queue_size) for _ in range(self.concurrency)]
+            self._workers = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        # let workers finish received messages only on normal exit
+        if exc_type is None:
+            for queue in self._queues:
+                await queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queues = []
+        self._workers = []
+
+    def worker_index(self, ordering_key) -> int:
+        """
+        Returns index of worker for ordering key, index is the same in every process
+        """
+        return key_index(ordering_key, self.concurrency)
+
+    async def submit(self, message):
+        """
+        Puts message to worker queue. With one worker message is processed before return
+        """
+        if not self._queues:
+            await self._process(message)
+            return
+
+        try:
+            ordering_key = await self.message_handler.ordering_key(message)
+        except Exception:
+            log.error(f'Error occured while getting ordering key of message {message.value}')
+            log.error(traceback.format_exc())
+            ordering_key = None
+
+        await self._queues[self.worker_index(ordering_key)].put(message)
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            message = await queue.get()
+            try:
+                await self._process(message)
+            finally:
+                queue.task_done()
+
+    async def _process(self, message):
+        self.processed_messages += 1
+        try:
+            await self.message_handler.process_message(message)
+        except Exception as err:
+            self.failed_messages += 1
+            log.error(f'Error occured while process message {message.value}')
+            tb = traceback.format_exc()
+            log.error(tb)
+            print(tb)
@@ -1,8 +1,7 @@
-from redis import Redis
 from pottery import Redlock
 
-from core.settings import REDIS_CONNECTION_STRING
 from otl_interpreter.settings import ini_config
+from otl_interpreter.utils.redis_connection import get_redis
 
 
 one_process_mode = ini_config['dispatcher']['one_process_mode'].lower() == 'true'
@@ -21,11 +20,10 @@ class FakeLock:
 
 class Lock:
     def __init__(self, key):
-        redis = Redis.from_url(REDIS_CONNECTION_STRING)
         if one_process_mode:
             self.lock = FakeLock()
         else:
-            self.lock = Redlock(key=key, masters={redis})
+            self.lock = Redlock(key=key, masters={get_redis()})
 
     def acquire(self, blocking=True):
         return self.lock.acquire(blocking=blocking)
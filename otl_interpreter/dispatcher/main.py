@@ -1,7 +1,6 @@
 import sys
 import signal
 import asyncio
-import traceback
 
 from logging import getLogger
 from json import loads
@@ -19,46 +18,70 @@ from message_handlers import (
 )
 
 from otl_interpreter.settings import ini_config
+from otl_interpreter.utils.redis_connection import log_connection_pools_stats
 from node_job_status_manager import NodeJobStatusManager
+from keyed_message_processor import KeyedMessageProcessor
+from queue_wakeup import queue_wakeup
+from supervisor import DispatcherSupervisor
 
 
 log = getLogger('otl_interpreter.dispatcher')
 
 
 async def consume_messages(topic, handler_class, consumer_extra_config=None):
+    """
+    Consumes topic messages, messages with different ordering keys are processed concurrently
+    """
+    concurrency = int(ini_config['dispatcher']['message_concurrency'])
+    queue_size = int(ini_config['dispatcher']['message_queue_size'])
     async with handler_class() as message_handler:
-        async with Consumer(topic, value_deserializer=loads, extra_config=consumer_extra_config) as consumer:
-            async for message in consumer:
-                try:
-                    await message_handler.process_message(message)
-                except Exception as err:
-                    log.error(f'Error occured while process message {message.value}')
-                    tb = traceback.format_exc()
-                    log.error(tb)
-                    print(tb)
+        async with KeyedMessageProcessor(message_handler, concurrency, queue_size) as message_processor:
+            async with Consumer(topic, value_deserializer=loads, extra_config=consumer_extra_config) as consumer:
+                async for message in consumer:
+                    await message_processor.submit(message)
 
 
 async def check_job_queue():
     """
-    Task to periodically check node job queue
+    Task to check node job queues when computing nodes get free capacity and periodically
     """
     node_job_status_manager = NodeJobStatusManager()
     time_to_wait = int(ini_config['dispatcher']['check_job_queue_period'])
+    queue_wakeup.attach()
 
+    # all queues are checked at start and by timeout
+    computing_node_types = None
     while True:
-        log.debug('Check node job queue by timeout')
-        await node_job_status_manager.check_job_queue()
+        if computing_node_types is None:
+            log.debug('Check node job queue by timeout')
+        else:
+            log.debug(f'Check node job queues of {computing_node_types} on wakeup')
+        await node_job_status_manager.check_job_queue(computing_node_types)
+        computing_node_types = await queue_wakeup.wait(time_to_wait)
+
+
+async def reconcile_node_job_queue():
+    """
+    Task to reconcile node job queues with database at start and then periodically
+    """
+    node_job_status_manager = NodeJobStatusManager()
+    time_to_wait = int(ini_config['dispatcher']['queue_reconciliation_period'])
+
+    while True:
+        log.debug('Reconcile node job queues with database')
+        await node_job_status_manager.reconcile_node_job_queue()
         await asyncio.sleep(time_to_wait)
 
 
 async def health_check():
     """
-    Task to periodically check computing node health
+    Task to periodically check computing node health and redis connection pools usage
     """
     time_to_wait = int(ini_config['dispatcher']['health_check_period'])
     computing_node_control_handler = ComputingNodeControlHandler()
     while True:
         await computing_node_control_handler.check_computing_node_health()
+        log_connection_pools_stats()
         await asyncio.sleep(time_to_wait)
 
 
@@ -78,6 +101,9 @@ async def main():
         asyncio.create_task(
             check_job_queue()
         ),
+        asyncio.create_task(
+            reconcile_node_job_queue()
+        ),
         asyncio.create_task(
             health_check()
         ),
@@ -94,6 +120,25 @@ def terminate_handler(signum, frame):
 signal.signal(signal.SIGTERM, terminate_handler)
 
 
+def run_supervisor(workers):
+    supervisor = DispatcherSupervisor(
+        workers,
+        int(ini_config['dispatcher']['worker_queue_size']),
+        int(ini_config['dispatcher']['health_check_period']),
+    )
+    asyncio.run(supervisor.run())
+
+
 if __name__ == "__main__":
     log.info('Dispatcher starting')
-    asyncio.run(main())
+    workers = int(ini_config['dispatcher']['workers'])
+    one_process_mode = ini_config['dispatcher']['one_process_mode'].lower() == 'true'
+    if workers > 1 and one_process_mode:
+        log.error('Dispatcher workers can\'t share node job queues in one process mode, starting one process')
+        workers = 1
+
+    if workers > 1:
+        log.info(f'Dispatcher starting {workers} worker processes')
+        run_supervisor(workers)
+    else:
+        asyncio.run(main())
@@ -7,6 +7,14 @@ class MessageHandler(ABC):
     async def process_message(self, message: Message) -> None:
         raise NotImplementedError
 
+    @staticmethod
+    async def ordering_key(message: Message):
+        """
+        Returns key of message, messages with the same key are processed in order they were received.
+        None means message is processed in order with all other messages without key
+        """
+        return None
+
     @abstractmethod
     async def __aenter__(self):
         raise NotImplementedError
@@ -1,5 +1,4 @@
 from logging import getLogger
-from asgiref.sync import sync_to_async
 
 from otl_interpreter.interpreter_db import node_commands_manager, NodeCommandsError
 from otl_interpreter.settings import host_id as local_host_id
@@ -9,8 +8,10 @@ from message_serializers.computing_node_control_command import (
     ComputingNodeControlCommand, ControlNodeCommandName,
     RegisterComputingNodeCommand, UnregisterComputingNodeCommand, ErrorOccuredCommand, ResourceStatusCommand
 )
+from db_executor import db_executor
 from lock import Lock
 from computing_node_pool import computing_node_pool
+from queue_wakeup import queue_wakeup
 from node_job_status_manager import NodeJobStatusManager
 from .abstract_message_handler import MessageHandler, Message
 
@@ -18,18 +19,23 @@ log = getLogger('otl_interpreter.dispatcher')
 
 
 # django funcions are not allowed to be used in async mode
-register_node = sync_to_async(node_commands_manager.register_node)
-register_node_commands = sync_to_async(node_commands_manager.register_node_commands)
-get_active_nodes = sync_to_async(node_commands_manager.get_active_nodes_uuids)
-node_deactivate = sync_to_async(node_commands_manager.node_deactivate)
-node_activate = sync_to_async(node_commands_manager.node_activate)
-all_node_uuids = sync_to_async(node_commands_manager.get_all_node_uuids)
-get_computing_node_dict = sync_to_async(node_commands_manager.get_computing_node_dict)
-get_active_nodes_list = sync_to_async(node_commands_manager.get_active_nodes_list)
+register_node = db_executor(node_commands_manager.register_node)
+register_node_commands = db_executor(node_commands_manager.register_node_commands)
+get_active_nodes = db_executor(node_commands_manager.get_active_nodes_uuids)
+node_deactivate = db_executor(node_commands_manager.node_deactivate)
+node_activate = db_executor(node_commands_manager.node_activate)
+all_node_uuids = db_executor(node_commands_manager.get_all_node_uuids)
+get_computing_node_dict = db_executor(node_commands_manager.get_computing_node_dict)
+get_active_nodes_list = db_executor(node_commands_manager.get_active_nodes_list)
 
 
 class ComputingNodeControlHandler(MessageHandler):
-    def __init__(self):
+    def __init__(self, database_owner=True):
+        """
+        :param database_owner: if False handler only keeps computing node pool of process up to date
+        and leaves changing computing nodes and their node jobs in database to other process on the same host
+        """
+        self.database_owner = database_owner
         self.node_job_status_manager = NodeJobStatusManager()
         # if dispatcher was stopped, registered computing nodes might be present in database
 
@@ -47,7 +53,8 @@ class ComputingNodeControlHandler(MessageHandler):
             computing_node_pool.add_computing_node(
                 node['uuid'], node['type'],
                 node['resources'],
-                node['host_id'] == local_host_id
+                node['host_id'] == local_host_id,
+                node['protocol_version'],
             )
 
     async def process_message(self, message: Message) -> None:
@@ -101,20 +108,20 @@ class ComputingNodeControlHandler(MessageHandler):
             concreate_command_serializer
         )
 
-    @staticmethod
-    async def process_register(computing_node_uuid, register_command: RegisterComputingNodeCommand):
+    async def process_register(self, computing_node_uuid, register_command: RegisterComputingNodeCommand):
 
         # only one instance of dispatcher put node information in database
         register_node_lock = Lock(
             key=f'register_computing_node_{computing_node_uuid}'
         )
-        if register_node_lock.acquire(blocking=False):
+        if self.database_owner and register_node_lock.acquire(blocking=False):
             try:
                 await register_node(
                     register_command.validated_data['computing_node_type'],
                     computing_node_uuid,
                     register_command.validated_data['host_id'],
-                    register_command.validated_data['resources']
+                    register_command.validated_data['resources'],
+                    register_command.validated_data['protocol_version'],
                 )
                 await register_node_commands(
                     computing_node_uuid,
@@ -128,8 +135,10 @@ class ComputingNodeControlHandler(MessageHandler):
         computing_node_pool.add_computing_node(
             computing_node_uuid, register_command.validated_data['computing_node_type'],
             register_command.validated_data['resources'],
-            register_command.validated_data['host_id'] == local_host_id
+            register_command.validated_data['host_id'] == local_host_id,
+            register_command.validated_data['protocol_version'],
         )
+        queue_wakeup.wake(register_command.validated_data['computing_node_type'])
 
     async def process_error_occured(self, computing_node_uuid, error_occured_command: ErrorOccuredCommand):
         pass
@@ -142,22 +151,31 @@ class ComputingNodeControlHandler(MessageHandler):
             # if registered then set active and add to computing node pool
             if computing_node_uuid in await all_node_uuids():
                 log.info(f'Inactive node {computing_node_uuid} sent resource status. Making it active again')
-                await node_activate(computing_node_uuid)
+                if self.database_owner:
+                    await node_activate(computing_node_uuid)
                 computing_node_dict = await get_computing_node_dict(computing_node_uuid)
                 computing_node_pool.add_computing_node(
                     computing_node_uuid, computing_node_dict['type'],
                     computing_node_dict['resources'],
-                    computing_node_dict['host_id'] == local_host_id
+                    computing_node_dict['host_id'] == local_host_id,
+                    computing_node_dict['protocol_version'],
                 )
             else:
                 log.error(f'Get unregistered computing node resource for computing node: {computing_node_uuid}')
                 return
 
+        computing_node_type = computing_node_pool.nodes[computing_node_uuid].type
+        free_slots = computing_node_pool.free_slots(computing_node_type)
         computing_node_pool.update_node_resources(computing_node_uuid, resources)
+        # node job queue is checked without waiting for timeout when computing nodes get free capacity
+        if computing_node_pool.free_slots(computing_node_type) > free_slots:
+            queue_wakeup.wake(computing_node_type)
 
     async def process_unregister(self, computing_node_uuid, unregister_command: UnregisterComputingNodeCommand):
         log.info(f'Unregister node {computing_node_uuid}')
         computing_node_pool.del_computing_node(computing_node_uuid)
+        if not self.database_owner:
+            return
 
         # only one instance of dispatcher put node information in database
         unregister_node_lock = Lock(
@@ -1,8 +1,7 @@
+from uuid import UUID
 from logging import getLogger
-from .abstract_message_handler import MessageHandler, Message
 
-from otl_interpreter.interpreter_db import node_job_manager
-from otl_interpreter.interpreter_db.enums import NodeJobStatus
+from .abstract_message_handler import MessageHandler, Message
 
 from message_serializers.nodejob_status import NodeJobStatusSerializer
 
@@ -22,6 +21,22 @@ class NodeJobStatusHandler(MessageHandler):
     async def __aexit__(self, exc_type, exc_value, exc_traceback):
         pass
 
+    @staticmethod
+    async def ordering_key(message: Message):
+        """
+        Node job statuses of one otl job are processed in order if computing node sends otl job uuid
+        that it got in node job message, otherwise statuses of one node job are processed in order.
+        Key depends only on message, so it is found without database queries
+        and every status of node job gets the same key
+        """
+        key = message.value.get('otl_job_uuid') or message.value.get('uuid')
+        if key is None:
+            return None
+        try:
+            return UUID(str(key)).hex
+        except ValueError:
+            return None
+
     async def process_message(self, message: Message) -> None:
         nodejob_status_serializer = NodeJobStatusSerializer(data=message.value)
         if not nodejob_status_serializer.is_valid():
@@ -1,7 +1,6 @@
 import asyncio
 
-
-from asgiref.sync import sync_to_async
+from uuid import UUID
 
 from logging import getLogger
 from message_broker import AsyncProducer
@@ -9,6 +8,7 @@ from message_broker import AsyncProducer
 from otl_interpreter.interpreter_db import node_job_manager
 from otl_interpreter.interpreter_db.enums import NodeJobStatus
 
+from db_executor import db_executor
 from node_job_status_manager import NodeJobStatusManager
 
 from message_serializers.otl_job import OtlJobCommand, OtlJobCommandName, NewOtlJobCommand, CancelOtlJobCommand
@@ -18,7 +18,7 @@ from .abstract_message_handler import MessageHandler, Message
 log = getLogger('otl_interpreter.dispatcher')
 
 
-change_node_job_status = sync_to_async(node_job_manager.change_node_job_status)
+change_node_job_status = db_executor(node_job_manager.change_node_job_status)
 
 
 class OtlJobHandler(MessageHandler):
@@ -33,6 +33,16 @@ class OtlJobHandler(MessageHandler):
     async def __aexit__(self, exc_type, exc_value, exc_traceback):
         await self.producer.stop()
 
+    @staticmethod
+    async def ordering_key(message: Message):
+        """
+        Commands of one otl job are processed in order
+        """
+        command = message.value.get('command')
+        if not isinstance(command, dict) or command.get('otl_job_uuid') is None:
+            return None
+        return UUID(str(command['otl_job_uuid'])).hex
+
     async def process_message(self, message: Message) -> None:
         log.debug(f'OtlJobHandler gets node_job{str(message.value)}')
         command_serializer = OtlJobCommand(data=message.value)
@@ -52,7 +62,10 @@ class OtlJobHandler(MessageHandler):
             log.error(f'Dispatcher get invalid otl job: {new_otl_job_command_serializer.data}')
             log.error(str(new_otl_job_command_serializer.errors))
             return
+        otl_job_uuid = new_otl_job_command_serializer.validated_data.get('otl_job_uuid')
         for node_job in new_otl_job_command_serializer.validated_data['node_jobs']:
+            if otl_job_uuid is not None:
+                node_job['otl_job_uuid'] = otl_job_uuid.hex
             await self.node_job_status_manager.change_node_job_status(
                 node_job['uuid'], NodeJobStatus.READY_TO_EXECUTE,
                 'One of the first node job in otl query',
@@ -66,9 +79,12 @@ class OtlJobHandler(MessageHandler):
             log.error(str(cancel_otl_job_serializer.errors))
             return
 
-        for node_job in cancel_otl_job_serializer.validated_data['node_jobs']:
-            await self.node_job_status_manager.change_node_job_status(
-                node_job['uuid'], NodeJobStatus.CANCELED,
-                'Canceled by user or by timeout',
-                node_job
-            )
+        otl_job_uuid = cancel_otl_job_serializer.validated_data.get('otl_job_uuid')
+        if otl_job_uuid is not None:
+            await self.node_job_status_manager.cancel_otl_job(otl_job_uuid, 'Canceled by user or by timeout')
+            return
+
+        await self.node_job_status_manager.change_node_job_statuses([
+            (node_job['uuid'], NodeJobStatus.CANCELED, 'Canceled by user or by timeout', node_job)
+            for node_job in cancel_otl_job_serializer.validated_data['node_jobs']
+        ])
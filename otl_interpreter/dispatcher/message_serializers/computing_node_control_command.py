@@ -20,6 +20,8 @@ class RegisterComputingNodeCommand(serializers.Serializer):
     host_id = serializers.CharField()
     otl_command_syntax = serializers.DictField()
     resources = serializers.DictField()
+    # computing nodes that don't send protocol version get one message per node job
+    protocol_version = serializers.IntegerField(required=False, default=1, min_value=1)
 
 
 class UnregisterComputingNodeCommand(serializers.Serializer):
@@ -4,6 +4,8 @@ from otl_interpreter.interpreter_db.enums import NodeJobStatus
 
 class NodeJobStatusSerializer(serializers.Serializer):
     uuid = serializers.UUIDField()
+    # otl job uuid from node job message, optional
+    otl_job_uuid = serializers.UUIDField(required=False, allow_null=True)
     status = serializers.ChoiceField(choices=NodeJobStatus.choices)
     status_text = serializers.CharField(default=None, allow_null=True, allow_blank=True)
     last_finished_command = serializers.CharField(
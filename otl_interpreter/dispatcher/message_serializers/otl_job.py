@@ -21,13 +21,16 @@ class NodeJobSerializer(serializers.Serializer):
     storage = serializers.ChoiceField(choices=ResultStorage.choices)
     path = serializers.CharField()
     user_guid = serializers.UUIDField()
+    otl_job_uuid = serializers.UUIDField(required=False)
 
 
 class NewOtlJobCommand(serializers.Serializer):
     node_jobs = NodeJobSerializer(many=True)
+    otl_job_uuid = serializers.UUIDField(required=False)
 
 
 class CancelOtlJobCommand(serializers.Serializer):
     node_jobs = NodeJobSerializer(many=True)
+    otl_job_uuid = serializers.UUIDField(required=False)
 
 
@@ -0,0 +1,90 @@
+import threading
+import logging
+
+from uuid import UUID
+from typing import Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from otl_interpreter.settings import ini_config
+
+log = logging.getLogger('otl_interpreter.dispatcher.node_job_cache')
+
+
+class NodeJobCache:
+    """
+    Bounded in-process cache of node job dictionaries.
+    Least recently used node jobs are evicted when cache is full, entries older than ttl are considered missing.
+    Cache doesn't guarantee freshness of node job status. Status in database is changed only if it equals
+    cached status, and status change not allowed from cached status is checked again with status from database,
+    so stale entries are detected on the next status change and invalidated.
+    """
+    def __init__(self, max_size=10000, ttl=60):
+        """
+        :param max_size: max number of node jobs in cache
+        :param ttl: time in seconds to keep node job in cache
+        """
+        self.max_size = max_size
+        self.ttl: timedelta = timedelta(seconds=ttl)
+
+        # node job uuid hex -> (node job dictionary, timestamp when it was put in cache)
+        self._node_jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._node_jobs)
+
+    def __contains__(self, node_job_uuid):
+        return self.get(node_job_uuid) is not None
+
+    @staticmethod
+    def _key(node_job_uuid) -> str:
+        if isinstance(node_job_uuid, UUID):
+            return node_job_uuid.hex
+        return UUID(str(node_job_uuid)).hex
+
+    def get(self, node_job_uuid) -> Optional[dict]:
+        """
+        Returns copy of cached node job dictionary or None
+        """
+        key = self._key(node_job_uuid)
+        with self._lock:
+            if key not in self._node_jobs:
+                return None
+            node_job_dict, put_timestamp = self._node_jobs[key]
+            if put_timestamp < datetime.now() - self.ttl:
+                del self._node_jobs[key]
+                return None
+            self._node_jobs.move_to_end(key)
+            return node_job_dict.copy()
+
+    def set(self, node_job_uuid, node_job_dict: dict):
+        """
+        Puts copy of node job dictionary in cache
+        """
+        if self.max_size <= 0:
+            return
+        key = self._key(node_job_uuid)
+        with self._lock:
+            self._node_jobs[key] = (node_job_dict.copy(), datetime.now())
+            self._node_jobs.move_to_end(key)
+            while len(self._node_jobs) > self.max_size:
+                self._node_jobs.popitem(last=False)
+
+    def invalidate(self, node_job_uuid):
+        """
+        Removes node job from cache
+        """
+        key = self._key(node_job_uuid)
+        with self._lock:
+            self._node_jobs.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._node_jobs.clear()
+
+
+node_job_cache = NodeJobCache(
+    int(ini_config['dispatcher']['node_job_cache_size']),
+    int(ini_config['dispatcher']['node_job_cache_ttl']),
+)
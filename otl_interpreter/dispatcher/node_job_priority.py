@@ -0,0 +1,379 @@
+import logging
+import datetime
+import threading
+
+from uuid import UUID
+from collections import OrderedDict, Counter
+
+from redis import RedisError
+
+from core.settings import REDIS_CONFIG
+
+from otl_interpreter.settings import ini_config
+from otl_interpreter.interpreter_db.enums import NodeJobStatus
+from otl_interpreter.interpreter_db import node_job_manager, otl_job_manager
+from otl_interpreter.utils.redis_connection import get_redis
+from otl_interpreter.utils.synchronized import synchronized
+
+log = logging.getLogger('otl_interpreter.dispatcher.node_job_priority')
+
+
+class OtlJobTimings:
+    """
+    Bounded cache of otl job creation timestamps and timeouts.
+    Lock is held only for cache access, timings are loaded from database without it,
+    so database queries of different threads don't wait each other
+    """
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        # otl job uuid hex -> (creation timestamp, timeout in seconds)
+        self._timings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, node_job_dict):
+        """
+        Returns tuple (creation timestamp, timeout in seconds) of node job's otl job or None
+        """
+        if 'otl_job_uuid' in node_job_dict:
+            otl_job_uuid = node_job_dict['otl_job_uuid']
+        else:
+            otl_job_uuid = node_job_manager.get_otl_job_uuid(node_job_dict['uuid'])
+        otl_job_uuid = UUID(str(otl_job_uuid)).hex
+
+        with self._lock:
+            if otl_job_uuid in self._timings:
+                self._timings.move_to_end(otl_job_uuid)
+                return self._timings[otl_job_uuid]
+
+        created_time_and_timeout = otl_job_manager.get_created_time_and_timeout(otl_job_uuid)
+        if created_time_and_timeout is None:
+            return None
+        created_time, timeout = created_time_and_timeout
+        otl_job_timing = (created_time.timestamp(), timeout.total_seconds())
+
+        with self._lock:
+            self._timings[otl_job_uuid] = otl_job_timing
+            while len(self._timings) > self.max_size:
+                self._timings.popitem(last=False)
+        return otl_job_timing
+
+
+class NodeJobCounter:
+    """
+    Number of node jobs in queue for every user kept in process memory, used in one process mode
+    """
+    def __init__(self):
+        # user guid -> number of user's node jobs in queue
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def get(self, user_guid: str) -> int:
+        return self._counts.get(user_guid, 0)
+
+    def increment(self, user_guid: str):
+        with self._lock:
+            self._counts[user_guid] += 1
+
+    def decrement(self, user_guid: str):
+        with self._lock:
+            self._counts[user_guid] -= 1
+            if self._counts[user_guid] <= 0:
+                del self._counts[user_guid]
+
+    def reset(self, counts: dict):
+        """
+        Replaces all numbers with given dictionary user guid -> number of node jobs in queue
+        """
+        with self._lock:
+            self._counts = Counter(counts)
+
+
+# decrements user's number of node jobs and removes user from hash if number isn't positive
+DECREMENT_SCRIPT = """
+local count = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if count <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return count
+"""
+
+
+class RedisNodeJobCounter:
+    """
+    Number of node jobs in queue for every user kept in redis hash.
+    Numbers are shared by dispatcher processes and instances, so node job put in queue by one process
+    and taken from queue by another is counted correctly.
+    Redis errors are logged and numbers are considered zero
+    """
+    def __init__(self, redis, key='otl_interpreter_fair_share_node_jobs_in_queue'):
+        self._r = redis
+        self.key = key
+        self._decrement_script = self._r.register_script(DECREMENT_SCRIPT)
+
+    def get(self, user_guid: str) -> int:
+        try:
+            count = self._r.hget(self.key, user_guid)
+        except RedisError as err:
+            log.error(f'Failed to read number of node jobs in queue of user {user_guid}: {err}')
+            return 0
+        return int(count) if count is not None else 0
+
+    def increment(self, user_guid: str):
+        try:
+            self._r.hincrby(self.key, user_guid, 1)
+        except RedisError as err:
+            log.error(f'Failed to increment number of node jobs in queue of user {user_guid}: {err}')
+
+    def decrement(self, user_guid: str):
+        try:
+            self._decrement_script(keys=[self.key], args=[user_guid])
+        except RedisError as err:
+            log.error(f'Failed to decrement number of node jobs in queue of user {user_guid}: {err}')
+
+    def reset(self, counts: dict):
+        """
+        Replaces all numbers with given dictionary user guid -> number of node jobs in queue
+        """
+        try:
+            pipeline = self._r.pipeline(transaction=True)
+            pipeline.delete(self.key)
+            if counts:
+                pipeline.hset(self.key, mapping=counts)
+            pipeline.execute()
+        except RedisError as err:
+            log.error(f'Failed to reset numbers of node jobs in queue: {err}')
+
+
+class PriorityPolicy:
+    """
+    Base class for node job queue priority policies.
+    Policy changes score of node job put in queue, node jobs with lower score are taken from queue first
+    """
+    def __init__(self, otl_job_timings: OtlJobTimings):
+        self.otl_job_timings = otl_job_timings
+
+    @classmethod
+    def from_config(cls, config, otl_job_timings):
+        return cls(otl_job_timings)
+
+    def score(self, score: float, node_job_dict: dict) -> float:
+        """
+        Returns new score of node job
+        :param score: score given by previous policies
+        :param node_job_dict: node job dictionary
+        """
+        return score
+
+    def node_job_status_changed(self, node_job_dict: dict, previous_status, status):
+        """
+        Invoked after node job status changed
+        """
+        pass
+
+    def node_job_queue_reconciled(self, queued_node_job_dicts):
+        """
+        Invoked after node job queues were reconciled with database
+        :param queued_node_job_dicts: dictionaries of node jobs with IN_QUEUE status in database
+        """
+        pass
+
+
+class FifoPolicy(PriorityPolicy):
+    """
+    Node jobs are taken in order they were put in queue
+    """
+
+
+class AgingPolicy(PriorityPolicy):
+    """
+    Score of node job is decreased by time its otl job already waited,
+    so node jobs of otl jobs created long ago are taken first
+    """
+    def score(self, score, node_job_dict):
+        otl_job_timing = self.otl_job_timings.get(node_job_dict)
+        if otl_job_timing is None:
+            return score
+        created_timestamp, _ = otl_job_timing
+        return score - max(datetime.datetime.now().timestamp() - created_timestamp, 0)
+
+
+class FairSharePolicy(PriorityPolicy):
+    """
+    Score of node job is increased by weight seconds for every node job of the same user already in queue,
+    so one user can't hold back node jobs of other users.
+    Node jobs are counted when they get IN_QUEUE status and leave it in whatever process that happens,
+    so numbers are kept in redis unless dispatcher works in one process mode.
+    Numbers are recalculated from database when node job queues are reconciled
+    """
+    def __init__(self, otl_job_timings, weight=10.0, node_job_counter=None):
+        """
+        :param node_job_counter: NodeJobCounter or RedisNodeJobCounter, NodeJobCounter if None
+        """
+        super().__init__(otl_job_timings)
+        self.weight = weight
+        self.node_job_counter = node_job_counter if node_job_counter is not None else NodeJobCounter()
+
+    @classmethod
+    def from_config(cls, config, otl_job_timings):
+        if config.get('one_process_mode', 'True').lower() == 'true':
+            node_job_counter = NodeJobCounter()
+        else:
+            node_job_counter = RedisNodeJobCounter(get_redis(REDIS_CONFIG))
+        return cls(otl_job_timings, float(config['fair_share_weight']), node_job_counter)
+
+    @staticmethod
+    def _user_guid(node_job_dict):
+        # node job dictionaries from database, queue and otl job commands have different uuid formats
+        return UUID(str(node_job_dict['user_guid'])).hex
+
+    def score(self, score, node_job_dict):
+        return score + self.weight * self.node_job_counter.get(self._user_guid(node_job_dict))
+
+    def node_job_status_changed(self, node_job_dict, previous_status, status):
+        if status == NodeJobStatus.IN_QUEUE:
+            self.node_job_counter.increment(self._user_guid(node_job_dict))
+        elif previous_status == NodeJobStatus.IN_QUEUE:
+            self.node_job_counter.decrement(self._user_guid(node_job_dict))
+
+    def node_job_queue_reconciled(self, queued_node_job_dicts):
+        self.node_job_counter.reset(Counter(
+            self._user_guid(node_job_dict) for node_job_dict in queued_node_job_dicts
+        ))
+
+
+class ShortestJobFirstPolicy(PriorityPolicy):
+    """
+    Score of node job is increased by its expected runtime multiplied by weight.
+    Expected runtime is exponentially weighted average runtime of node jobs with the same commands,
+    node jobs without history have zero expected runtime.
+    Runtime is measured from RUNNING to FINISHED status by dispatcher instance that got both statuses
+    """
+    # runtime of new node job has this weight in average
+    smoothing = 0.3
+
+    def __init__(self, otl_job_timings, weight=1.0, max_size=10000):
+        super().__init__(otl_job_timings)
+        self.weight = weight
+        self.max_size = max_size
+        # node job commands key -> average runtime
+        self._runtimes = OrderedDict()
+        # node job uuid hex -> timestamp when node job started running
+        self._start_timestamps = OrderedDict()
+
+    @classmethod
+    def from_config(cls, config, otl_job_timings):
+        return cls(otl_job_timings, float(config['shortest_job_first_weight']))
+
+    @staticmethod
+    def _commands_key(node_job_dict):
+        """
+        Node jobs with the same commands pipeline on the same computing node type have the same key.
+        Command arguments are not used because time window arguments make every query unique
+        """
+        return node_job_dict['computing_node_type'] + ' ' + ' | '.join(
+            str(command.get('name')) for command in node_job_dict['commands']
+        )
+
+    def expected_runtime(self, node_job_dict):
+        return self._runtimes.get(self._commands_key(node_job_dict), 0.0)
+
+    def score(self, score, node_job_dict):
+        return score + self.weight * self.expected_runtime(node_job_dict)
+
+    def node_job_status_changed(self, node_job_dict, previous_status, status):
+        # node job dict from queue has UUID object, from database has hex
+        node_job_uuid = UUID(str(node_job_dict['uuid'])).hex
+        if status == NodeJobStatus.RUNNING:
+            self._start_timestamps[node_job_uuid] = datetime.datetime.now().timestamp()
+            self._start_timestamps.move_to_end(node_job_uuid)
+            # node jobs whose final status was got by other dispatcher instance are forgotten
+            while len(self._start_timestamps) > self.max_size:
+                self._start_timestamps.popitem(last=False)
+            return
+
+        if node_job_uuid not in self._start_timestamps:
+            return
+        if status == NodeJobStatus.FINISHED:
+            runtime = datetime.datetime.now().timestamp() - self._start_timestamps.pop(node_job_uuid)
+            self._add_runtime(self._commands_key(node_job_dict), runtime)
+        elif status in (NodeJobStatus.FAILED, NodeJobStatus.CANCELED, NodeJobStatus.DECLINED_BY_COMPUTING_NODE):
+            del self._start_timestamps[node_job_uuid]
+
+    def _add_runtime(self, commands_key, runtime):
+        if commands_key in self._runtimes:
+            runtime = (1 - self.smoothing) * self._runtimes[commands_key] + self.smoothing * runtime
+        self._runtimes[commands_key] = runtime
+        self._runtimes.move_to_end(commands_key)
+        while len(self._runtimes) > self.max_size:
+            self._runtimes.popitem(last=False)
+
+
+class DeadlinePolicy(PriorityPolicy):
+    """
+    Score of node job is not greater than deadline of its otl job (creation time + timeout),
+    so other policies can't move node job with expiring timeout behind node jobs queued after its deadline
+    """
+    def score(self, score, node_job_dict):
+        otl_job_timing = self.otl_job_timings.get(node_job_dict)
+        if otl_job_timing is None:
+            return score
+        created_timestamp, timeout = otl_job_timing
+        # zero timeout means infinity
+        if timeout <= 0:
+            return score
+        return min(score, created_timestamp + timeout)
+
+
+# policy name in config -> policy class
+priority_policies = {
+    'fifo': FifoPolicy,
+    'aging': AgingPolicy,
+    'fair_share': FairSharePolicy,
+    'shortest_job_first': ShortestJobFirstPolicy,
+    'deadline': DeadlinePolicy,
+}
+
+
+class NodeJobPriority:
+    """
+    Calculates score of node job put in queue. Initial score is current timestamp,
+    then policies change it in the order they are listed.
+    Score is calculated without lock, because policies only read their state and may query database
+    """
+    def __init__(self, policies):
+        self.policies = policies
+        # policies keep state changed on every node job status change
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates policies listed in priority_policy option of config section
+        """
+        otl_job_timings = OtlJobTimings()
+        policies = []
+        for policy_name in config['priority_policy'].split():
+            if policy_name not in priority_policies:
+                log.error(f'Unknown node job priority policy: {policy_name}')
+                continue
+            policies.append(priority_policies[policy_name].from_config(config, otl_job_timings))
+        return cls(policies)
+
+    def score(self, node_job_dict) -> float:
+        score = datetime.datetime.now().timestamp()
+        for policy in self.policies:
+            score = policy.score(score, node_job_dict)
+        return score
+
+    @synchronized
+    def node_job_status_changed(self, node_job_dict, previous_status, status):
+        for policy in self.policies:
+            policy.node_job_status_changed(node_job_dict, previous_status, status)
+
+    @synchronized
+    def node_job_queue_reconciled(self, queued_node_job_dicts):
+        for policy in self.policies:
+            policy.node_job_queue_reconciled(queued_node_job_dicts)
+
+
+node_job_priority = NodeJobPriority.from_config(ini_config['dispatcher'])
@@ -1,13 +1,17 @@
 import json
+import threading
+from uuid import UUID
+from collections import defaultdict
 from rest_framework.renderers import JSONRenderer
 
 
-from typing import Union, Dict, Tuple
+from typing import Union, Dict, Tuple, List
 
 from core.settings import REDIS_CONFIG
 
 from otl_interpreter.settings import ini_config
 from otl_interpreter.utils.priority_queue import RedisPriorityQueue, PriorityQueue
+from otl_interpreter.utils.redis_connection import get_redis
 from otl_interpreter.dispatcher.message_serializers.otl_job import NodeJobSerializer
 
 class DictQueue(dict):
@@ -17,11 +21,15 @@ class DictQueue(dict):
     """
     def __init__(self, one_process_mode=False):
         self._one_process_mode = one_process_mode
+        self._lock = threading.Lock()
         super().__init__()
 
     def __missing__(self, key):
-        self[key] = self._create_queue_for_computing_node_type(key)
-        return self[key]
+        # queue for computing node type may be requested by several threads at once
+        with self._lock:
+            if not dict.__contains__(self, key):
+                self[key] = self._create_queue_for_computing_node_type(key)
+        return dict.__getitem__(self, key)
 
     def _create_queue_for_computing_node_type(
             self, computing_node: str
@@ -29,15 +37,22 @@ class DictQueue(dict):
         if self._one_process_mode:
             return PriorityQueue()
         else:
-            return RedisPriorityQueue(computing_node, REDIS_CONFIG)
+            return RedisPriorityQueue(computing_node, REDIS_CONFIG, get_redis(REDIS_CONFIG))
 
 
 class NodeJobQueue:
-    def __init__(self, one_process_mode=False):
-
+    def __init__(self, one_process_mode=False, lease_time=60):
+        """
+        :param one_process_mode: if True queues are kept in process memory, otherwise in redis
+        :param lease_time: seconds to keep reserved node job before returning it to queue
+        """
         self.queues: Dict[str, Union[RedisPriorityQueue, PriorityQueue]]
 
         self.queues = DictQueue(one_process_mode)
+        self.lease_time = lease_time
+
+        # reserved node jobs, node job uuid -> (computing node type, queue element)
+        self._reserved = {}
 
     def add(self, node_job_dict: dict, priority_score: float) -> None:
         """
@@ -54,12 +69,93 @@ class NodeJobQueue:
         """
         Returns tuple node job dict with lowest score and it's score
         """
-        node_job_dict_bin, priority = self.queues[computing_node_type].pop(count=1, min_score=True)[0]
+        return self.pop_many(computing_node_type, 1)[0]
+
+    def pop_many(self, computing_node_type: str, count: int) -> List[Tuple[dict, float]]:
+        """
+        Returns list of <count> tuples node job dict and it's score with lowest scores
+        If there is less node jobs in queue returns all of them
+        """
+        return [
+            (self._decode_node_job(node_job_dict_bin), priority, )
+            for node_job_dict_bin, priority in self.queues[computing_node_type].pop(count=count, min_score=True)
+        ]
+
+    def reserve_many(self, computing_node_type: str, count: int) -> List[Tuple[dict, float]]:
+        """
+        Takes from queue <count> node jobs with lowest scores like pop_many,
+        but node jobs return to queue if they are not acknowledged during lease time
+        """
+        node_jobs = list()
+        for node_job_dict_bin, priority in self.queues[computing_node_type].reserve(
+            count=count, min_score=True, lease_time=self.lease_time
+        ):
+            node_job_dict = self._decode_node_job(node_job_dict_bin)
+            self._reserved[node_job_dict['uuid']] = (computing_node_type, node_job_dict_bin)
+            node_jobs.append(
+                (node_job_dict, priority, )
+            )
+        return node_jobs
+
+    def ack(self, *node_job_uuids: UUID) -> None:
+        """
+        Acknowledges that reserved node jobs were processed
+        """
+        for computing_node_type, elements in self._pop_reserved_elements(node_job_uuids).items():
+            self.queues[computing_node_type].ack(*elements)
+
+    def requeue(self, *node_job_uuids: UUID) -> None:
+        """
+        Returns reserved node jobs to queues with the same scores
+        """
+        for computing_node_type, elements in self._pop_reserved_elements(node_job_uuids).items():
+            self.queues[computing_node_type].requeue(*elements)
+
+    def _pop_reserved_elements(self, node_job_uuids):
+        """
+        Returns queue elements of reserved node jobs grouped by computing node types and forgets them
+        """
+        elements_by_types = defaultdict(list)
+        for node_job_uuid in node_job_uuids:
+            reserved_element = self._reserved.pop(node_job_uuid, None)
+            if reserved_element is not None:
+                computing_node_type, node_job_dict_bin = reserved_element
+                elements_by_types[computing_node_type].append(node_job_dict_bin)
+        return elements_by_types
+
+    def requeue_expired(self) -> int:
+        """
+        Returns to queues reserved node jobs with expired lease
+        Returns number of node jobs returned to queues
+        """
+        return sum(
+            queue.requeue_expired() for queue in list(self.queues.values())
+        )
 
-        njs = NodeJobSerializer(data=json.loads(node_job_dict_bin))
-        njs.is_valid()
-        node_job_dict = njs.validated_data
-        return node_job_dict, priority
+    def queued_node_jobs(self, computing_node_type: str) -> Dict[UUID, List[bytes]]:
+        """
+        Returns dictionary node job uuid -> queue elements of node job, reserved node jobs are included
+        """
+        node_jobs = defaultdict(list)
+        for node_job_dict_bin in self.queues[computing_node_type].elements():
+            node_jobs[self._decode_node_job(node_job_dict_bin)['uuid']].append(node_job_dict_bin)
+        return dict(node_jobs)
+
+    def remove(self, computing_node_type: str, *elements: bytes) -> None:
+        """
+        Removes elements returned by queued_node_jobs from queue
+        """
+        self.queues[computing_node_type].remove(*elements)
+
+    @staticmethod
+    def _decode_node_job(node_job_dict_bin) -> dict:
+        """
+        Node job in queue was rendered by NodeJobSerializer, so it is decoded without validation
+        """
+        node_job_dict = json.loads(node_job_dict_bin)
+        node_job_dict['uuid'] = UUID(node_job_dict['uuid'])
+        node_job_dict['user_guid'] = UUID(node_job_dict['user_guid'])
+        return node_job_dict
 
     def node_jobs_in_queue(self, computing_node_type: str):
         """
@@ -69,14 +165,15 @@ class NodeJobQueue:
 
     def computing_node_types(self):
         """
-        Returns iterable ( dict keys ) of computing node types
+        Returns list of computing node types
         """
-        return self.queues.keys()
+        return list(self.queues.keys())
 
 
 dispatcher_config = ini_config['dispatcher']
 
 node_job_queue = NodeJobQueue(
-    one_process_mode=(dispatcher_config['one_process_mode'].lower() == 'true')
+    one_process_mode=(dispatcher_config['one_process_mode'].lower() == 'true'),
+    lease_time=int(dispatcher_config['node_job_lease_time']),
 )
 
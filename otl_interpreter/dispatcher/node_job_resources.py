@@ -0,0 +1,78 @@
+import logging
+import threading
+
+from datetime import datetime, timedelta
+
+from otl_interpreter.interpreter_db import node_commands_manager
+from otl_interpreter.utils.synchronized import synchronized
+
+log = logging.getLogger('otl_interpreter.dispatcher.node_job_resources')
+
+
+class NodeJobResourceDemand:
+    """
+    Calculates resources node job needs from resource necessity of its commands.
+    Commands of node job run one after another, so node job needs maximum of each resource over its commands.
+    Resource necessity of commands is kept in memory and reloaded when commands are updated
+    """
+    def __init__(self, check_period=10, max_demands=10000):
+        """
+        :param check_period: seconds between checks if commands were updated
+        :param max_demands: max number of calculated demands kept for computing node type
+        """
+        self.check_period = timedelta(seconds=check_period)
+        self.max_demands = max_demands
+
+        # computing node type -> (dictionary command name -> resource necessity, load timestamp)
+        self._commands_resource_necessity = {}
+        self._last_check = datetime.min
+
+        # computing node type -> {tuple of command names: resource demand}
+        self._demands = {}
+
+        self._lock = threading.RLock()
+
+    def _check_commands_updated(self):
+        now = datetime.now()
+        if now - self._last_check < self.check_period:
+            return
+        self._last_check = now
+        for computing_node_type, (_, load_timestamp) in list(self._commands_resource_necessity.items()):
+            if node_commands_manager.commands_were_updated(load_timestamp):
+                log.info(f'Commands were updated, reload resource necessity of {computing_node_type} commands')
+                del self._commands_resource_necessity[computing_node_type]
+                self._demands.pop(computing_node_type, None)
+
+    def _get_commands_resource_necessity(self, computing_node_type):
+        if computing_node_type not in self._commands_resource_necessity:
+            self._commands_resource_necessity[computing_node_type] = (
+                node_commands_manager.get_commands_resource_necessity(computing_node_type),
+                datetime.now(),
+            )
+        return self._commands_resource_necessity[computing_node_type][0]
+
+    @synchronized
+    def get(self, node_job_dict) -> dict:
+        """
+        Returns dictionary resource name: amount that node job needs
+        Resources not mentioned in dictionary are considered to be needed in one unit
+        """
+        self._check_commands_updated()
+        computing_node_type = node_job_dict['computing_node_type']
+        command_names = tuple(command.get('name') for command in node_job_dict['commands'])
+
+        demands = self._demands.setdefault(computing_node_type, {})
+        if command_names not in demands:
+            commands_resource_necessity = self._get_commands_resource_necessity(computing_node_type)
+            demand = {}
+            for command_name in command_names:
+                for resource, amount in commands_resource_necessity.get(command_name, {}).items():
+                    demand[resource] = max(demand.get(resource, 0), amount)
+            # distinct command pipelines are not limited, so demands are forgotten when there are too many of them
+            if len(demands) >= self.max_demands:
+                demands.clear()
+            demands[command_names] = demand
+        return demands[command_names]
+
+
+node_job_resource_demand = NodeJobResourceDemand()
@@ -1,20 +1,26 @@
 import logging
 import json
-import datetime
+import threading
 
 from uuid import UUID
+from collections import defaultdict
+from contextlib import contextmanager
 from typing import List
-from asgiref.sync import sync_to_async
-from rest_framework.renderers import JSONRenderer
 
-from message_broker import Producer
-
-from otl_interpreter.interpreter_db.enums import NodeJobStatus, JobStatus, ResultStorage, ResultStatus
-from otl_interpreter.interpreter_db import node_job_manager, otl_job_manager
+from otl_interpreter.interpreter_db.enums import NodeJobStatus, JobStatus, ResultStorage, ResultStatus, END_STATUSES
+from otl_interpreter.interpreter_db import node_job_manager, otl_job_manager, node_commands_manager
 
+from db_executor import db_executor
+from lock import Lock
 from computing_node_pool import computing_node_pool
+from node_job_cache import node_job_cache
+from node_job_priority import node_job_priority
+from node_job_resources import node_job_resource_demand
 
 from node_job_queue import node_job_queue
+from queue_wakeup import queue_wakeup
+from reservation_release import reservation_release
+from job_message_sender import job_message_sender
 from message_serializers.otl_job import NodeJobSerializer
 
 log = logging.getLogger('otl_interpreter.dispatcher')
@@ -54,6 +60,12 @@ allowed_state_transfer_table = {
     NodeJobStatus.FAILED: {NodeJobStatus.CANCELED, },
 }
 
+# after these statuses computing node doesn't run node job, so resources reserved for node job are released.
+# Running node job keeps its reservation until the next resource status of computing node includes its usage
+resource_releasing_statuses = {
+    NodeJobStatus.FINISHED, NodeJobStatus.DECLINED_BY_COMPUTING_NODE, NodeJobStatus.FAILED, NodeJobStatus.CANCELED,
+}
+
 
 class NodeJobStatusManager:
     """
@@ -86,21 +98,34 @@ class NodeJobStatusManager:
             }
         }
 
-        # if Producer() throws error del method shouldn't invoke producer.stop()
-        self.producer = None
+        # state of status changes in progress, status changes run concurrently in database worker threads
+        self._local = threading.local()
+
+    @property
+    def _checking_queue_types(self):
+        """
+        Computing node types whose queues are being checked by current thread, to avoid recursive queue checks
+        """
+        if not hasattr(self._local, 'checking_queue_types'):
+            self._local.checking_queue_types = set()
+        return self._local.checking_queue_types
 
-        self.producer = Producer()
-        self.producer.start()
+    @property
+    def _message_buffer(self):
+        """
+        List of (computing node uuid, message) to send together, None if messages are sent immediately
+        """
+        return getattr(self._local, 'message_buffer', None)
 
-    def __del__(self):
-        if self.producer:
-            self.producer.stop()
+    @_message_buffer.setter
+    def _message_buffer(self, message_buffer):
+        self._local.message_buffer = message_buffer
 
     @staticmethod
     def is_next_node_job_status_allowed(cur_status, next_status):
         return next_status in allowed_state_transfer_table[cur_status]
 
-    @sync_to_async
+    @db_executor
     def change_node_job_status(
             self, node_job_uuid: UUID,
             status: NodeJobStatus,
@@ -119,15 +144,55 @@ class NodeJobStatusManager:
         """
         return self._change_node_job_status(node_job_uuid, status, status_text, node_job_dict)
 
-    @sync_to_async
-    def check_job_queue(self):
+    @db_executor
+    def change_node_job_statuses(self, status_changes):
+        """
+        Changes status for several node jobs, writing status changes to database in bulk
+        :param status_changes: iterable of tuples (node_job_uuid, status, status_text, node_job_dict)
+        """
+        return self._change_node_job_statuses(status_changes)
+
+    @db_executor
+    def check_job_queue(self, computing_node_types=None):
         """
         Task to check periodicaly node job queue
+        :param computing_node_types: list of computing node types whose queues are checked,
+        if None all queues known to dispatcher are checked
         """
-        for computing_node_type in node_job_queue.computing_node_types():
+        # node jobs reserved by failed dispatcher return to queue
+        requeued_node_jobs = node_job_queue.requeue_expired()
+        if requeued_node_jobs:
+            log.warning(f'{requeued_node_jobs} node jobs were not processed during lease time and returned to queue')
+
+        if computing_node_types is None:
+            computing_node_types = node_job_queue.computing_node_types()
+        for computing_node_type in computing_node_types:
             self._check_job_queue(computing_node_type)
 
-    @sync_to_async
+    @db_executor
+    def reconcile_node_job_queue(self):
+        """
+        Makes node job queues consistent with node job statuses in database.
+        Node jobs lost from queues are put back, node jobs that were finished, failed or canceled are removed.
+        Only one dispatcher instance reconciles queues at once
+        """
+        reconciliation_lock = Lock(key='node_job_queue_reconciliation')
+        if not reconciliation_lock.acquire(blocking=False):
+            log.debug('Node job queues are reconciled by other dispatcher instance')
+            return
+        try:
+            self._reconcile_node_job_queue()
+        finally:
+            reconciliation_lock.release()
+
+    @db_executor
+    def cancel_otl_job(self, otl_job_uuid: UUID, status_text: str):
+        """
+        Cancels all unfinished node jobs of otl job
+        """
+        return self._cancel_otl_job(otl_job_uuid, status_text)
+
+    @db_executor
     def inactive_computing_node(self, computing_node_uuid: UUID):
         """
         Process situation when computing node became inactive
@@ -135,10 +200,10 @@ class NodeJobStatusManager:
         # get jobs running on inactive nodes
         node_job_uuids: List[UUID] = node_job_manager.get_running_node_job_uuids_for_computing_node(computing_node_uuid)
         # for all jobs set FAIL status
-        for node_job_uuid in node_job_uuids:
-            self._change_node_job_status(
-                node_job_uuid, NodeJobStatus.FAILED, 'Computing node doesn\'t respond to dispatcher'
-            )
+        self._change_node_job_statuses(
+            (node_job_uuid, NodeJobStatus.FAILED, 'Computing node doesn\'t respond to dispatcher', None)
+            for node_job_uuid in node_job_uuids
+        )
 
     # ==================================================================================================================
     # _on_* functions are "callbacks" on node job state changing
@@ -149,7 +214,7 @@ class NodeJobStatusManager:
     def _on_ready_to_execute(self, node_job_uuid, node_job_dict=None):
 
         if node_job_dict is None:
-            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            node_job_dict = self._get_node_job_dict(node_job_uuid)
 
         # check if the same result exists
         result_status = node_job_manager.get_result_status(node_job_dict['storage'], node_job_dict['path'])
@@ -169,11 +234,13 @@ class NodeJobStatusManager:
             )
             return
 
-        # find computing node to execute
+        # find computing node with enough resources to execute and reserve resources on it
         find_only_local_computing_nodes = node_job_dict['storage'] == ResultStorage.LOCAL_POST_PROCESSING
-        computing_node_uuid = computing_node_pool.get_least_loaded_node(
+        computing_node_uuid = computing_node_pool.reserve_node(
             node_job_dict['computing_node_type'],
-            find_only_local_computing_nodes
+            node_job_resource_demand.get(node_job_dict),
+            find_only_local_computing_nodes,
+            node_job_uuid=node_job_dict['uuid'],
         )
 
         # if not found move node job to queue
@@ -192,7 +259,7 @@ class NodeJobStatusManager:
         node_job_dict['status'] = NodeJobStatus.READY_TO_EXECUTE
 
         self._send_message_to_computing_node(
-            computing_node_uuid, JSONRenderer().render(NodeJobSerializer(node_job_dict).data)
+            computing_node_uuid, NodeJobSerializer(node_job_dict).data
         )
 
         self._change_node_job_status(
@@ -207,7 +274,7 @@ class NodeJobStatusManager:
 
     def _on_taken_from_queue(self, node_job_uuid, node_job_dict=None):
         if node_job_dict is None:
-            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            node_job_dict = self._get_node_job_dict(node_job_uuid)
 
         self._change_node_job_status(
             node_job_uuid,
@@ -222,7 +289,7 @@ class NodeJobStatusManager:
     def _on_declined_by_computing_node(self, node_job_uuid, node_job_dict=None):
         # just put job to the queue
         if node_job_dict is None:
-            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            node_job_dict = self._get_node_job_dict(node_job_uuid)
 
         self._put_node_job_in_queue(node_job_dict)
 
@@ -237,10 +304,10 @@ class NodeJobStatusManager:
 
     def _on_running(self, node_job_uuid, node_job_dict=None):
         if node_job_dict is None:
-            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            node_job_dict = self._get_node_job_dict(node_job_uuid)
 
         # change otl job status
-        otl_job_uuid = node_job_manager.get_otl_job_uuid(node_job_uuid)
+        otl_job_uuid = self._get_otl_job_uuid(node_job_uuid, node_job_dict)
         otl_job_manager.change_otl_job_status(otl_job_uuid, JobStatus.RUNNING)
 
         result_status = node_job_manager.get_result_status(node_job_dict['storage'], node_job_dict['path'])
@@ -258,7 +325,7 @@ class NodeJobStatusManager:
         log.debug(f'node_job_finished {node_job_uuid}')
 
         if node_job_dict is None:
-            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            node_job_dict = self._get_node_job_dict(node_job_uuid)
 
         result_status = node_job_manager.get_result_status(node_job_dict['storage'], node_job_dict['path'])
         # to avoid recursively changing status on waiting the same result node jobs
@@ -288,7 +355,7 @@ class NodeJobStatusManager:
                 next_node_job_dict
             )
         elif node_job_manager.is_root_node_job(node_job_uuid):
-            otl_job_uuid = node_job_manager.get_otl_job_uuid(node_job_uuid)
+            otl_job_uuid = self._get_otl_job_uuid(node_job_uuid, node_job_dict)
             otl_job_manager.change_otl_job_status(
                 otl_job_uuid, JobStatus.FINISHED,
                 f'All node jobs successfully finished'
@@ -307,7 +374,7 @@ class NodeJobStatusManager:
         Sends cancel message to computing node
         """
         if node_job_dict is None:
-            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            node_job_dict = self._get_node_job_dict(node_job_uuid)
 
         #  if waiting same result exists do not cancel running tasks
         waiting_same_result_node_jobs = node_job_manager.get_waiting_same_result_node_jobs(
@@ -316,31 +383,25 @@ class NodeJobStatusManager:
         # if nodejob canceled but results are awaited by other nodejob then do not actually cancel it/
         if len(waiting_same_result_node_jobs) == 0:
             node_job_manager.set_result_status(node_job_dict['storage'], node_job_dict['path'], ResultStatus.NOT_EXIST)
-            self._cancel_running_node_job(node_job_uuid)
+            self._cancel_running_node_jobs(
+                node_job_manager.get_computing_node_for_node_job(node_job_uuid), [node_job_uuid]
+            )
 
             # also check job queue because job was canceled and resources release
             self._check_job_queue(node_job_dict['computing_node_type'])
 
     def _on_failed(self, node_job_uuid, node_job_dict=None):
         if node_job_dict is None:
-            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            node_job_dict = self._get_node_job_dict(node_job_uuid)
 
-        otl_job_uuid = node_job_manager.get_otl_job_uuid(node_job_uuid)
+        otl_job_uuid = self._get_otl_job_uuid(node_job_uuid, node_job_dict)
         otl_job_manager.change_otl_job_status(
             otl_job_uuid,
             JobStatus.FAILED,
             f'Failed because of node job: {node_job_uuid}'
         )
-        # find other running jobs and cancel them
-        running_jobs_uuids = node_job_manager.get_node_jobs_for_cancelling(node_job_uuid)
-
-        log.debug(f'Running jobs for canceling: {str(running_jobs_uuids)}')
-
-        for job_uuid in running_jobs_uuids:
-            self._change_node_job_status(
-                job_uuid, NodeJobStatus.CANCELED,
-                f'Cancelled because of node job fail: {node_job_uuid}'
-            )
+        # cancel other node jobs of otl job
+        self._cancel_otl_job(otl_job_uuid, f'Cancelled because of node job fail: {node_job_uuid}')
 
         # also set failed waiting the same result node jobs
         result_status = node_job_manager.get_result_status(
@@ -374,11 +435,35 @@ class NodeJobStatusManager:
     ):
         log.info(f'Change node job {str(node_job_uuid)} status to {str(status)}. {status_text}')
 
+        node_job_dict = self._prepare_status_change(node_job_uuid, status, status_text, node_job_dict)
         if node_job_dict is None:
-            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            return
+        cur_status = node_job_dict['status']
+
+        # set status on db only if nobody changed it since node job dictionary was read,
+        # status is written immediately even inside batch, so actions are made only for written status
+        if not node_job_manager.change_node_job_status(node_job_uuid, status, status_text, cur_status, batched=False):
+            # node job dictionary is stale, status was changed by other dispatcher instance
+            node_job_cache.invalidate(node_job_uuid)
+            actual_node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            if actual_node_job_dict is None or actual_node_job_dict['status'] == cur_status:
+                log.error(f'Failed to change node job {node_job_uuid} status to {status}')
+                return
+            self._change_node_job_status(node_job_uuid, status, status_text, actual_node_job_dict)
+            return
+
+        self._on_status_written(node_job_uuid, node_job_dict, status)
+
+    def _prepare_status_change(self, node_job_uuid, status, status_text, node_job_dict=None):
+        """
+        Returns node job dictionary with status from which status change is allowed,
+        or None if status change is dropped or it only refreshes status text
+        """
+        if node_job_dict is None:
+            node_job_dict = self._get_node_job_dict(node_job_uuid)
             if node_job_dict is None:
                 log.error(f'Impossible to change node job status with uuid {str(node_job_uuid)}, node job not exist')
-                return
+                return None
 
         cur_status = node_job_dict['status']
 
@@ -386,20 +471,42 @@ class NodeJobStatusManager:
         if cur_status == status and status_text is not None:
             # just refresh status text
             log.info(f'Refresh node job status, node job uuid {node_job_uuid}, status: {status_text}')
-            node_job_manager.change_node_job_status(node_job_uuid, status, status_text)
-            return
+            if not node_job_manager.change_node_job_status(node_job_uuid, status, status_text, cur_status):
+                node_job_cache.invalidate(node_job_uuid)
+            return None
 
         if not self.is_next_node_job_status_allowed(cur_status, status):
+            # node job dictionary may be stale, status could be changed by other dispatcher process,
+            # so status change is dropped only if it isn't allowed from status in database
+            node_job_cache.invalidate(node_job_uuid)
+            actual_node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            if actual_node_job_dict is not None and actual_node_job_dict['status'] != cur_status:
+                node_job_cache.set(node_job_uuid, actual_node_job_dict)
+                if self.is_next_node_job_status_allowed(actual_node_job_dict['status'], status):
+                    return actual_node_job_dict
+                cur_status = actual_node_job_dict['status']
+
             log.warning(
                 f'Trying set not allowed node job status. NodeJob uuid: {node_job_uuid},\
                  status: {cur_status}, next status: {status}'
             )
-            return
+            return None
+
+        return node_job_dict
+
+    def _on_status_written(self, node_job_uuid, node_job_dict, status):
+        """
+        Updates dispatcher state and makes actions after status change was written to database
+        """
+        cur_status = node_job_dict['status']
 
-        # set status on db
-        node_job_manager.change_node_job_status(node_job_uuid, status, status_text)
         # change status in node_job_dict
         node_job_dict['status'] = status
+        node_job_cache.set(node_job_uuid, node_job_dict)
+        node_job_priority.node_job_status_changed(node_job_dict, cur_status, status)
+        if status in resource_releasing_statuses:
+            if reservation_release.release(node_job_uuid, node_job_dict['computing_node_type']):
+                queue_wakeup.wake(node_job_dict['computing_node_type'])
 
         # make actions on state change from one value to another
         if cur_status in self.status_transit_action_table and status in self.status_transit_action_table[cur_status]:
@@ -409,35 +516,273 @@ class NodeJobStatusManager:
         if status in self.status_action_table:
             self.status_action_table[status](node_job_uuid, node_job_dict)
 
-    def _cancel_running_node_job(self, node_job_uuid: UUID):
-        computing_node_uuid = node_job_manager.get_computing_node_for_node_job(node_job_uuid)
-        message_dict = {
-            'uuid': node_job_uuid,
-            'status': NodeJobStatus.CANCELED
-        }
-        self._send_message_to_computing_node(computing_node_uuid, JSONRenderer().render(message_dict))
+    def _change_node_job_statuses(self, status_changes):
+        """
+        Changes status for several node jobs, status changes are written to database inside one batch,
+        actions are made after batch is written only for node jobs whose status was really changed.
+        Status changes that failed because node job status was changed by other dispatcher instance
+        are repeated with actual node job status
+        """
+        prepared_status_changes = []
+        with node_job_manager.batch_status_changes() as failed_status_changes:
+            # batch may be opened by caller, its failed status changes are left to caller
+            failed_changes_start = len(failed_status_changes)
+            for node_job_uuid, status, status_text, node_job_dict in status_changes:
+                node_job_dict = self._prepare_status_change(node_job_uuid, status, status_text, node_job_dict)
+                if node_job_dict is None:
+                    continue
+                node_job_manager.change_node_job_status(node_job_uuid, status, status_text, node_job_dict['status'])
+                prepared_status_changes.append((node_job_uuid, status, node_job_dict))
+
+            node_job_manager.write_status_changes()
+            stale_status_changes = failed_status_changes[failed_changes_start:]
+            del failed_status_changes[failed_changes_start:]
+
+        stale_node_job_uuids = {UUID(str(node_job_uuid)).hex for node_job_uuid, _, _ in stale_status_changes}
+        for node_job_uuid, status, node_job_dict in prepared_status_changes:
+            if UUID(str(node_job_uuid)).hex not in stale_node_job_uuids:
+                self._on_status_written(node_job_uuid, node_job_dict, status)
+
+        for node_job_uuid, status, status_text in stale_status_changes:
+            node_job_cache.invalidate(node_job_uuid)
+            self._change_node_job_status(node_job_uuid, status, status_text)
+
+    def _cancel_otl_job(self, otl_job_uuid, status_text):
+        """
+        Cancels unfinished node jobs of otl job with number of queries that doesn't depend on number of node jobs.
+        Node jobs are loaded with one query, status changes are written with one update query per previous status,
+        running node jobs are canceled with messages grouped by computing node.
+        Node jobs whose status was changed meanwhile by other dispatcher instance are canceled one by one
+        """
+        node_jobs = node_job_manager.get_otl_job_node_jobs_for_cancelling(otl_job_uuid)
+        if not node_jobs:
+            return
+        log.info(f'Cancel {len(node_jobs)} node jobs of otl job {otl_job_uuid}. {status_text}')
+
+        canceled_node_jobs = []
+        with node_job_manager.batch_status_changes() as failed_status_changes:
+            # batch may be opened by caller, its failed status changes are left to caller
+            failed_changes_start = len(failed_status_changes)
+            for node_job_dict, computing_node_uuid, result_is_awaited in node_jobs:
+                if not self.is_next_node_job_status_allowed(node_job_dict['status'], NodeJobStatus.CANCELED):
+                    log.warning(
+                        f'Trying set not allowed node job status. NodeJob uuid: {node_job_dict["uuid"]}, '
+                        f'status: {node_job_dict["status"]}, next status: {NodeJobStatus.CANCELED}'
+                    )
+                    continue
+                node_job_manager.change_node_job_status(
+                    node_job_dict['uuid'], NodeJobStatus.CANCELED, status_text, node_job_dict['status']
+                )
+                canceled_node_jobs.append((node_job_dict, computing_node_uuid, result_is_awaited))
+
+            node_job_manager.write_status_changes()
+            stale_status_changes = failed_status_changes[failed_changes_start:]
+            del failed_status_changes[failed_changes_start:]
+
+        stale_node_job_uuids = {UUID(str(node_job_uuid)).hex for node_job_uuid, _, _ in stale_status_changes}
+
+        # computing node uuid -> node job uuids to cancel on it
+        running_node_job_uuids = defaultdict(list)
+        not_calculated_results = []
+        released_computing_node_types = set()
+        for node_job_dict, computing_node_uuid, result_is_awaited in canceled_node_jobs:
+            if node_job_dict['uuid'] in stale_node_job_uuids:
+                continue
+
+            cur_status = node_job_dict['status']
+            node_job_dict['status'] = NodeJobStatus.CANCELED
+            node_job_cache.set(node_job_dict['uuid'], node_job_dict)
+            node_job_priority.node_job_status_changed(node_job_dict, cur_status, NodeJobStatus.CANCELED)
+            if reservation_release.release(node_job_dict['uuid'], node_job_dict['computing_node_type']):
+                released_computing_node_types.add(node_job_dict['computing_node_type'])
+
+            # if result is awaited by node jobs of other otl jobs, node job is not canceled on computing node
+            if cur_status == NodeJobStatus.RUNNING and not result_is_awaited:
+                not_calculated_results.append((node_job_dict['storage'], node_job_dict['path']))
+                if computing_node_uuid is not None:
+                    running_node_job_uuids[computing_node_uuid].append(node_job_dict['uuid'])
+                released_computing_node_types.add(node_job_dict['computing_node_type'])
+
+            self.status_action_table[NodeJobStatus.CANCELED](node_job_dict['uuid'], node_job_dict)
+
+        node_job_manager.set_result_statuses(not_calculated_results, ResultStatus.NOT_EXIST)
+        with self._buffered_messages():
+            for computing_node_uuid, node_job_uuids in running_node_job_uuids.items():
+                self._cancel_running_node_jobs(computing_node_uuid, node_job_uuids)
+
+        for node_job_uuid, status, stale_status_text in stale_status_changes:
+            node_job_cache.invalidate(node_job_uuid)
+            self._change_node_job_status(node_job_uuid, status, stale_status_text)
+
+        for computing_node_type in released_computing_node_types:
+            queue_wakeup.wake(computing_node_type)
+
+    @staticmethod
+    def _get_node_job_dict(node_job_uuid):
+        """
+        Returns node job dictionary from cache or from database
+        """
+        node_job_dict = node_job_cache.get(node_job_uuid)
+        if node_job_dict is None:
+            node_job_dict = node_job_manager.get_node_job_dict(node_job_uuid)
+            if node_job_dict is not None:
+                node_job_cache.set(node_job_uuid, node_job_dict)
+        return node_job_dict
+
+    @staticmethod
+    def _get_otl_job_uuid(node_job_uuid, node_job_dict=None):
+        """
+        Returns otl job uuid from node job dictionary if it is there, otherwise from database
+        """
+        if node_job_dict is not None and 'otl_job_uuid' in node_job_dict:
+            return node_job_dict['otl_job_uuid']
+        return node_job_manager.get_otl_job_uuid(node_job_uuid)
+
+    def _cancel_running_node_jobs(self, computing_node_uuid: UUID, node_job_uuids):
+        """
+        Sends cancel messages for node jobs running on computing node,
+        computing node supporting batch protocol gets them in one batch
+        """
+        for node_job_uuid in node_job_uuids:
+            message_dict = {
+                'uuid': node_job_uuid,
+                'status': NodeJobStatus.CANCELED
+            }
+            self._send_message_to_computing_node(computing_node_uuid, message_dict)
 
     def _send_message_to_computing_node(self, computing_node_uuid: UUID, message):
         """
         Sends message to topic for computing node
+        Messages to computing nodes supporting batch protocol are sent in batches by job message sender
         :param computing_node_uuid: compurtingg node uuid
-        :param message: message, str or bytes
+        :param message: message dictionary
         :return:
         """
-        self.producer.send(f"{computing_node_uuid.hex}_job", message)
+        if self._message_buffer is not None:
+            self._message_buffer.append((computing_node_uuid, message))
+            return
+
+        # statuses must be in database before computing node answers
+        node_job_manager.write_status_changes()
+        job_message_sender.send(
+            computing_node_uuid, message, computing_node_pool.protocol_version(computing_node_uuid)
+        )
+
+    @contextmanager
+    def _buffered_messages(self):
+        """
+        Context manager, collects messages to computing nodes and sends them together on exit,
+        batches of computing nodes that got messages are sent without waiting for batch delay
+        """
+        if self._message_buffer is not None:
+            yield
+            return
+
+        self._message_buffer = []
+        try:
+            yield
+        finally:
+            messages, self._message_buffer = self._message_buffer, None
+            for computing_node_uuid, message in messages:
+                self._send_message_to_computing_node(computing_node_uuid, message)
+            for computing_node_uuid in {computing_node_uuid for computing_node_uuid, _ in messages}:
+                job_message_sender.flush(computing_node_uuid)
 
     def _check_job_queue(self, computing_node_type):
         """
-        Checks len of job queue for computing node type and take one node job
-        When node job is taken the next state method will try to send it to computing node
+        Takes from queue as many node jobs as computing nodes of that type have free slots for
+        When node job is taken the next state method sends it to computing node with enough resources.
+        Node jobs that don't fit any computing node return to queue with the same score
         """
-        if node_job_queue.node_jobs_in_queue(computing_node_type):
-            node_job, priority = node_job_queue.pop(computing_node_type)
-            self._change_node_job_status(
-                node_job['uuid'],
-                NodeJobStatus.TAKEN_FROM_QUEUE,
-                f'Taken from queue to find computing node',
-                node_job
+        if computing_node_type in self._checking_queue_types:
+            return
+
+        free_slots = computing_node_pool.free_slots(computing_node_type)
+        if free_slots < 1:
+            return
+
+        self._checking_queue_types.add(computing_node_type)
+        # node jobs are acknowledged after messages are sent,
+        # node jobs that weren't processed return to queue when lease expires
+        processed_node_job_uuids = []
+        not_fitting_node_job_uuids = []
+        try:
+            node_jobs = node_job_queue.reserve_many(computing_node_type, free_slots)
+            if node_jobs:
+                log.debug(f'Taken {len(node_jobs)} node jobs from {computing_node_type} queue')
+
+            with self._buffered_messages():
+                for node_job, priority in node_jobs:
+                    if not computing_node_pool.has_fitting_node(
+                        computing_node_type,
+                        node_job_resource_demand.get(node_job),
+                        node_job['storage'] == ResultStorage.LOCAL_POST_PROCESSING
+                    ):
+                        not_fitting_node_job_uuids.append(node_job['uuid'])
+                        continue
+
+                    self._change_node_job_status(
+                        node_job['uuid'],
+                        NodeJobStatus.TAKEN_FROM_QUEUE,
+                        f'Taken from queue to find computing node',
+                        node_job
+                    )
+                    processed_node_job_uuids.append(node_job['uuid'])
+        finally:
+            node_job_queue.ack(*processed_node_job_uuids)
+            node_job_queue.requeue(*not_fitting_node_job_uuids)
+            self._checking_queue_types.discard(computing_node_type)
+
+    def _reconcile_node_job_queue(self):
+        # queues are read before database, so node job taken from queue and processed meanwhile
+        # is never returned to queue, node job put to queue meanwhile may be put twice,
+        # its second copy is dropped when taken because status transfer is not allowed
+        computing_node_types = set(node_job_queue.computing_node_types()) | node_commands_manager.get_node_types()
+        queued_node_jobs = {}
+        for computing_node_type in computing_node_types:
+            for node_job_uuid, elements in node_job_queue.queued_node_jobs(computing_node_type).items():
+                queued_node_jobs[node_job_uuid] = (computing_node_type, elements)
+
+        node_job_dicts = node_job_manager.get_node_jobs_with_statuses(
+            [NodeJobStatus.IN_QUEUE, NodeJobStatus.TAKEN_FROM_QUEUE]
+        )
+
+        recovered_node_jobs = 0
+        with self._buffered_messages():
+            for node_job_dict in node_job_dicts:
+                node_job_uuid = UUID(node_job_dict['uuid'])
+                if node_job_uuid in queued_node_jobs:
+                    continue
+
+                recovered_node_jobs += 1
+                if node_job_dict['status'] == NodeJobStatus.IN_QUEUE:
+                    self._put_node_job_in_queue(node_job_dict)
+                else:
+                    # dispatcher failed after node job was taken from queue
+                    self._change_node_job_status(
+                        node_job_uuid, NodeJobStatus.READY_TO_EXECUTE,
+                        f'Checking for available computing node after dispatcher failure',
+                        node_job_dict
+                    )
+
+        # numbers of node jobs in queue kept by priority policies could drift because of dispatcher failures
+        node_job_priority.node_job_queue_reconciled([
+            node_job_dict for node_job_dict in node_job_dicts if node_job_dict['status'] == NodeJobStatus.IN_QUEUE
+        ])
+
+        # node jobs with end statuses never return to queue
+        node_job_statuses = node_job_manager.get_node_job_statuses(queued_node_jobs.keys())
+        removed_node_jobs = 0
+        for node_job_uuid, (computing_node_type, elements) in queued_node_jobs.items():
+            node_job_status = node_job_statuses.get(node_job_uuid)
+            if node_job_status is None or node_job_status in END_STATUSES:
+                node_job_queue.remove(computing_node_type, *elements)
+                removed_node_jobs += 1
+
+        if recovered_node_jobs or removed_node_jobs:
+            log.warning(
+                f'Node job queues reconciled: {recovered_node_jobs} node jobs returned to queue, '
+                f'{removed_node_jobs} node jobs removed from queue'
             )
 
     def _put_node_job_in_queue(self, node_job_dict):
@@ -448,12 +793,12 @@ class NodeJobStatusManager:
 
         node_job_queue.add(
             node_job_queue_dict,
-            self._calculate_node_job_priority_for_queue(),
+            self._calculate_node_job_priority_for_queue(node_job_dict),
         )
 
     @staticmethod
-    def _calculate_node_job_priority_for_queue():
-        return datetime.datetime.now().timestamp()
+    def _calculate_node_job_priority_for_queue(node_job_dict):
+        return node_job_priority.score(node_job_dict)
 
 
 
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import logging
+
+from typing import Optional, Set
+
+log = logging.getLogger('otl_interpreter.dispatcher')
+
+
+class QueueWakeup:
+    """
+    Wakes task checking node job queues when computing nodes may have free capacity.
+    Wake can be requested from event loop or from database worker threads,
+    requests made while queues are being checked are collected and wake the task once
+    """
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+
+        # computing node types whose queues must be checked
+        self._computing_node_types = set()
+        self._lock = threading.Lock()
+
+    def attach(self):
+        """
+        Binds wakeup to running event loop, invoked by checking task
+        """
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._event = asyncio.Event()
+
+    def wake(self, computing_node_type: str):
+        """
+        Requests checking queue of computing node type
+        """
+        with self._lock:
+            self._computing_node_types.add(computing_node_type)
+            loop, event = self._loop, self._event
+
+        if loop is None:
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is loop:
+            event.set()
+            return
+
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # event loop is closed, dispatcher is stopping
+            log.debug('Queue wakeup requested after event loop was closed')
+
+    async def wait(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Waits for wakeup or timeout
+        :return: set of computing node types to check or None if timeout expired and all queues must be checked
+        """
+        woken = True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            woken = False
+
+        with self._lock:
+            self._event.clear()
+            computing_node_types, self._computing_node_types = self._computing_node_types, set()
+        return computing_node_types if woken else None
+
+
+queue_wakeup = QueueWakeup()
@@ -0,0 +1,64 @@
+import logging
+
+from queue import Full
+from uuid import UUID
+
+from computing_node_pool import computing_node_pool
+from queue_wakeup import queue_wakeup
+
+log = logging.getLogger('otl_interpreter.dispatcher')
+
+# topic of forwarded messages with releases of reservations made by other worker process
+RELEASED_RESERVATION_TOPIC = 'released_reservation'
+
+
+class ReservationRelease:
+    """
+    Releases resources reserved for node jobs in computing node pool.
+    In supervisor mode every worker process has its own computing node pool, node job resources are reserved
+    by worker that sent node job and its status may be processed by other worker.
+    Release that doesn't find reservation in own pool is sent to supervisor which forwards it to other workers
+    """
+    def __init__(self, computing_node_pool, queue_wakeup):
+        self.computing_node_pool = computing_node_pool
+        self.queue_wakeup = queue_wakeup
+
+        # queue to supervisor and shard of worker process, None if dispatcher has one process
+        self._outbox = None
+        self._shard = None
+
+    def attach(self, outbox, shard):
+        """
+        Invoked by worker process, releases not found in own pool are put to outbox
+        """
+        self._outbox = outbox
+        self._shard = shard
+
+    def release(self, node_job_uuid, computing_node_type) -> bool:
+        """
+        Releases resources reserved for node job
+        :return: True if resources reserved in pool of current process were released,
+        then caller wakes queue check of computing node type
+        """
+        if self.computing_node_pool.release_node_job(node_job_uuid):
+            return True
+
+        if self._outbox is not None:
+            try:
+                self._outbox.put_nowait((
+                    self._shard,
+                    {'node_job_uuid': UUID(str(node_job_uuid)).hex, 'computing_node_type': computing_node_type}
+                ))
+            except Full:
+                log.warning(f'Release of node job {node_job_uuid} resources is not forwarded, outbox is full')
+        return False
+
+    def release_forwarded(self, released_reservation: dict):
+        """
+        Releases reservation forwarded from other worker process
+        """
+        if self.computing_node_pool.release_node_job(released_reservation['node_job_uuid']):
+            self.queue_wakeup.wake(released_reservation['computing_node_type'])
+
+
+reservation_release = ReservationRelease(computing_node_pool, queue_wakeup)
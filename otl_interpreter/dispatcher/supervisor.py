@@ -0,0 +1,318 @@
+import asyncio
+import multiprocessing
+
+from collections import namedtuple
+from functools import partial
+from json import loads
+from logging import getLogger
+from queue import Empty, Full
+
+from django.db import connections
+from message_broker import AsyncConsumer as Consumer
+
+from otl_interpreter.settings import ini_config
+
+from message_handlers import ComputingNodeControlHandler, OtlJobHandler, NodeJobStatusHandler
+from computing_node_pool import computing_node_pool
+from node_job_queue import node_job_queue
+from node_job_status_manager import NodeJobStatusManager
+from keyed_message_processor import KeyedMessageProcessor, key_index
+from queue_wakeup import queue_wakeup
+from reservation_release import reservation_release, RELEASED_RESERVATION_TOPIC
+
+
+log = getLogger('otl_interpreter.dispatcher.supervisor')
+
+# message received by supervisor and forwarded to worker process, handlers use only value
+ForwardedMessage = namedtuple('ForwardedMessage', ['topic', 'value'])
+
+# topic -> ordering key coroutine of topic messages, None if message is forwarded to every worker
+forwarded_topics = {
+    'computing_node_control': None,
+    'nodejob_status': NodeJobStatusHandler.ordering_key,
+    'otl_job': OtlJobHandler.ordering_key,
+}
+
+
+class ShardMetrics:
+    """
+    Counters of one worker process shared with supervisor
+    """
+    def __init__(self, context):
+        self._processed_messages = context.Value('q', 0, lock=False)
+        self._failed_messages = context.Value('q', 0, lock=False)
+        self._checked_queues = context.Value('q', 0, lock=False)
+        self.forwarded_messages = 0
+
+    def update(self, processed_messages, failed_messages, checked_queues):
+        """
+        Invoked by worker process
+        """
+        self._processed_messages.value = processed_messages
+        self._failed_messages.value = failed_messages
+        self._checked_queues.value = checked_queues
+
+    def as_dict(self):
+        return {
+            'forwarded_messages': self.forwarded_messages,
+            'processed_messages': self._processed_messages.value,
+            'failed_messages': self._failed_messages.value,
+            'checked_queues': self._checked_queues.value,
+        }
+
+
+def shard_computing_node_types(shard, shards):
+    """
+    Returns computing node types whose queues are periodically checked by worker of shard
+    """
+    computing_node_types = set(node_job_queue.computing_node_types()) | set(computing_node_pool.nodes_by_types.keys())
+    return [
+        computing_node_type for computing_node_type in computing_node_types
+        if key_index(computing_node_type, shards) == shard
+    ]
+
+
+async def _read_inbox(inbox, message_processors):
+    loop = asyncio.get_running_loop()
+    while True:
+        # waiting is limited, so reading thread doesn't hold process on exit
+        try:
+            topic, value = await loop.run_in_executor(None, partial(inbox.get, timeout=1))
+        except Empty:
+            continue
+        if topic == RELEASED_RESERVATION_TOPIC:
+            reservation_release.release_forwarded(value)
+            continue
+        await message_processors[topic].submit(ForwardedMessage(topic, value))
+
+
+async def _check_job_queue(shard, shards, checked_queues):
+    node_job_status_manager = NodeJobStatusManager()
+    time_to_wait = int(ini_config['dispatcher']['check_job_queue_period'])
+    queue_wakeup.attach()
+
+    woken_computing_node_types = None
+    while True:
+        if woken_computing_node_types is None:
+            computing_node_types = shard_computing_node_types(shard, shards)
+            log.debug(f'Shard {shard} checks queues of {computing_node_types} by timeout')
+        else:
+            # every worker is woken by broadcast messages, queue is checked only by its shard
+            computing_node_types = [
+                computing_node_type for computing_node_type in woken_computing_node_types
+                if key_index(computing_node_type, shards) == shard
+            ]
+        if computing_node_types:
+            await node_job_status_manager.check_job_queue(computing_node_types)
+            checked_queues[0] += len(computing_node_types)
+        woken_computing_node_types = await queue_wakeup.wait(time_to_wait)
+
+
+async def _reconcile_node_job_queue():
+    node_job_status_manager = NodeJobStatusManager()
+    time_to_wait = int(ini_config['dispatcher']['queue_reconciliation_period'])
+    while True:
+        await node_job_status_manager.reconcile_node_job_queue()
+        await asyncio.sleep(time_to_wait)
+
+
+async def _report_metrics(shard_metrics, message_processors, checked_queues):
+    while True:
+        shard_metrics.update(
+            sum(message_processor.processed_messages for message_processor in message_processors.values()),
+            sum(message_processor.failed_messages for message_processor in message_processors.values()),
+            checked_queues[0],
+        )
+        await asyncio.sleep(1)
+
+
+async def _check_computing_node_health(computing_node_control_handler):
+    time_to_wait = int(ini_config['dispatcher']['health_check_period'])
+    while True:
+        await computing_node_control_handler.check_computing_node_health()
+        await asyncio.sleep(time_to_wait)
+
+
+async def run_worker(shard, shards, inbox, outbox, shard_metrics):
+    """
+    Worker process processes messages forwarded by supervisor and checks queues of its computing node types.
+    Only worker of zero shard changes computing nodes in database and reconciles node job queues.
+    Releases of reservations made by other workers are sent to supervisor with outbox
+    """
+    reservation_release.attach(outbox, shard)
+    concurrency = int(ini_config['dispatcher']['message_concurrency'])
+    queue_size = int(ini_config['dispatcher']['message_queue_size'])
+
+    computing_node_control_handler = ComputingNodeControlHandler(database_owner=shard == 0)
+    handlers = {
+        'computing_node_control': computing_node_control_handler,
+        'nodejob_status': NodeJobStatusHandler(),
+        'otl_job': OtlJobHandler(),
+    }
+    message_processors = {
+        topic: KeyedMessageProcessor(handler, concurrency, queue_size) for topic, handler in handlers.items()
+    }
+    # list to share counter between tasks
+    checked_queues = [0]
+
+    for topic in handlers:
+        await handlers[topic].__aenter__()
+        await message_processors[topic].__aenter__()
+    tasks = [
+        _read_inbox(inbox, message_processors),
+        _check_job_queue(shard, shards, checked_queues),
+        _report_metrics(shard_metrics, message_processors, checked_queues),
+        _check_computing_node_health(computing_node_control_handler),
+    ]
+    if shard == 0:
+        tasks.append(_reconcile_node_job_queue())
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for topic in handlers:
+            await message_processors[topic].__aexit__(None, None, None)
+            await handlers[topic].__aexit__(None, None, None)
+
+
+def _worker_process_main(shard, shards, inbox, outbox, shard_metrics):
+    log.info(f'Dispatcher worker of shard {shard} starting')
+    asyncio.run(run_worker(shard, shards, inbox, outbox, shard_metrics))
+
+
+class DispatcherSupervisor:
+    """
+    Forks worker processes and forwards them messages from message broker.
+    Messages of one otl job go to the same worker, computing node control messages go to every worker.
+    Queue of every computing node type is checked periodically by one worker.
+    Releases of node job reservations that worker didn't find in its computing node pool go to other workers
+    """
+    def __init__(self, workers=2, worker_queue_size=1000, metrics_period=15):
+        """
+        :param workers: number of worker processes
+        :param worker_queue_size: max number of forwarded messages waiting for worker,
+        receiving waits when worker queue is full
+        :param metrics_period: seconds between logging shard metrics and checking workers are alive
+        """
+        self.workers = workers
+        self.worker_queue_size = worker_queue_size
+        self.metrics_period = metrics_period
+
+        # workers are forked, so they get initialized django and loaded modules
+        self._context = multiprocessing.get_context('fork')
+        self._inboxes = []
+        # releases of reservations sent by workers
+        self._outbox = None
+        self._shard_metrics = []
+        self._processes = []
+
+    def start_workers(self):
+        # forked process must not share database connection with supervisor
+        connections.close_all()
+        self._outbox = self._context.Queue(self.worker_queue_size)
+        for shard in range(self.workers):
+            self._inboxes.append(self._context.Queue(self.worker_queue_size))
+            self._shard_metrics.append(ShardMetrics(self._context))
+            self._processes.append(self._start_worker(shard))
+
+    def _start_worker(self, shard):
+        process = self._context.Process(
+            target=_worker_process_main,
+            args=(shard, self.workers, self._inboxes[shard], self._outbox, self._shard_metrics[shard]),
+            name=f'dispatcher_worker_{shard}',
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def stop_workers(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+    async def _forward(self, shard, topic, value):
+        self._shard_metrics[shard].forwarded_messages += 1
+        inbox = self._inboxes[shard]
+        try:
+            inbox.put_nowait((topic, value))
+        except Full:
+            # wait for worker without blocking event loop
+            await asyncio.get_running_loop().run_in_executor(None, inbox.put, (topic, value))
+
+    async def forward_messages(self, topic, consumer_extra_config=None):
+        ordering_key = forwarded_topics[topic]
+        async with Consumer(topic, value_deserializer=loads, extra_config=consumer_extra_config) as consumer:
+            async for message in consumer:
+                if ordering_key is None:
+                    for shard in range(self.workers):
+                        await self._forward(shard, topic, message.value)
+                    continue
+
+                try:
+                    key = await ordering_key(message)
+                except Exception as err:
+                    log.error(f'Error occured while getting ordering key of message {message.value}: {err}')
+                    key = None
+                await self._forward(key_index(key, self.workers), topic, message.value)
+
+    async def forward_released_reservations(self):
+        """
+        Forwards release of reservation that worker didn't find in its computing node pool to other workers
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            # waiting is limited, so reading thread doesn't hold process on exit
+            try:
+                shard, released_reservation = await loop.run_in_executor(
+                    None, partial(self._outbox.get, timeout=1)
+                )
+            except Empty:
+                continue
+            for other_shard in range(self.workers):
+                if other_shard != shard:
+                    await self._forward(other_shard, RELEASED_RESERVATION_TOPIC, released_reservation)
+
+    def shard_metrics(self):
+        """
+        Returns list of dictionaries with metrics of every shard
+        """
+        metrics = []
+        for shard, shard_metrics in enumerate(self._shard_metrics):
+            shard_metrics_dict = shard_metrics.as_dict()
+            try:
+                shard_metrics_dict['waiting_messages'] = self._inboxes[shard].qsize()
+            except NotImplementedError:
+                shard_metrics_dict['waiting_messages'] = None
+            metrics.append(shard_metrics_dict)
+        return metrics
+
+    async def monitor_workers(self):
+        """
+        Logs shard metrics and restarts dead workers, messages waiting for dead worker stay in its queue
+        """
+        while True:
+            await asyncio.sleep(self.metrics_period)
+            for shard, metrics in enumerate(self.shard_metrics()):
+                log.info(f'Dispatcher shard {shard}: {metrics}')
+
+            for shard, process in enumerate(self._processes):
+                if not process.is_alive():
+                    log.error(f'Dispatcher worker of shard {shard} exited with code {process.exitcode}, restarting')
+                    connections.close_all()
+                    self._processes[shard] = self._start_worker(shard)
+
+    async def run(self):
+        self.start_workers()
+        try:
+            await asyncio.gather(
+                # broadcast is true, all dispatcher instances will get information about nodes
+                self.forward_messages('computing_node_control', {'broadcast': True}),
+                self.forward_messages('nodejob_status'),
+                self.forward_messages('otl_job'),
+                self.forward_released_reservations(),
+                self.monitor_workers(),
+            )
+        finally:
+            self.stop_workers()
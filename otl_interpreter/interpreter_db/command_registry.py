@@ -0,0 +1,49 @@
+import logging
+
+from datetime import datetime
+
+log = logging.getLogger('otl_interpreter.interpreter_db')
+
+
+class CommandRegistry:
+    """
+    Snapshot of commands registered by active computing nodes.
+    Snapshot is not changed after creation, new snapshot is loaded when commands are updated
+    """
+    def __init__(self, loaded_timestamp: datetime, node_types, command_name_sets, commands_available_on_all_nodes,
+                 command_attributes):
+        """
+        :param loaded_timestamp: time when loading from database started, used as snapshot version
+        :param node_types: set of active computing node types
+        :param command_name_sets: dictionary node type -> set of command names available on that node type
+        :param commands_available_on_all_nodes: set of command names available on every node type
+        :param command_attributes: dictionary command name -> dictionary with use_timewindow and idempotent fields
+        """
+        self.loaded_timestamp = loaded_timestamp
+        self.node_types = frozenset(node_types)
+        self._command_name_sets = {
+            node_type: frozenset(command_names | commands_available_on_all_nodes)
+            for node_type, command_names in command_name_sets.items()
+        }
+        self._commands_available_on_all_nodes = frozenset(commands_available_on_all_nodes)
+        self._command_attributes = command_attributes
+
+    @property
+    def version(self):
+        return self.loaded_timestamp.timestamp()
+
+    def get_command_name_set_for_node_type(self, node_type):
+        """
+        Returns set of command names available on node type
+        """
+        return self._command_name_sets.get(node_type, self._commands_available_on_all_nodes)
+
+    def get_command_attributes(self, command_name):
+        """
+        Returns dictionary with use_timewindow and idempotent fields
+        """
+        if command_name in self._command_attributes:
+            return self._command_attributes[command_name]
+        if not command_name.startswith('sys_'):
+            log.error(f'Command with name "{command_name}" not found in database')
+        return {'use_timewindow': False, 'idempotent': True}
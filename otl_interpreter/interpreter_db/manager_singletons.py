@@ -1,9 +1,18 @@
 from .node_commands_manager_class import NodeCommandsManager
 from .node_job_manager_class import NodeJobManager
 from .otl_job_manager_class import OtlJobManager
+from .result_registry import ResultRegistry
 
 from otl_interpreter.settings import ini_config
+from otl_interpreter.utils.redis_connection import get_redis
+
+if ini_config['result_registry']['enabled'].lower() == 'true':
+    result_registry = ResultRegistry(get_redis(), int(ini_config['result_registry']['entry_ttl']))
+else:
+    result_registry = ResultRegistry()
 
 node_commands_manager = NodeCommandsManager()
-node_job_manager = NodeJobManager(int(ini_config['node_job']['cache_ttl']))
+node_job_manager = NodeJobManager(
+    int(ini_config['node_job']['cache_ttl']), int(ini_config['node_job']['result_touch_interval']), result_registry
+)
 otl_job_manager = OtlJobManager()
@@ -1,12 +1,11 @@
 import datetime
-import re
-import hashlib
 import uuid
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from mptt.models import MPTTModel, TreeForeignKey
 from mixins.models import TimeStampedModel
 from .enums import JobStatus, NodeJobStatus, ResultStorage, ResultStatus
+from otl_interpreter.utils.query_hash import normalize_query, get_query_hash
 
 
 class OtlJob(TimeStampedModel):
@@ -35,14 +34,18 @@ class OtlJob(TimeStampedModel):
     )
     status_text = models.TextField(null=True)
 
+    # node job counters, changed with node job status
+    total_node_jobs = models.IntegerField(default=0)
+    running_node_jobs = models.IntegerField(default=0)
+    finished_node_jobs = models.IntegerField(default=0)
+    failed_node_jobs = models.IntegerField(default=0)
+
     def save(self, *args, **kwargs):
         self.query_hash = self._get_query_hash()
         super().save(*args, **kwargs)
 
     def _get_query_hash(self):
-        query = self._remove_repeat_spaces(self.query)
-        query_hash = hashlib.blake2b(query.encode())
-        return query_hash.digest()
+        return get_query_hash(self.query)
 
     def __str__(self):
         return self.query[:50]
@@ -52,7 +55,7 @@ class OtlJob(TimeStampedModel):
 
     @staticmethod
     def _remove_repeat_spaces(query):
-        return re.sub(r'\s+', ' ', query)
+        return normalize_query(query)
 
     class Meta:
         app_label = 'otl_interpreter'
@@ -75,6 +78,9 @@ class ComputingNode(models.Model):
     # computing node resources as dictionary
     resources = models.JSONField(default=dict)
 
+    # version of job topic message protocol supported by computing node
+    protocol_version = models.IntegerField(default=1)
+
     def __str__(self):
         return f'{self.type}: {self.uuid}'
 
@@ -6,6 +6,7 @@ from django.forms.models import model_to_dict
 
 from otl_interpreter.settings import get_cache
 from otl_interpreter.interpreter_db.models import NodeCommand, ComputingNode
+from otl_interpreter.interpreter_db.command_registry import CommandRegistry
 
 from otl_interpreter.core_commands import job_planer_commands, sys_computing_node_commands
 
@@ -28,6 +29,8 @@ class NodeCommandsManager:
         else:
             self._cache = cache
 
+        self._command_registry = None
+
     @property
     def commands_updated_timestamp(self):
         return self._cache.get('commands_updated_timestamp', datetime.min)
@@ -56,7 +59,8 @@ class NodeCommandsManager:
         """
         return self.commands_updated_timestamp > timestamp
 
-    def register_node(self, node_type, node_uuid, host_id, resources=None):
+    @_set_commands_updated_timestamp_decorator
+    def register_node(self, node_type, node_uuid, host_id, resources=None, protocol_version=1):
         """
         creates node if it doesn't exist
         :param node_type: type string, spark, eep or post_processing
@@ -65,6 +69,7 @@ class NodeCommandsManager:
         :param resources: dictionary with node resources,
         keys - arbituarary string
         value - any positive integer
+        :param protocol_version: version of job topic message protocol supported by node
         :return:
         """
         if resources is None:
@@ -76,6 +81,7 @@ class NodeCommandsManager:
                 type=node_type, uuid=node_uuid, resources=resources, host_id=host_id
             )
         computing_node.active = True
+        computing_node.protocol_version = protocol_version
         computing_node.save()
 
     @_set_commands_updated_timestamp_decorator
@@ -151,10 +157,12 @@ class NodeCommandsManager:
             use_timewindow = command_descr.pop('use_timewindow', False)
             idempotent = command_descr.pop('idempotent', True)
             description = command_descr.pop('description', '')
+            resource_necessity = command_descr.pop('resource_necessity', None)
             NodeCommand.objects.update_or_create(
                 defaults={
                     'syntax': command_descr,
                     'active': True,
+                    'resource_necessity': resource_necessity,
                 },
                 use_timewindow=use_timewindow,
                 idempotent=idempotent,
@@ -176,6 +184,61 @@ class NodeCommandsManager:
             log.error(f'Command with name "{command_name}" not found in database')
         return {'use_timewindow': False, 'idempotent': True}
 
+    @staticmethod
+    def get_commands_resource_necessity(node_type):
+        """
+        Returns dictionary with resource necessity of active commands of node type.
+        Keys - command names, values - dictionaries resource name: amount.
+        If computing nodes declare different necessity for the same command maximum of each resource is taken
+        """
+        commands_resource_necessity = {}
+        for command_name, resource_necessity in NodeCommand.objects.filter(
+            node__type=node_type, active=True, resource_necessity__isnull=False
+        ).values_list('name', 'resource_necessity'):
+            command_resource_necessity = commands_resource_necessity.setdefault(command_name, {})
+            for resource, amount in resource_necessity.items():
+                command_resource_necessity[resource] = max(command_resource_necessity.get(resource, 0), amount)
+        return commands_resource_necessity
+
+    def get_command_registry(self) -> CommandRegistry:
+        """
+        Returns snapshot of registered commands.
+        Snapshot is loaded from database again only if commands were updated after previous loading
+        """
+        command_registry = self._command_registry
+        if command_registry is None or self.commands_were_updated(command_registry.loaded_timestamp):
+            command_registry = self._load_command_registry()
+            self._command_registry = command_registry
+        return command_registry
+
+    @staticmethod
+    def _load_command_registry():
+        # commands updated during loading will cause one more loading
+        loaded_timestamp = datetime.now()
+
+        command_name_sets = {}
+        for node_type, command_name in NodeCommand.objects.filter(
+            node__isnull=False, active=True
+        ).values_list('node__type', 'name'):
+            command_name_sets.setdefault(node_type, set()).add(command_name)
+
+        # the first registered command with name is used, like in get_command_attributes
+        command_attributes = {}
+        for command_name, use_timewindow, idempotent in NodeCommand.objects.order_by('pk').values_list(
+            'name', 'use_timewindow', 'idempotent'
+        ):
+            command_attributes.setdefault(
+                command_name, {'use_timewindow': use_timewindow, 'idempotent': idempotent}
+            )
+
+        return CommandRegistry(
+            loaded_timestamp,
+            NodeCommandsManager.get_node_types(),
+            command_name_sets,
+            NodeCommandsManager.get_command_name_set_available_on_all_nodes(),
+            command_attributes,
+        )
+
     @staticmethod
     def get_node_types():
         """
@@ -2,25 +2,36 @@ import datetime
 import logging
 
 from datetime import timedelta
-from django.db.models import F
-from django.db import transaction
-from django.db.utils import IntegrityError
+from django.db.models import F, Q, Exists, OuterRef
+from django.db import transaction, connection
 from django.utils import timezone
 
 from .models import NodeJob, NodeJobResult, OtlJob, ComputingNode
 from .enums import NodeJobStatus, END_STATUSES, ResultStatus, ResultStorage
+from .node_job_status_writer import node_job_status_writer, flush_status_changes
+from .otl_job_progress import count_node_job_status_change
+from .result_registry import ResultRegistry
 
 
 log = logging.getLogger('otl_interpreter.interpreter_db')
 
 
 class NodeJobManager:
-    def __init__(self, default_cache_ttl):
+    def __init__(self, default_cache_ttl, result_touch_interval=10, result_registry: ResultRegistry = None):
+        """
+        :param default_cache_ttl: time to store node job results if node job doesn't set it
+        :param result_touch_interval: min seconds between updates of result last touched timestamp on status reads
+        :param result_registry: redis mirror of results for status reads, if None statuses are read from database
+        """
         self.default_cache_ttl = default_cache_ttl
+        self.result_touch_interval = timedelta(seconds=result_touch_interval)
+        self.result_registry = result_registry or ResultRegistry()
 
     def create_node_jobs(self, root_job_tree, otl_job_uuid, otl_job_cache_ttl, node_job_cache_ttl=None, ):
         """
         Creates in database NodeJob tree
+        Node job results and node jobs are written with bulk queries in one transaction,
+        tree fields of node jobs are calculated from job tree
         :param root_job_tree: job planer NodeJobTree
         :param otl_job_uuid: otl job uuid
         :param otl_job_cache_ttl: time to store root node job results
@@ -30,73 +41,153 @@ class NodeJobManager:
         node_job_cache_ttl = max(node_job_cache_ttl or self.default_cache_ttl, 30)
 
         otl_job = OtlJob.objects.get(uuid=otl_job_uuid)
-        node_job_for_job_tree = {}
-
-        for node_job_tree in root_job_tree.parent_first_order_traverse_iterator():
+        node_job_trees = list(root_job_tree.parent_first_order_traverse_iterator())
 
+        # (storage, path) -> max cache ttl of node jobs with that result
+        result_cache_ttls = {}
+        for node_job_tree in node_job_trees:
             if node_job_tree.parent:
-                parent_node_job = node_job_for_job_tree[node_job_tree.parent]
-                if node_job_tree.cache_ttl:
-                    cache_ttl = node_job_tree.cache_ttl
-                else:
-                    cache_ttl = node_job_cache_ttl
+                cache_ttl = node_job_tree.cache_ttl or node_job_cache_ttl
             else:
-                parent_node_job = None
                 cache_ttl = otl_job_cache_ttl
 
             result_address = node_job_tree.result_address
             if result_address:
-                node_job_result = self._find_or_create_node_job_result(
-                    result_address.path,
-                    result_address.storage_type,
-                    cache_ttl
+                result_key = (result_address.storage_type, result_address.path)
+                result_cache_ttls[result_key] = max(result_cache_ttls.get(result_key, 0), cache_ttl)
+
+        with transaction.atomic():
+            node_job_results = self._find_or_create_node_job_results(result_cache_ttls)
+
+            node_job_for_job_tree = {}
+            for node_job_tree in node_job_trees:
+                result_address = node_job_tree.result_address
+                if result_address:
+                    node_job_result = node_job_results[(result_address.storage_type, result_address.path)]
+                    # mark result is calculated
+                    if node_job_result.status == ResultStatus.CALCULATED:
+                        node_job_tree.result_calculated = True
+                else:
+                    node_job_result = None
+
+                node_job_for_job_tree[node_job_tree] = NodeJob(
+                    otl_job=otl_job,
+                    uuid=node_job_tree.uuid,
+                    computing_node_type=node_job_tree.computing_node_type,
+                    commands=node_job_tree.as_command_dict_list(),
+                    result=node_job_result,
                 )
-                # mark result is calculated
-                if node_job_result.status == ResultStatus.CALCULATED:
-                    node_job_tree.result_calculated = True
-            else:
-                node_job_result = None
-
-            node_job = NodeJob(
-                otl_job=otl_job,
-                uuid=node_job_tree.uuid,
-                computing_node_type=node_job_tree.computing_node_type,
-                commands=node_job_tree.as_command_dict_list(),
-                next_job=parent_node_job,
-                result=node_job_result,
-            )
-            node_job.save()
-            node_job_for_job_tree[node_job_tree] = node_job
 
-    def _find_or_create_node_job_result(self, path, storage_type, cache_ttl):
+            self._set_tree_fields(root_job_tree, node_job_for_job_tree)
+            NodeJob.objects.bulk_create(node_job_for_job_tree.values())
+            OtlJob.objects.filter(pk=otl_job.pk).update(total_node_jobs=len(node_job_for_job_tree))
+
+            # not every database returns primary keys from bulk insert
+            if any(node_job.pk is None for node_job in node_job_for_job_tree.values()):
+                node_job_ids = dict(
+                    NodeJob.objects.filter(
+                        uuid__in=[node_job_tree.uuid for node_job_tree in node_job_trees]
+                    ).values_list('uuid', 'id')
+                )
+                for node_job in node_job_for_job_tree.values():
+                    node_job.pk = node_job_ids[node_job.uuid]
+
+            # links to parents are written after all node jobs got primary keys
+            awaiting_node_jobs = []
+            for node_job_tree, node_job in node_job_for_job_tree.items():
+                if node_job_tree.parent:
+                    node_job.next_job = node_job_for_job_tree[node_job_tree.parent]
+                    awaiting_node_jobs.append(node_job)
+            if awaiting_node_jobs:
+                NodeJob.objects.bulk_update(awaiting_node_jobs, ['next_job'])
+
+    @staticmethod
+    def _set_tree_fields(root_job_tree, node_job_for_job_tree):
         """
-        If such result already exists returns it or create a new one
+        Sets mptt fields of node jobs as if they were inserted one by one as last children of their parents
         """
-        try:
-            node_job_result = self._find_existing_node_job_result(path, storage_type, cache_ttl)
+        opts = NodeJob._mptt_meta
+        tree_id = NodeJob._tree_manager._get_next_tree_id()
+
+        def set_tree_fields(node_job_tree, left, level):
+            node_job = node_job_for_job_tree[node_job_tree]
+            setattr(node_job, opts.tree_id_attr, tree_id)
+            setattr(node_job, opts.level_attr, level)
+            setattr(node_job, opts.left_attr, left)
+            right = left + 1
+            for child_node_job_tree in node_job_tree.children:
+                right = set_tree_fields(child_node_job_tree, right, level + 1) + 1
+            setattr(node_job, opts.right_attr, right)
+            return right
+
+        set_tree_fields(root_job_tree, 1, 0)
+
+    def _find_or_create_node_job_results(self, result_cache_ttls):
+        """
+        Creates results that don't exist yet, results of earlier otl jobs are reused
+        :param result_cache_ttls: dictionary (storage, path) -> cache ttl in seconds
+        :return: dictionary (storage, path) -> NodeJobResult
+        """
+        if not result_cache_ttls:
+            return {}
+
+        now = datetime.datetime.now()
+        # result may be created simultaneously by other process, so conflicts are ignored
+        NodeJobResult.objects.bulk_create(
+            [
+                NodeJobResult(
+                    storage=storage,
+                    path=path,
+                    ttl=timedelta(seconds=cache_ttl),
+                    last_touched_timestamp=now,
+                )
+                for (storage, path), cache_ttl in result_cache_ttls.items()
+            ],
+            ignore_conflicts=True
+        )
 
-        except NodeJobResult.DoesNotExist:
-            node_job_result = NodeJobResult(
-                storage=storage_type,
-                path=path,
-                ttl=timedelta(seconds=cache_ttl),
-            )
-        try:
-            node_job_result.last_touched_timestamp = datetime.datetime.now()
-            node_job_result.save()
-        except IntegrityError as err:  # when two processes try simultaneously create NodeJobResult object
-            node_job_result = self._find_existing_node_job_result(path, storage_type, cache_ttl)
-        return node_job_result
+        results_filter = Q()
+        for storage, path in result_cache_ttls.keys():
+            results_filter |= Q(storage=storage, path=path)
+        node_job_results = {
+            (node_job_result.storage, node_job_result.path): node_job_result
+            for node_job_result in NodeJobResult.objects.filter(results_filter)
+        }
 
-    @staticmethod
-    def _find_existing_node_job_result(path, storage_type, cache_ttl):
-        node_job_result = NodeJobResult.objects.get(
-            path=path, storage=storage_type
+        for result_key, node_job_result in node_job_results.items():
+            if node_job_result.status != ResultStatus.NOT_EXIST:
+                log.info(f'Find node job with same result, it is in {node_job_result.status} state')
+            # not allow new query reduce ttl of old query
+            node_job_result.ttl = max(node_job_result.ttl, timedelta(seconds=result_cache_ttls[result_key]))
+            node_job_result.last_touched_timestamp = now
+        NodeJobResult.objects.bulk_update(node_job_results.values(), ['ttl', 'last_touched_timestamp'])
+
+        # statuses read in transaction may be already changed by other process
+        transaction.on_commit(lambda: self._register_results(node_job_results.values(), status_is_actual=False))
+
+        return node_job_results
+
+    def _register_results(self, node_job_results, status_is_actual=True):
+        """
+        Writes results to result registry
+        :param node_job_results: iterable of NodeJobResult
+        :param status_is_actual: if False status is written only if registry doesn't know it
+        """
+        node_job_results = list(node_job_results)
+        self.result_registry.write({
+            (node_job_result.storage, node_job_result.path): {
+                'ttl': node_job_result.ttl,
+                'last_touched_timestamp': node_job_result.last_touched_timestamp,
+            }
+            for node_job_result in node_job_results
+        })
+        self.result_registry.write(
+            {
+                (node_job_result.storage, node_job_result.path): {'status': node_job_result.status}
+                for node_job_result in node_job_results
+            },
+            overwrite=status_is_actual
         )
-        # not allow new query reduce ttl of old query
-        node_job_result.ttl = timedelta(seconds=max(node_job_result.ttl.seconds, cache_ttl))
-        log.info(f'Find node job with same result, it is in {node_job_result.status} state')
-        return node_job_result
 
     @staticmethod
     def set_computing_node_for_node_job(node_job_uuid,  computing_node_uuid=None):
@@ -127,6 +218,7 @@ class NodeJobManager:
         return node_job.computing_node.uuid
 
     @staticmethod
+    @flush_status_changes
     def get_node_job_status(node_job_uuid):
         """
         Returns computing node job status
@@ -140,17 +232,63 @@ class NodeJobManager:
         return None
 
     @staticmethod
-    def change_node_job_status(node_job_uuid, status: NodeJobStatus, status_text: str = None):
-        try:
-            node_job = NodeJob.objects.get(uuid=node_job_uuid)
-            node_job.status = status
-            node_job.status_text = status_text
-            node_job.save()
+    def change_node_job_status(
+            node_job_uuid, status: NodeJobStatus, status_text: str = None, expected_status: NodeJobStatus = None,
+            batched=True
+    ):
+        """
+        Sets node job status with one update query
+        :param node_job_uuid: node job uuid
+        :param status: new status
+        :param status_text: status text
+        :param expected_status: if given, status is changed only if current status in database equals expected status
+        :param batched: if False status is written immediately even inside batch_status_changes context,
+        so returned value shows whether status was changed
+        :return:
+        True if status was changed, False otherwise
+        Inside batch_status_changes context batched status change is written later and True is returned
+        """
+        if batched and node_job_status_writer.batching:
+            node_job_status_writer.add(node_job_uuid, status, status_text, expected_status)
+            return True
 
-        except NodeJob.DoesNotExist:
-            log.error(f'Setting node job status for unexisting nodejob: {node_job_uuid}')
+        # collected status changes are written first, so status changes of node job keep their order
+        node_job_status_writer.flush()
+
+        node_jobs = NodeJob.objects.filter(uuid=node_job_uuid)
+        if expected_status is not None:
+            node_jobs = node_jobs.filter(status=expected_status)
+
+        with transaction.atomic():
+            updated = node_jobs.update(status=status, status_text=status_text, modified_time=timezone.now())
+            if updated and expected_status is not None:
+                count_node_job_status_change([node_job_uuid], expected_status, status)
+        if not updated:
+            if expected_status is None:
+                log.error(f'Setting node job status for unexisting nodejob: {node_job_uuid}')
+            else:
+                log.info(f'Node job {node_job_uuid} status is not {expected_status}, status wasn\'t changed')
+        return bool(updated)
+
+    @staticmethod
+    def batch_status_changes():
+        """
+        Context manager. Status changes inside the context are written with bulk update queries on exit
+        or before any query that reads node job status.
+        Yields list of (node_job_uuid, status, status_text) tuples that will contain status changes that were not
+        written because node job status in database differs from expected status
+        """
+        return node_job_status_writer.batch()
 
     @staticmethod
+    def write_status_changes():
+        """
+        Writes status changes collected in current batch to database
+        """
+        node_job_status_writer.flush()
+
+    @staticmethod
+    @flush_status_changes
     def get_running_node_job_uuids_for_computing_node(computing_node_uuid):
         """
         Returns list of node job uuids running on computing node
@@ -159,6 +297,7 @@ class NodeJobManager:
             status=NodeJobStatus.RUNNING, computing_node__uuid=computing_node_uuid
         ).values_list('uuid', flat=True))
 
+    @flush_status_changes
     def get_next_node_job_to_execute(self, finished_node_uuid):
         """
         Returns serialized node_job ready to be executed or None
@@ -191,6 +330,7 @@ class NodeJobManager:
         return node_job.otl_job.uuid
 
     @staticmethod
+    @flush_status_changes
     def get_node_job_dict(node_job):
         """
         returns node job dictionary representation or None if node job does't exist
@@ -200,7 +340,7 @@ class NodeJobManager:
         """
         try:
             if not isinstance(node_job, NodeJob):
-                node_job = NodeJob.objects.get(uuid=node_job)
+                node_job = NodeJob.objects.select_related('result', 'otl_job').get(uuid=node_job)
         except NodeJob.DoesNotExist:
             log.error(f'Node job with uuid={str(node_job)} does not exist')
             return None
@@ -212,41 +352,121 @@ class NodeJobManager:
             'commands': node_job.commands,
             'storage': node_job.result.storage,
             'path': node_job.result.path,
-            'user_guid': node_job.otl_job.user_guid.hex
+            'user_guid': node_job.otl_job.user_guid.hex,
+            'otl_job_uuid': node_job.otl_job.uuid.hex,
         }
 
-    @staticmethod
-    def get_result_status(storage: ResultStorage, path):
+    def get_result_status(self, storage: ResultStorage, path):
         """
         Returns status of node job result
+        Status is read from result registry, database is queried only if registry doesn't know result
+        or calculated result may be expired.
+        Result is touched only if it wasn't touched during result touch interval,
+        so frequent status reads don't write result row
         """
-        try:
-            result = NodeJobResult.objects.get(storage=storage, path=path)
-            result.last_touched_timestamp = datetime.datetime.now()
-            result.save()
-            return result.status
-        except NodeJobResult.DoesNotExist:
+        now = datetime.datetime.now()
+        touched_before = now - self.result_touch_interval
+
+        registered_result = self.result_registry.get(storage, path)
+        if self._is_registered_result_actual(registered_result, now):
+            last_touched_timestamp = registered_result.get('last_touched_timestamp')
+            if last_touched_timestamp is None or last_touched_timestamp < touched_before:
+                self._touch_result(storage, path, touched_before, now)
+            return registered_result['status']
+
+        result = NodeJobResult.objects.filter(
+            storage=storage, path=path
+        ).values_list('status', 'ttl', 'last_touched_timestamp').first()
+        if result is None:
             return ResultStatus.NOT_EXIST
 
-    @staticmethod
-    def set_not_exist_status_for_expired_results():
+        status, ttl, last_touched_timestamp = result
+        self.result_registry.write(
+            {(storage, path): {'status': status, 'ttl': ttl, 'last_touched_timestamp': last_touched_timestamp}},
+            overwrite=False
+        )
+        if last_touched_timestamp is None or last_touched_timestamp < touched_before:
+            self._touch_result(storage, path, touched_before, now)
+        return status
+
+    def _is_registered_result_actual(self, registered_result, now):
+        """
+        Returns True if status from result registry can be used instead of status in database.
+        Calculated result is not trusted near its expiration, because it may be already expired in database
+        """
+        if registered_result is None or 'status' not in registered_result:
+            return False
+        if registered_result['status'] != ResultStatus.CALCULATED:
+            return True
+        if 'ttl' not in registered_result or 'last_touched_timestamp' not in registered_result:
+            return False
+        expiration = registered_result['last_touched_timestamp'] + registered_result['ttl'] - self.result_touch_interval
+        return expiration > now
+
+    def _touch_result(self, storage, path, touched_before, now):
+        # result may be touched by other process meanwhile
+        touched = NodeJobResult.objects.filter(
+            Q(last_touched_timestamp__isnull=True) | Q(last_touched_timestamp__lt=touched_before),
+            storage=storage, path=path
+        ).update(last_touched_timestamp=now)
+        if touched:
+            self.result_registry.write({(storage, path): {'last_touched_timestamp': now}})
+
+    def set_not_exist_status_for_expired_results(self):
         """
         Find results that expired and set status to NOT_EXIST
         Returns list of tuples with storage and path
         """
-        with transaction.atomic():
-            results = NodeJobResult.objects.filter(
-                status=ResultStatus.CALCULATED,
-                last_touched_timestamp__lt=datetime.datetime.now()-F('ttl')
-            )
-            result_list = [(r[0], r[1]) for r in results.values_list('storage', 'path')]
-            results = results.select_for_update()
-            results.update(status=ResultStatus.NOT_EXIST)
+        return [(storage, path) for storage, path, expiration_timestamp in self.expire_results()]
 
-        return result_list
+    def expire_results(self):
+        """
+        Sets NOT_EXIST status to calculated results that weren't touched during their ttl.
+        On PostgreSQL results are found and changed with one UPDATE ... RETURNING query,
+        so results expired by concurrent invocations are returned only once
+        Returns list of tuples (storage, path, expiration timestamp)
+        """
+        now = datetime.datetime.now()
+        if connection.vendor == 'postgresql':
+            expired_results = self._expire_results_returning(now)
+        else:
+            with transaction.atomic():
+                results = NodeJobResult.objects.select_for_update().filter(
+                    status=ResultStatus.CALCULATED,
+                    last_touched_timestamp__lt=now - F('ttl')
+                )
+                result_ids = []
+                expired_results = []
+                for result_id, storage, path, last_touched_timestamp, ttl in results.values_list(
+                    'id', 'storage', 'path', 'last_touched_timestamp', 'ttl'
+                ):
+                    result_ids.append(result_id)
+                    expired_results.append((storage, path, last_touched_timestamp + ttl))
+                NodeJobResult.objects.filter(pk__in=result_ids).update(status=ResultStatus.NOT_EXIST)
+
+        self.result_registry.write({
+            (storage, path): {'status': ResultStatus.NOT_EXIST} for storage, path, expiration_timestamp in expired_results
+        })
+        return expired_results
 
     @staticmethod
-    def remove_failed_forever_calculating_results():
+    def _expire_results_returning(now):
+        opts = NodeJobResult._meta
+        quote_name = connection.ops.quote_name
+        status, storage, path, last_touched_timestamp, ttl = (
+            quote_name(opts.get_field(field_name).column)
+            for field_name in ('status', 'storage', 'path', 'last_touched_timestamp', 'ttl')
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {quote_name(opts.db_table)} SET {status} = %s '
+                f'WHERE {status} = %s AND {last_touched_timestamp} < %s - {ttl} '
+                f'RETURNING {storage}, {path}, {last_touched_timestamp} + {ttl}',
+                [ResultStatus.NOT_EXIST.value, ResultStatus.CALCULATED.value, now]
+            )
+            return [tuple(row) for row in cursor.fetchall()]
+
+    def remove_failed_forever_calculating_results(self):
         # find calculating results
         # find created time and timeout from otl jobs
         # remove all results where created time + timeout + 60 sec < now
@@ -260,9 +480,9 @@ class NodeJobManager:
             else:  # no break
                 result.status = ResultStatus.NOT_EXIST
                 result.save()
+                self._register_results([result])
 
-    @staticmethod
-    def set_result_status(storage: ResultStorage, path, status: ResultStatus):
+    def set_result_status(self, storage: ResultStorage, path, status: ResultStatus):
         """
         Sets status result
         """
@@ -273,10 +493,29 @@ class NodeJobManager:
             if status == ResultStatus.CALCULATED:
                 result.finish_timestamp = datetime.datetime.now()
             result.save()
+            self._register_results([result])
         except NodeJobResult.DoesNotExist:
             log.error(f'Can\'t find node job result with storage = {storage}, path={path}')
 
+    def set_result_statuses(self, result_keys, status: ResultStatus):
+        """
+        Sets status of several results with one update query
+        :param result_keys: iterable of (storage, path) tuples
+        """
+        result_keys = list(result_keys)
+        results_filter = Q()
+        for storage, path in result_keys:
+            results_filter |= Q(storage=storage, path=path)
+        if not results_filter:
+            return
+        now = datetime.datetime.now()
+        NodeJobResult.objects.filter(results_filter).update(status=status, last_touched_timestamp=now)
+        self.result_registry.write(
+            {result_key: {'status': status, 'last_touched_timestamp': now} for result_key in result_keys}
+        )
+
     @staticmethod
+    @flush_status_changes
     def get_waiting_same_result_node_jobs(storage: ResultStorage, path):
         """
         Returns dict of node jobs waiting the same result
@@ -285,19 +524,24 @@ class NodeJobManager:
             result = NodeJobResult.objects.get(storage=storage, path=path)
             return list(map(
                 NodeJobManager.get_node_job_dict,
-                NodeJob.objects.filter(result=result, status=NodeJobStatus.WAITING_SAME_RESULT)
+                NodeJob.objects.filter(
+                    result=result, status=NodeJobStatus.WAITING_SAME_RESULT
+                ).select_related('result', 'otl_job')
             ))
         except NodeJobResult.DoesNotExist:
             return []
 
     @staticmethod
+    @flush_status_changes
     def get_unfinished_node_jobs_for_otl_job(otl_job_uuid):
         """
         Returns list node jobs dictionary for otl job
         """
         try:
             otl_job = OtlJob.objects.get(uuid=otl_job_uuid)
-            node_jobs = NodeJob.objects.filter(otl_job=otl_job).exclude(status__in=END_STATUSES)
+            node_jobs = NodeJob.objects.filter(
+                otl_job=otl_job
+            ).exclude(status__in=END_STATUSES).select_related('result', 'otl_job')
             return list(
                 map(
                     lambda node_job: NodeJobManager.get_node_job_dict(node_job),
@@ -310,26 +554,103 @@ class NodeJobManager:
         return []
 
     @staticmethod
-    def get_node_jobs_for_cancelling(failed_node_job):
+    @flush_status_changes
+    def get_node_jobs_with_statuses(statuses):
         """
-        Get running node jobs uuid that must be cancel
-        :failed_node_job_uuid: failed node job
-        :return:
-        list of node jobs uuids that in running state
+        Returns list of dictionaries of node jobs with given statuses
         """
-        if not isinstance(failed_node_job, NodeJob):
-            failed_node_job = NodeJob.objects.get(uuid=failed_node_job)
-
-        running_node_jobs = NodeJob.objects.filter(
-            otl_job=failed_node_job.otl_job
-        ).exclude(status__in=END_STATUSES)
+        node_jobs = NodeJob.objects.filter(status__in=statuses).select_related('result', 'otl_job')
+        return [NodeJobManager.get_node_job_dict(node_job) for node_job in node_jobs]
 
-        return list(running_node_jobs.values_list('uuid', flat=True))
+    @staticmethod
+    @flush_status_changes
+    def get_node_job_statuses(node_job_uuids):
+        """
+        Returns dictionary node job uuid -> status, node jobs that don't exist are absent in dictionary
+        """
+        return dict(
+            NodeJob.objects.filter(uuid__in=list(node_job_uuids)).values_list('uuid', 'status')
+        )
 
     @staticmethod
-    def delete_old_node_job_results(older_than: datetime.timedelta):
+    @flush_status_changes
+    def get_otl_job_node_jobs_for_cancelling(otl_job_uuid):
+        """
+        Loads with one query unfinished node jobs of otl job with their results and computing nodes
+        :param otl_job_uuid: otl job uuid
+        :return:
+        list of tuples (node job dictionary, computing node uuid or None, result_is_awaited),
+        result_is_awaited is True if node jobs of other otl jobs wait for the same result
+        """
+        waiting_same_result_node_jobs = NodeJob.objects.filter(
+            result=OuterRef('result'), status=NodeJobStatus.WAITING_SAME_RESULT
+        ).exclude(otl_job=OuterRef('otl_job'))
+
+        node_jobs = NodeJob.objects.filter(
+            otl_job__uuid=otl_job_uuid
+        ).exclude(
+            status__in=END_STATUSES
+        ).select_related(
+            'result', 'otl_job', 'computing_node'
+        ).annotate(
+            result_is_awaited=Exists(waiting_same_result_node_jobs)
+        )
+
+        return [
+            (
+                NodeJobManager.get_node_job_dict(node_job),
+                node_job.computing_node.uuid if node_job.computing_node is not None else None,
+                node_job.result_is_awaited,
+            )
+            for node_job in node_jobs
+        ]
+
+    def reconcile_result_registry(self, chunk_size=1000):
+        """
+        Removes from result registry results that differ from database or don't exist in it,
+        they are read from database on the next status read.
+        Differing results are removed instead of rewritten, so result changed meanwhile doesn't get stale fields
+        :return: tuple (number of checked results, number of removed results)
+        """
+        checked_results = 0
+        removed_results = 0
+        result_keys = list(self.result_registry.result_keys())
+        for chunk_start in range(0, len(result_keys), chunk_size):
+            chunk = result_keys[chunk_start:chunk_start + chunk_size]
+            registered_results = self.result_registry.get_many(chunk)
+
+            results_filter = Q()
+            for storage, path in chunk:
+                results_filter |= Q(storage=storage, path=path)
+            database_results = {
+                (storage, path): (status, ttl, last_touched_timestamp)
+                for storage, path, status, ttl, last_touched_timestamp in NodeJobResult.objects.filter(
+                    results_filter
+                ).values_list('storage', 'path', 'status', 'ttl', 'last_touched_timestamp')
+            }
+
+            inconsistent_result_keys = []
+            for result_key, registered_result in registered_results.items():
+                if result_key not in database_results:
+                    inconsistent_result_keys.append(result_key)
+                    continue
+                status, ttl, last_touched_timestamp = database_results[result_key]
+                registered_last_touched_timestamp = registered_result.get('last_touched_timestamp')
+                if registered_result.get('status', status) != status or registered_result.get('ttl', ttl) != ttl or (
+                    registered_last_touched_timestamp is not None and last_touched_timestamp is not None
+                    and registered_last_touched_timestamp > last_touched_timestamp + self.result_touch_interval
+                ):
+                    inconsistent_result_keys.append(result_key)
+
+            self.result_registry.delete(inconsistent_result_keys)
+            checked_results += len(registered_results)
+            removed_results += len(inconsistent_result_keys)
+        return checked_results, removed_results
+
+    def delete_old_node_job_results(self, older_than: datetime.timedelta):
         """
         Delete all node job results older than given timedelta
         """
         old_node_jobs = NodeJobResult.objects.filter(last_touched_timestamp__lt=datetime.datetime.now() - older_than)
+        self.result_registry.delete(old_node_jobs.values_list('storage', 'path'))
         old_node_jobs.delete()
@@ -0,0 +1,121 @@
+import logging
+import threading
+
+from uuid import UUID
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NodeJob
+from .otl_job_progress import count_node_job_status_change
+
+log = logging.getLogger('otl_interpreter.interpreter_db')
+
+
+class NodeJobStatusWriter:
+    """
+    Collects node job status changes and writes them to database in bulk.
+    Changes are collected only inside batch context, every thread has its own batch.
+    Changes with equal previous status, status and status text are written with one update query.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def batching(self):
+        return getattr(self._local, 'depth', 0) > 0
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager, collects status changes and flushes them on exit
+        Yields list that will contain (node_job_uuid, status, status_text) tuples for status changes that were not
+        written because status in database differs from expected status
+        """
+        if not self.batching:
+            self._local.pending = {}
+            self._local.failed = []
+            self._local.depth = 0
+        self._local.depth += 1
+        try:
+            yield self._local.failed
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                self.flush()
+
+    @staticmethod
+    def _key(node_job_uuid) -> str:
+        if isinstance(node_job_uuid, UUID):
+            return node_job_uuid.hex
+        return UUID(str(node_job_uuid)).hex
+
+    def add(self, node_job_uuid, status, status_text=None, expected_status=None):
+        """
+        Adds status change to current batch
+        Several changes of one node job are merged, so only last status is written
+        """
+        key = self._key(node_job_uuid)
+        if key in self._local.pending:
+            _, _, _, expected_status = self._local.pending[key]
+        self._local.pending[key] = (node_job_uuid, status, status_text, expected_status)
+
+    def flush(self):
+        """
+        Writes all collected status changes to database
+        """
+        pending = getattr(self._local, 'pending', None)
+        if not pending:
+            return
+        self._local.pending = {}
+
+        groups = defaultdict(list)
+        for node_job_uuid, status, status_text, expected_status in pending.values():
+            groups[(expected_status, status, status_text)].append(node_job_uuid)
+
+        now = timezone.now()
+        with transaction.atomic():
+            for (expected_status, status, status_text), node_job_uuids in groups.items():
+                node_jobs = NodeJob.objects.filter(uuid__in=node_job_uuids)
+                if expected_status is not None:
+                    node_jobs = node_jobs.filter(status=expected_status)
+
+                if len(node_job_uuids) == node_jobs.update(status=status, status_text=status_text, modified_time=now):
+                    if expected_status is not None:
+                        count_node_job_status_change(node_job_uuids, expected_status, status)
+                    continue
+
+                # node jobs changed by this flush have its modification time,
+                # node jobs moved to the same status by someone else are not changed by this flush
+                changed_uuids = list(NodeJob.objects.filter(
+                    uuid__in=node_job_uuids, status=status, modified_time=now
+                ).values_list('uuid', flat=True))
+                if expected_status is not None:
+                    count_node_job_status_change(changed_uuids, expected_status, status)
+
+                # find node jobs whose status wasn't changed
+                changed_keys = set(map(self._key, changed_uuids))
+                for node_job_uuid in node_job_uuids:
+                    if self._key(node_job_uuid) not in changed_keys:
+                        log.info(f'Node job {node_job_uuid} status is not {expected_status}, status wasn\'t changed')
+                        self._local.failed.append((node_job_uuid, status, status_text))
+
+        log.debug(f'Flushed {len(pending)} node job status changes with {len(groups)} queries')
+
+
+node_job_status_writer = NodeJobStatusWriter()
+
+
+def flush_status_changes(f):
+    """
+    Decorator for methods that read node job status
+    Flushes collected status changes, so the method reads actual statuses
+    """
+    @wraps(f)
+    def wrap_function(*args, **kwargs):
+        node_job_status_writer.flush()
+        return f(*args, **kwargs)
+    return wrap_function
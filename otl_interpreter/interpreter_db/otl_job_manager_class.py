@@ -1,7 +1,7 @@
 import logging
 import datetime
 
-from typing import Optional
+from typing import Optional, Tuple
 from uuid import UUID
 from django.db.models import F
 from django.core.exceptions import ObjectDoesNotExist
@@ -28,6 +28,16 @@ class OtlJobManager:
         otl_job = OtlJob.objects.get(uuid=otl_job_id)
         return otl_job.status, otl_job.status_text
 
+    @staticmethod
+    def get_progress(otl_job_id: UUID) -> Optional[dict]:
+        """
+        Returns dictionary with numbers of all, running, finished and failed node jobs of otl job
+        or None if otl job doesn't exist
+        """
+        return OtlJob.objects.filter(uuid=otl_job_id).values(
+            'total_node_jobs', 'running_node_jobs', 'finished_node_jobs', 'failed_node_jobs'
+        ).first()
+
     def get_result(self, otl_job_id: UUID) -> Optional[NodeJobResult]:
         try:
             otl_job = OtlJob.objects.get(uuid=otl_job_id)
@@ -62,21 +72,33 @@ class OtlJobManager:
         except OtlJob.DoesNotExist:
             log.error(f'Otl job with uuid: {otl_job_uuid} doesn\'t exist')
 
+    @staticmethod
+    def get_created_time_and_timeout(otl_job_uuid: UUID) -> Optional[Tuple[datetime.datetime, datetime.timedelta]]:
+        """
+        Returns tuple otl job creation time and timeout or None if otl job doesn't exist
+        """
+        created_time_and_timeout = OtlJob.objects.filter(uuid=otl_job_uuid).values_list(
+            'created_time', 'timeout'
+        ).first()
+        if created_time_and_timeout is None:
+            log.error(f'Otl job with uuid: {otl_job_uuid} doesn\'t exist')
+        return created_time_and_timeout
+
     @staticmethod
     def _form_fail_status_message(otl_job: OtlJob):
-        failed_node_jobs = otl_job.nodejobs.filter(status=NodeJobStatus.FAILED)
-        status_text = '\n'.join(map(
-            lambda node_job: str(node_job.uuid.hex) + ': ' + node_job.status_text,
-            failed_node_jobs
-        ))
+        if otl_job.failed_node_jobs <= 0:
+            return ''
+        failed_node_jobs = otl_job.nodejobs.filter(status=NodeJobStatus.FAILED).values_list('uuid', 'status_text')
+        status_text = '\n'.join(
+            f'{node_job_uuid.hex}: {node_job_status_text}' for node_job_uuid, node_job_status_text in failed_node_jobs
+        )
         return status_text
 
     @staticmethod
     def _form_running_status_message(otl_job: OtlJob):
-        total_node_jobs = otl_job.nodejobs.count()
-        running_node_jobs = otl_job.nodejobs.filter(status=NodeJobStatus.RUNNING).count()
-        finished_node_jobs = otl_job.nodejobs.filter(status=NodeJobStatus.FINISHED).count()
-        return f'Running {running_node_jobs} of {total_node_jobs} node_jobs. Finished {finished_node_jobs} '
+        # counters are changed with node job statuses, so no node jobs are read
+        return f'Running {otl_job.running_node_jobs} of {otl_job.total_node_jobs} node_jobs. ' \
+               f'Finished {otl_job.finished_node_jobs} '
 
     @staticmethod
     def delete_old_otl_query_info(older_than: datetime.timedelta):
@@ -0,0 +1,47 @@
+from django.db.models import F, Count
+
+from .models import OtlJob, NodeJob
+from .enums import NodeJobStatus
+
+
+# node job status -> otl job counter of node jobs with that status
+node_job_counter_fields = {
+    NodeJobStatus.RUNNING: 'running_node_jobs',
+    NodeJobStatus.FINISHED: 'finished_node_jobs',
+    NodeJobStatus.FAILED: 'failed_node_jobs',
+}
+
+
+def count_node_job_status_change(node_job_uuids, previous_status, status):
+    """
+    Moves node jobs from counter of previous status to counter of new status in their otl jobs,
+    invoked after node job statuses were changed in database
+    :param node_job_uuids: list of node job uuids whose status was changed
+    :param previous_status: status of node jobs before change
+    :param status: new status
+    """
+    counter_changes = {}
+    if previous_status in node_job_counter_fields:
+        counter_changes[node_job_counter_fields[previous_status]] = -1
+    if status in node_job_counter_fields:
+        field = node_job_counter_fields[status]
+        counter_changes[field] = counter_changes.get(field, 0) + 1
+    counter_changes = {field: change for field, change in counter_changes.items() if change}
+
+    if not counter_changes or not node_job_uuids:
+        return
+
+    # common case, one query without reading otl job
+    if len(node_job_uuids) == 1:
+        OtlJob.objects.filter(nodejobs__uuid=node_job_uuids[0]).update(
+            **{field: F(field) + change for field, change in counter_changes.items()}
+        )
+        return
+
+    node_job_counts = NodeJob.objects.filter(uuid__in=node_job_uuids).order_by().values(
+        'otl_job_id'
+    ).annotate(count=Count('id')).values_list('otl_job_id', 'count')
+    for otl_job_id, node_job_count in node_job_counts:
+        OtlJob.objects.filter(pk=otl_job_id).update(
+            **{field: F(field) + change * node_job_count for field, change in counter_changes.items()}
+        )
@@ -0,0 +1,170 @@
+import datetime
+import logging
+
+from typing import Optional
+
+from redis import RedisError
+
+from .enums import ResultStatus
+
+log = logging.getLogger('otl_interpreter.interpreter_db')
+
+# writes fields absent in entry, expiry is set only to entry created by filling,
+# so filling doesn't prolong existing entry
+FILL_SCRIPT = """
+local created = redis.call('TTL', KEYS[1]) < 0
+for i = 2, #ARGV, 2 do
+    redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if created then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+"""
+
+
+class ResultRegistry:
+    """
+    Mirror of node job results in redis for status lookups without database queries.
+    Every result is a redis hash with status, ttl and last touched timestamp fields.
+    Database stays the source of truth: fields are written to registry after database,
+    missing fields are filled from database and never overwrite written ones,
+    entries expire and are reconciled with database periodically.
+    Redis errors are logged and registry behaves as empty
+    """
+    key_prefix = 'otl_interpreter_result_registry'
+
+    def __init__(self, redis=None, entry_ttl=300):
+        """
+        :param redis: redis client, if None registry is disabled
+        :param entry_ttl: seconds to keep registry entry after last write
+        """
+        self.redis = redis
+        self.entry_ttl = entry_ttl
+        self._fill_script = redis.register_script(FILL_SCRIPT) if redis is not None else None
+
+    @property
+    def enabled(self):
+        return self.redis is not None
+
+    @classmethod
+    def _key(cls, storage, path):
+        return f'{cls.key_prefix}:{storage}:{path}'
+
+    @staticmethod
+    def _encode(fields: dict) -> dict:
+        encoded_fields = {}
+        for field, value in fields.items():
+            # unknown fields are not written
+            if value is None:
+                continue
+            if isinstance(value, datetime.timedelta):
+                value = value.total_seconds()
+            elif isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            encoded_fields[field] = str(value)
+        return encoded_fields
+
+    @staticmethod
+    def _decode(encoded_fields: dict) -> dict:
+        fields = {field.decode(): value.decode() for field, value in encoded_fields.items()}
+        if 'status' in fields:
+            fields['status'] = ResultStatus(fields['status'])
+        if 'ttl' in fields:
+            fields['ttl'] = datetime.timedelta(seconds=float(fields['ttl']))
+        if 'last_touched_timestamp' in fields:
+            fields['last_touched_timestamp'] = datetime.datetime.fromisoformat(fields['last_touched_timestamp'])
+        return fields
+
+    def get(self, storage, path) -> Optional[dict]:
+        """
+        Returns dictionary with known fields of result: status, ttl, last_touched_timestamp
+        or None if result isn't in registry
+        """
+        if not self.enabled:
+            return None
+        try:
+            encoded_fields = self.redis.hgetall(self._key(storage, path))
+        except RedisError as err:
+            log.error(f'Failed to read result {storage}: {path} from result registry: {err}')
+            return None
+        if not encoded_fields:
+            return None
+        return self._decode(encoded_fields)
+
+    def get_many(self, result_keys) -> dict:
+        """
+        Returns dictionary (storage, path) -> fields of results that are in registry, read with one round trip
+        :param result_keys: list of (storage, path) tuples
+        """
+        if not self.enabled or not result_keys:
+            return {}
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for storage, path in result_keys:
+                pipeline.hgetall(self._key(storage, path))
+            encoded_results = pipeline.execute()
+        except RedisError as err:
+            log.error(f'Failed to read {len(result_keys)} results from result registry: {err}')
+            return {}
+        return {
+            result_key: self._decode(encoded_fields)
+            for result_key, encoded_fields in zip(result_keys, encoded_results) if encoded_fields
+        }
+
+    def write(self, results: dict, overwrite=True):
+        """
+        Writes fields of results to registry with one round trip
+        :param results: dictionary (storage, path) -> dictionary with fields to write
+        :param overwrite: if False only fields absent in registry are written,
+        used when fields are read from database and may be older than written ones
+        """
+        if not self.enabled or not results:
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for (storage, path), fields in results.items():
+                key = self._key(storage, path)
+                encoded_fields = self._encode(fields)
+                if not encoded_fields:
+                    continue
+                if overwrite:
+                    pipeline.hset(key, mapping=encoded_fields)
+                    pipeline.expire(key, self.entry_ttl)
+                else:
+                    args = [self.entry_ttl]
+                    for field, value in encoded_fields.items():
+                        args.extend((field, value))
+                    self._fill_script(keys=[key], args=args, client=pipeline)
+            pipeline.execute()
+        except RedisError as err:
+            log.error(f'Failed to write {len(results)} results to result registry: {err}')
+            if overwrite:
+                # entries with old fields would be trusted until expiration
+                self.delete(results.keys())
+
+    def delete(self, result_keys):
+        """
+        Removes results from registry
+        :param result_keys: iterable of (storage, path) tuples
+        """
+        keys = [self._key(storage, path) for storage, path in result_keys]
+        if not self.enabled or not keys:
+            return
+        try:
+            self.redis.delete(*keys)
+        except RedisError as err:
+            log.error(f'Failed to delete {len(keys)} results from result registry: {err}')
+
+    def result_keys(self):
+        """
+        Iterates over (storage, path) tuples of results in registry
+        """
+        if not self.enabled:
+            return
+        prefix_length = len(self.key_prefix) + 1
+        try:
+            for key in self.redis.scan_iter(match=f'{self.key_prefix}:*', count=1000):
+                storage, path = key.decode()[prefix_length:].split(':', 1)
+                yield storage, path
+        except RedisError as err:
+            log.error(f'Failed to scan results in result registry: {err}')
@@ -3,13 +3,20 @@ from otl_interpreter.interpreter_db.enums import ComputingNodeType
 
 from .command_tree_constructor import make_command_tree
 from .define_computing_node_type_algorithm import define_computing_node_type_for_command_tree
-from .node_job_tree_constructor import make_node_job_tree
+from .node_job_tree_constructor import make_node_job_tree_template, bind_node_job_tree
+from .plan_cache import PlanCache
 
 
 class JobPlanner:
-    def __init__(self, node_type_priority, subsearch_is_node_job=False):
+    def __init__(self, node_type_priority, subsearch_is_node_job=False, plan_cache=None):
+        """
+        :param node_type_priority: list of computing node types in priority order
+        :param subsearch_is_node_job: default flag, make node job for each subsearch
+        :param plan_cache: cache of node job tree templates shared between planners, planner has no cache if not passed
+        """
         self.node_type_priority = self._form_node_type_priority_list(node_type_priority)
         self.subsearch_is_node_job = subsearch_is_node_job
+        self.plan_cache = plan_cache or PlanCache(size=0)
 
 
     @staticmethod
@@ -18,7 +25,7 @@ class JobPlanner:
         Forms the list of node types
         Node type priority list given in init function may not have all node types.
         """
-        registered_node_types = node_commands_manager.get_node_types()
+        registered_node_types = node_commands_manager.get_command_registry().node_types
         not_in_priority_list_node_types = registered_node_types - set(node_type_priority)
 
         if node_type_priority[-1] == ComputingNodeType.POST_PROCESSING.value:
@@ -40,6 +47,24 @@ class JobPlanner:
         if subsearch_is_node_job is None:
             subsearch_is_node_job = self.subsearch_is_node_job
 
+        # commands are taken from one snapshot during planning
+        command_registry = node_commands_manager.get_command_registry()
+
+        # plan depends only on commands, so planned node job tree is reused for the same query
+        plan_key = None
+        translated_query_hash = None
+        if self.plan_cache.size > 0:
+            translated_query_hash = self.plan_cache.translated_query_hash(translated_otl_commands)
+        if translated_query_hash is not None:
+            plan_key = (
+                translated_query_hash, tuple(self.node_type_priority), command_registry.version,
+                shared_post_processing, subsearch_is_node_job
+            )
+            node_job_tree = self.plan_cache.get(plan_key)
+            if node_job_tree is not None:
+                bind_node_job_tree(node_job_tree, tws, twf, command_registry)
+                return node_job_tree
+
         # create command tree
         top_command_tree = make_command_tree(
             translated_otl_commands
@@ -47,18 +72,20 @@ class JobPlanner:
 
         # command names by computing node types
         command_name_set = {
-            node_type: node_commands_manager.get_command_name_set_for_node_type(node_type)
+            node_type: command_registry.get_command_name_set_for_node_type(node_type)
             for node_type in self.node_type_priority
         }
 
         # exclude from computing node type priority list types that not registered
-        node_types = node_commands_manager.get_node_types()
-        node_type_priority = [x for x in self.node_type_priority if x in node_types]
+        node_type_priority = [x for x in self.node_type_priority if x in command_registry.node_types]
         define_computing_node_type_for_command_tree(
             top_command_tree, node_type_priority, command_name_set
         )
 
-        node_job_tree = make_node_job_tree(top_command_tree, tws, twf, shared_post_processing, subsearch_is_node_job)
+        node_job_tree = make_node_job_tree_template(top_command_tree, shared_post_processing, subsearch_is_node_job)
+        if plan_key is not None:
+            self.plan_cache.set(plan_key, node_job_tree)
+        bind_node_job_tree(node_job_tree, tws, twf, command_registry)
 
         return node_job_tree
 
@@ -27,13 +27,30 @@ class NodeJobTreeStorage:
         return self._node_job_tree_for_command_tree[id(command_tree)]
 
 
-def make_node_job_tree(top_command_tree, tws=None, twf=None, shared_post_processing=True, subsearch_is_node_job=False):
+def make_node_job_tree(
+        top_command_tree, tws=None, twf=None, shared_post_processing=True, subsearch_is_node_job=False,
+        command_registry=None
+):
     """
     :param top_command_tree: root command tree with defined computing node type
     :param tws: time window start
     :param twf: time window finish
     :param shared_post_processing: for post processing, define result storage type (shared or local)
     :param subsearch_is_node_job: flag, make node job for each subsearch
+    :param command_registry: snapshot of registered commands, current snapshot is used if not passed
+    """
+    top_node_job = make_node_job_tree_template(top_command_tree, shared_post_processing, subsearch_is_node_job)
+    bind_node_job_tree(top_node_job, tws, twf, command_registry)
+    return top_node_job
+
+
+def make_node_job_tree_template(top_command_tree, shared_post_processing=True, subsearch_is_node_job=False):
+    """
+    Makes node job tree without time window arguments and result paths.
+    Template doesn't depend on time window, so it can be reused for the same query
+    :param top_command_tree: root command tree with defined computing node type
+    :param shared_post_processing: for post processing, define result storage type (shared or local)
+    :param subsearch_is_node_job: flag, make node job for each subsearch
     """
     top_node_job = _construct_node_job_tree(top_command_tree, subsearch_is_node_job)
 
@@ -41,9 +58,23 @@ def make_node_job_tree(top_command_tree, tws=None, twf=None, shared_post_process
     # top node result address creation is individual case
     _make_address_for_result_node_job(top_node_job, shared_post_processing)
 
+    return top_node_job
+
+
+def bind_node_job_tree(top_node_job, tws=None, twf=None, command_registry=None):
+    """
+    Sets time window arguments and result paths to node job tree template
+    :param top_node_job: node job tree template
+    :param tws: time window start
+    :param twf: time window finish
+    :param command_registry: snapshot of registered commands, current snapshot is used if not passed
+    """
+    if command_registry is None:
+        command_registry = node_commands_manager.get_command_registry()
+
     # set time window for commands
     # set timestamp to not idempotent commands
-    _set_arguments_to_commands(top_node_job, tws, twf)
+    _set_arguments_to_commands(top_node_job, tws, twf, command_registry)
 
     # calculate result dataframe paths as hash of command tree json
     _set_read_write_commands_paths(top_node_job)
@@ -51,8 +82,6 @@ def make_node_job_tree(top_command_tree, tws=None, twf=None, shared_post_process
     # put subsearches to command arguments
     _put_subsearches_to_command_arguments(top_node_job)
 
-    return top_node_job
-
 
 def _construct_node_job_tree(top_command_tree, subsearch_is_node_job=False):
     """
@@ -96,13 +125,13 @@ def _set_read_write_commands_paths(top_node_job):
             node_job.set_path_for_result_address(path)
 
 
-def _set_arguments_to_commands(top_node_job, tws, twf):
+def _set_arguments_to_commands(top_node_job, tws, twf, command_registry):
     """
     Sets additional named arguments for all commands with use_timewindow (earliest, latest) and idempotent flag
     """
     for node_job in top_node_job.parent_first_order_traverse_iterator():
         for command in node_job.command_iterator():
-            command_attr = node_commands_manager.get_command_attributes(command.name)
+            command_attr = command_registry.get_command_attributes(command.name)
             if command_attr['use_timewindow']:
                 command.add_argument('earliest', value=int(tws.timestamp()), key='earliest')
                 command.add_argument('latest', value=int(twf.timestamp()), key='latest')
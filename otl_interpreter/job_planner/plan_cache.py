@@ -0,0 +1,77 @@
+import hashlib
+import json
+import threading
+import uuid
+
+from collections import OrderedDict
+from copy import deepcopy
+
+from otl_interpreter.utils.synchronized import synchronized
+
+
+class PlanCache:
+    """
+    LRU cache of planned node job trees without time window and result paths.
+    Template is copied on every hit, copy gets new node job uuids
+    """
+    def __init__(self, size=1000):
+        """
+        :param size: max number of node job tree templates, 0 disables cache
+        """
+        self.size = size
+        self._templates = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def translated_query_hash(translated_otl_commands):
+        """
+        Returns hash of translated commands or None if commands can't be serialized
+        """
+        try:
+            translated_query_json = json.dumps(
+                [command.to_dict() for command in translated_otl_commands], sort_keys=True
+            )
+        except (TypeError, ValueError, AttributeError):
+            return None
+        return hashlib.blake2b(translated_query_json.encode()).hexdigest()
+
+    @synchronized
+    def get(self, key):
+        """
+        Returns copy of node job tree template or None if key is not in cache
+        """
+        template = self._templates.get(key)
+        if template is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._templates.move_to_end(key)
+        return self._copy_template(template)
+
+    @synchronized
+    def set(self, key, top_node_job_tree):
+        """
+        Puts copy of node job tree without time window and result paths to cache
+        """
+        if self.size <= 0:
+            return
+
+        self._templates[key] = deepcopy(top_node_job_tree)
+        self._templates.move_to_end(key)
+        while len(self._templates) > self.size:
+            self._templates.popitem(last=False)
+
+    @staticmethod
+    def _copy_template(template):
+        top_node_job_tree = deepcopy(template)
+        for node_job_tree in top_node_job_tree.parent_first_order_traverse_iterator():
+            node_job_tree.uuid = uuid.uuid4()
+        return top_node_job_tree
+
+    @synchronized
+    def clear(self):
+        self._templates.clear()
@@ -0,0 +1,54 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# counter field -> node job status counted by field, None for all node jobs
+node_job_counters = {
+    'total_node_jobs': None,
+    'running_node_jobs': 'RUNNING',
+    'finished_node_jobs': 'FINISHED',
+    'failed_node_jobs': 'FAILED',
+}
+
+
+def count_node_jobs(apps, schema_editor):
+    OtlJob = apps.get_model('otl_interpreter', 'OtlJob')
+    NodeJob = apps.get_model('otl_interpreter', 'NodeJob')
+    for field, status in node_job_counters.items():
+        node_jobs = NodeJob.objects.filter(otl_job=OuterRef('pk'))
+        if status is not None:
+            node_jobs = node_jobs.filter(status=status)
+        node_job_count = node_jobs.order_by().values('otl_job').annotate(count=Count('pk')).values('count')
+        OtlJob.objects.update(**{field: Coalesce(Subquery(node_job_count), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otl_interpreter', '0004_alter_nodecommand_resource_necessity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='otljob',
+            name='total_node_jobs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='otljob',
+            name='running_node_jobs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='otljob',
+            name='finished_node_jobs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='otljob',
+            name='failed_node_jobs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_node_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otl_interpreter', '0005_otljob_node_job_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='computingnode',
+            name='protocol_version',
+            field=models.IntegerField(default=1),
+        ),
+    ]
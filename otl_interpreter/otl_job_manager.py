@@ -91,12 +91,12 @@ class OtlJobManager:
             status_text=f'Otl job was decomposed on node jobs and planned'
         )
         log.info(f'Send otl job {otl_job_uuid} to dispatcher')
-        self._send_new_job_to_dispatcher(top_node_job_tree, user_guid)
+        self._send_new_job_to_dispatcher(top_node_job_tree, otl_job_uuid, user_guid)
 
         return otl_job_uuid, top_node_job_tree.result_address.storage_type, top_node_job_tree.result_address.path
 
     @staticmethod
-    def _send_new_job_to_dispatcher(top_node_job_tree, user_guid: UUID):
+    def _send_new_job_to_dispatcher(top_node_job_tree, otl_job_uuid: UUID, user_guid: UUID):
         """
         sends message to dispatcher with list of NodeJobs to execute in first order
         """
@@ -110,6 +110,7 @@ class OtlJobManager:
         message = json.dumps({
             'command_name': 'NEW_OTL_JOB',
             'command': {
+                'otl_job_uuid': otl_job_uuid.hex,
                 'node_jobs': [
                     {
                         'uuid': node_job_tree.uuid.hex,
@@ -133,6 +134,10 @@ class OtlJobManager:
     def check_job(job_id: UUID):
         return db_otl_job_manager.check_job(job_id)
 
+    @staticmethod
+    def get_job_progress(job_id: UUID):
+        return db_otl_job_manager.get_progress(job_id)
+
     @staticmethod
     def cancel_job(job_id: UUID, status_text=None):
         db_otl_job_manager.cancel_job(job_id, status_text)
@@ -142,6 +147,7 @@ class OtlJobManager:
             {
                 'command_name': 'CANCEL_JOB',
                 'command': {
+                    'otl_job_uuid': job_id,
                     'node_jobs': unfinished_node_jobs
                 }
             },  cls=UUIDEncoder
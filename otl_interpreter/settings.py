@@ -18,17 +18,49 @@ default_ini_config = {
         'password': 'otl_interpreter'
     },
     'node_job': {
-      'cache_ttl': '60'
+      'cache_ttl': '60',
+      'result_touch_interval': '10',
     },
     'job_planer': {
         'computing_node_type_priority': 'SPARK EEP POST_PROCESSING',
-        'subsearch_is_node_job': 'True'
+        'subsearch_is_node_job': 'True',
+        'plan_cache_size': '1000',
     },
     'dispatcher': {
         'one_process_mode': 'False',
         'check_job_queue_period': '10',
         'host_id': os.popen("hostid").read().strip(),
-        'health_check_period': '15'
+        'health_check_period': '15',
+        'node_job_cache_size': '10000',
+        'node_job_cache_ttl': '60',
+        'node_job_lease_time': '60',
+        'priority_policy': 'fifo',
+        'fair_share_weight': '10',
+        'shortest_job_first_weight': '1',
+        'node_placement': 'least_loaded',
+        'message_concurrency': '1',
+        'message_queue_size': '100',
+        'db_workers': '0',
+        'workers': '1',
+        'worker_queue_size': '1000',
+        'queue_reconciliation_period': '300',
+        'job_message_batch_size': '100',
+        'job_message_batch_delay': '5',
+    },
+    'redis': {
+        'max_connections': '50',
+        'pool_timeout': '20',
+        'pool_saturation_warning': '0.9',
+    },
+    'result_registry': {
+        'enabled': 'True',
+        'entry_ttl': '300',
+        'reconciliation_period': '60',
+    },
+    'translator': {
+        'cache_size': '1000',
+        'shared_cache': 'False',
+        'shared_cache_ttl': '300',
     },
     'otl_job_defaults': {
         'cache_ttl': '60',
@@ -42,6 +74,7 @@ default_ini_config = {
     },
     'service_task_options': {
         'remove_expired_dataframes_period': '15',
+        'remove_expired_dataframes_workers': '8',
         'keep_query_info_days': '30'
     },
     'storages': {
@@ -105,7 +138,13 @@ CELERY_BEAT_SCHEDULE = {
             seconds=15
         ),
         'task': 'otl_interpreter.tasks.cancel_otl_job_by_timeout',
-    }
+    },
+    'reconcile_result_registry': {
+        'schedule': datetime.timedelta(
+            seconds=int(ini_config['result_registry']['reconciliation_period'])
+        ),
+        'task': 'otl_interpreter.tasks.reconcile_result_registry',
+    },
 }
 
 
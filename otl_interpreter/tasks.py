@@ -1,8 +1,10 @@
+import os
+import time
 import datetime
 import logging
 import shutil
 
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from core.celeryapp import app
@@ -10,7 +12,6 @@ from otl_interpreter.otl_job_manager import otl_job_manager
 from otl_interpreter.interpreter_db import (
     node_job_manager as db_node_job_manager, otl_job_manager as db_otl_job_manager
 )
-from otl_interpreter.interpreter_db.enums import ResultStorage
 from otl_interpreter.settings import ini_config
 
 from ot_simple_rest_job_proxy.job_proxy_manager import job_proxy_manager
@@ -50,22 +51,62 @@ def makejob(otl_query, user_guid, tws=None, twf=None, twds=None, twdf=None, cach
     otl_job_manager.makejob(otl_query, user_guid, tws, twf, cache_ttl, timeout, shared, subsearch_is_node_job)
 
 
+def _remove_result_directory(full_path_to_result: Path) -> int:
+    """
+    Removes result directory
+    Returns number of bytes freed
+    """
+    freed_bytes = 0
+    for dir_path, _, file_names in os.walk(full_path_to_result):
+        for file_name in file_names:
+            try:
+                freed_bytes += os.lstat(os.path.join(dir_path, file_name)).st_size
+            except OSError:
+                pass
+    shutil.rmtree(full_path_to_result, ignore_errors=True)
+    log.debug(f'Removed expire result {full_path_to_result}')
+    return freed_bytes
+
+
 @app.task()
 def delete_expired_results():
     """
     Removes all dataframes result with last touched timestamp less than 60 sec ago (or other configured)
+    Result directories are removed by bounded number of threads, because storages may be on network file system
+    Returns dictionary with number of removed results, freed bytes, max lag of removing after result expired
+    and duration in seconds
     """
-    result_tuple: List[Tuple[ResultStorage, str]] = db_node_job_manager.set_not_exist_status_for_expired_results()
+    start = time.monotonic()
+    now = datetime.datetime.now()
+    expired_results = db_node_job_manager.expire_results()
+
     storages = ini_config['storages']
-    for storage, path_in_storage in result_tuple:
+    full_paths_to_results = []
+    for storage, path_in_storage, expiration_timestamp in expired_results:
         try:
-            path_to_storage = Path(storages[storage])
-            full_path_to_result = path_to_storage / path_in_storage
-            shutil.rmtree(full_path_to_result, ignore_errors=True)
-            log.info(f'Removed expire result {full_path_to_result}')
+            full_paths_to_results.append(Path(storages[storage]) / path_in_storage)
         except KeyError:
             log.error(f'Can\'t find path to storage {storage} in otl interpreter configuration')
 
+    workers = int(ini_config['service_task_options']['remove_expired_dataframes_workers'])
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        freed_bytes = sum(executor.map(_remove_result_directory, full_paths_to_results))
+
+    stats = {
+        'removed_results': len(full_paths_to_results),
+        'freed_bytes': freed_bytes,
+        'max_lag': max(
+            ((now - expiration_timestamp).total_seconds() for _, _, expiration_timestamp in expired_results),
+            default=0
+        ),
+        'duration': time.monotonic() - start,
+    }
+    if stats['duration'] > int(ini_config['service_task_options']['remove_expired_dataframes_period']):
+        log.warning(f'Removing expired results takes longer than its period: {stats}')
+    elif stats['removed_results']:
+        log.info(f'Removed expired results: {stats}')
+    return stats
+
 
 @app.task()
 def remove_old_otl_query_info_from_db():
@@ -90,6 +131,16 @@ def remove_forever_calculating_results():
     db_node_job_manager.remove_failed_forever_calculating_results()
 
 
+@app.task()
+def reconcile_result_registry():
+    """
+    Removes results that differ from database from redis result registry
+    """
+    checked_results, removed_results = db_node_job_manager.reconcile_result_registry()
+    if removed_results:
+        log.warning(f'Result registry reconciled: {removed_results} of {checked_results} results differed from database')
+
+
 @app.task()
 def cancel_otl_job_by_timeout():
     """
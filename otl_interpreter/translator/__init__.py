@@ -1,12 +1,17 @@
+
 from datetime import datetime
 from otlang.otl import OTL
 from otl_interpreter.interpreter_db import node_commands_manager
+from otl_interpreter.settings import ini_config, get_cache
+
+from .translation_cache import TranslationCache
 
 
 class Translator:
-    def __init__(self):
+    def __init__(self, translation_cache=None):
         self._commands_updated_timestamp = datetime(1, 1, 1, 0, 0)
         self.o = None
+        self.translation_cache = translation_cache or TranslationCache(size=0)
 
     def _init_translator_with_commands(self):
         commands = node_commands_manager.get_commands_syntax()
@@ -19,12 +24,30 @@ class Translator:
         pass
 
     def __call__(self, otl_query):
-        if self.o is None or node_commands_manager.commands_were_updated(self._commands_updated_timestamp):
+        commands_updated_timestamp = node_commands_manager.commands_updated_timestamp
+        # commands updated timestamp is the same in all processes, so it is used as version in shared cache
+        commands_version = commands_updated_timestamp.isoformat()
+
+        translated_query = self.translation_cache.get(otl_query, commands_version)
+        if translated_query is not None:
+            return translated_query
+
+        if self.o is None or commands_updated_timestamp > self._commands_updated_timestamp:
             self._init_translator_with_commands()
             self._commands_updated_timestamp = datetime.now()
         # TODO check macroses the same way
-        return self.o.translate(otl_query)
+        translated_query = self.o.translate(otl_query)
+
+        self.translation_cache.set(otl_query, commands_version, translated_query)
+        return translated_query
 
 
-translate_otl = Translator()
+translator_config = ini_config['translator']
 
+translate_otl = Translator(
+    TranslationCache(
+        int(translator_config['cache_size']),
+        get_cache() if translator_config['shared_cache'].lower() == 'true' else None,
+        int(translator_config['shared_cache_ttl']),
+    )
+)
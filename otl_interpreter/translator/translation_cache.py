@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import threading
+
+from collections import OrderedDict
+from copy import deepcopy
+
+from otl_interpreter.utils.synchronized import synchronized
+
+log = logging.getLogger('otl_interpreter.translator')
+
+
+class TranslationCache:
+    """
+    LRU cache of translated otl queries.
+    Key is hash of exact query text and version of registered commands,
+    so translations made with old command syntax are never returned.
+    Query text is not normalized, whitespace inside quoted arguments changes translation
+    """
+    def __init__(self, size=1000, shared_cache=None, shared_cache_ttl=300):
+        """
+        :param size: max number of translations kept in process memory, 0 disables cache
+        :param shared_cache: cache object with get and set methods shared between processes, optional
+        :param shared_cache_ttl: seconds to keep translation in shared cache
+        """
+        self.size = size
+        self.shared_cache = shared_cache
+        self.shared_cache_ttl = shared_cache_ttl
+        self._translations = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(otl_query, version):
+        return f'otl_translation:{version}:{hashlib.blake2b(otl_query.encode()).hexdigest()}'
+
+    def get(self, otl_query, version):
+        """
+        Returns copy of translated query or None if query is not in cache
+        """
+        if self.size <= 0:
+            return None
+
+        key = self._key(otl_query, version)
+        translation = self._get_local(key)
+
+        if translation is None and self.shared_cache is not None:
+            try:
+                translation = self.shared_cache.get(key)
+            except Exception as err:
+                log.error(f'Failed to get translation from shared cache: {err}')
+            if translation is not None:
+                self._set_local(key, translation)
+
+        if translation is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # planner changes translated commands, so cached translation is never given away
+        return deepcopy(translation)
+
+    def set(self, otl_query, version, translated_query):
+        """
+        Puts copy of translated query to cache
+        """
+        if self.size <= 0:
+            return
+
+        key = self._key(otl_query, version)
+        translation = deepcopy(translated_query)
+        self._set_local(key, translation)
+
+        if self.shared_cache is not None:
+            try:
+                self.shared_cache.set(key, translation, timeout=self.shared_cache_ttl)
+            except Exception as err:
+                log.error(f'Failed to put translation to shared cache: {err}')
+
+    @synchronized
+    def _get_local(self, key):
+        translation = self._translations.get(key)
+        if translation is not None:
+            self._translations.move_to_end(key)
+        return translation
+
+    @synchronized
+    def _set_local(self, key, translation):
+        self._translations[key] = translation
+        self._translations.move_to_end(key)
+        while len(self._translations) > self.size:
+            self._translations.popitem(last=False)
+
+    @synchronized
+    def clear(self):
+        self._translations.clear()
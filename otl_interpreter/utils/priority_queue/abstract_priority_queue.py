@@ -14,6 +14,15 @@ class AbstractPriorityQueue(object):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def remove(self, *elements: Union[str, bytes]) -> None:
+        """
+        Removes elements from queue
+        :param elements: elements to remove from queue
+        :return:
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def pop(self, count: int = 1, min_score=False) -> List[Tuple[bytes, float]]:
         """
@@ -22,6 +31,47 @@ class AbstractPriorityQueue(object):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def reserve(self, count: int = 1, min_score=False, lease_time: float = 60) -> List[Tuple[bytes, float]]:
+        """
+        Pops <count> elements like pop and keeps them in flight until they are acknowledged
+        Elements not acknowledged during lease time are returned to queue by requeue_expired
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def ack(self, *elements: Union[str, bytes]) -> None:
+        """
+        Acknowledges reserved elements, so they will never return to queue
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def requeue(self, *elements: Union[str, bytes]) -> None:
+        """
+        Returns reserved elements to queue with their scores
+        """
+        raise NotImplementedError
 
+    @abstractmethod
+    def requeue_expired(self, now: float = None) -> int:
+        """
+        Returns to queue reserved elements with expired lease
+        :param now: timestamp, current time if None
+        :return: number of returned elements
+        """
+        raise NotImplementedError
 
+    @abstractmethod
+    def elements(self) -> List[bytes]:
+        """
+        Returns all elements in queue and reserved elements, queue is not changed
+        """
+        raise NotImplementedError
 
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes all elements from queue including reserved elements
+        """
+        raise NotImplementedError
@@ -1,18 +1,55 @@
-from collections import defaultdict
+import heapq
+import itertools
+import threading
+import time
 
 from typing import List, Tuple, Union
 
+from otl_interpreter.utils.synchronized import synchronized
+
 from .abstract_priority_queue import AbstractPriorityQueue
 
 
+class _Reversed:
+    """
+    Wrapper with reversed comparison, used for elements in max heap
+    """
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
 class PriorityQueue(AbstractPriorityQueue):
+    """
+    In-process priority queue on two binary heaps, one for popping elements with lowest score
+    and one for popping elements with highest score.
+    Heap entries are never removed on element removal or score update,
+    outdated entries are skipped on pop and dropped when heaps are rebuilt.
+    Queue can be used from several threads
+    """
     def __init__(self) -> None:
-        # set of elements for every score
-        self._score_dict = defaultdict(set)
-
-        # score for every element
+        # score and version of heap entries for every element
         self._elements = dict()
 
+        # heap entries are tuples (score, element, version)
+        self._min_heap = []
+        # heap entries are tuples (-score, _Reversed(element), version)
+        self._max_heap = []
+
+        self._versions = itertools.count()
+
+        # reserved elements, element -> (score, lease deadline timestamp)
+        self._in_flight = dict()
+
+        self._lock = threading.RLock()
+
     def __len__(self):
         return len(self._elements)
 
@@ -24,6 +61,7 @@ class PriorityQueue(AbstractPriorityQueue):
             return value
         raise ValueError("Prioriry queue except only 'bytes' and 'str'")
 
+    @synchronized
     def add(self, score: float, *elements: Union[str, bytes]) -> None:
         """
         Push in queue elements with score
@@ -32,67 +70,132 @@ class PriorityQueue(AbstractPriorityQueue):
         :return:
         """
         score = float(score)
-        elements = [self._to_bytes(element) for element in elements]
-        self._score_dict[score].update(elements)
+        for element in elements:
+            element = self._to_bytes(element)
+            version = next(self._versions)
+            self._elements[element] = (score, version)
+            heapq.heappush(self._min_heap, (score, element, version))
+            heapq.heappush(self._max_heap, (-score, _Reversed(element), version))
+
+        self._rebuild_heaps_if_needed()
+
+    @synchronized
+    def remove(self, *elements: Union[str, bytes]) -> None:
+        """
+        Removes elements from queue
+        :param elements: elements to remove from queue
+        :return:
+        """
+        for element in elements:
+            self._elements.pop(self._to_bytes(element), None)
 
-        self._elements.update(
-            {element: score for element in elements}
-        )
+        self._rebuild_heaps_if_needed()
 
+    @synchronized
     def pop(self, count: int = 1, min_score=False) -> List[Tuple[bytes, float]]:
         """
         Returns <count> elements from queue with highest score as list of tuples ( binary, score )
         if min_score is True returns <count> elements from queue with lowest score
         """
-        if count < 1 or len(self._elements) < 1:
-            return []
-
-        sorted_score_list = sorted(self._score_dict.keys(), reverse=not min_score)
-
-        # find score keys  set that contain >= count  elements
-        # find index in score list
-        index_in_score_list = 0
-        elements_counter = 0
-        for score in sorted_score_list:
-            elements_counter += len(self._score_dict[score])
-            index_in_score_list += 1
-            if elements_counter >= count:
-                break
+        if min_score:
+            heap = self._min_heap
+            get_element = lambda heap_entry: heap_entry[1]
+        else:
+            heap = self._max_heap
+            get_element = lambda heap_entry: heap_entry[1].value
 
         result_elements = list()
-
-        # add in result elements all elements with score  that have index in sorted_score_list < index_in_score_list
-        for index in range(index_in_score_list-1):
-            score = sorted_score_list[index]
-            for element in sorted(self._score_dict[score], reverse=not min_score):
-                result_elements.append(
-                    (element, score, )
-                )
-            del self._score_dict[score]
-
-        # get shortage of elements from last score
-        score = sorted_score_list[index_in_score_list-1]
-        for element in sorted(self._score_dict[score], reverse=not min_score):
-            if len(result_elements) == count:
-                break
+        while heap and len(result_elements) < count:
+            heap_entry = heapq.heappop(heap)
+            element = get_element(heap_entry)
+            score, version = self._elements.get(element, (None, None))
+            # skip entries of removed elements and outdated entries of elements with updated score
+            if version != heap_entry[2]:
+                continue
+            del self._elements[element]
             result_elements.append(
                 (element, score, )
             )
-            self._score_dict[score].discard(element)
-
-            if len(self._score_dict[score]) == 0:
-                del self._score_dict[score]
-
-        # remove returned elements
-        for element, score in result_elements:
-            self._elements.pop(element)
 
+        self._rebuild_heaps_if_needed()
         return result_elements
 
+    @synchronized
+    def reserve(self, count: int = 1, min_score=False, lease_time: float = 60) -> List[Tuple[bytes, float]]:
+        """
+        Pops <count> elements like pop and keeps them in flight until they are acknowledged
+        Elements not acknowledged during lease time are returned to queue by requeue_expired
+        """
+        elements = self.pop(count, min_score)
+        deadline = time.time() + lease_time
+        for element, score in elements:
+            self._in_flight[element] = (score, deadline)
+        return elements
+
+    @synchronized
+    def ack(self, *elements: Union[str, bytes]) -> None:
+        """
+        Acknowledges reserved elements, so they will never return to queue
+        """
+        for element in elements:
+            self._in_flight.pop(self._to_bytes(element), None)
 
+    @synchronized
+    def requeue(self, *elements: Union[str, bytes]) -> None:
+        """
+        Returns reserved elements to queue with their scores
+        """
+        for element in elements:
+            element = self._to_bytes(element)
+            if element not in self._in_flight:
+                continue
+            score, _ = self._in_flight.pop(element)
+            # element added to queue again after reservation keeps its new score
+            if element not in self._elements:
+                self.add(score, element)
+
+    @synchronized
+    def requeue_expired(self, now: float = None) -> int:
+        """
+        Returns to queue reserved elements with expired lease
+        :param now: timestamp, current time if None
+        :return: number of returned elements
+        """
+        if now is None:
+            now = time.time()
+        expired_elements = [
+            element for element, (score, deadline) in self._in_flight.items() if deadline <= now
+        ]
+        self.requeue(*expired_elements)
+        return len(expired_elements)
+
+    @synchronized
+    def elements(self) -> List[bytes]:
+        """
+        Returns all elements in queue and reserved elements, queue is not changed
+        """
+        return list(self._elements.keys()) + list(self._in_flight.keys())
 
+    @synchronized
+    def clear(self) -> None:
+        """
+        Removes all elements from queue including reserved elements
+        """
+        self._elements.clear()
+        self._in_flight.clear()
+        self._min_heap = []
+        self._max_heap = []
 
-
-
-
-
+    def _rebuild_heaps_if_needed(self):
+        """
+        Rebuilds heaps when outdated entries are more than a half of heap
+        """
+        if len(self._min_heap) > 2 * len(self._elements) + 64 or len(self._max_heap) > 2 * len(self._elements) + 64:
+            self._min_heap = [
+                (score, element, version) for element, (score, version) in self._elements.items()
+            ]
+            self._max_heap = [
+                (-score, _Reversed(element), version) for element, (score, version) in self._elements.items()
+            ]
+            heapq.heapify(self._min_heap)
+            heapq.heapify(self._max_heap)
@@ -1,3 +1,4 @@
+import time
 import redis
 
 from typing import List, Tuple, Union
@@ -5,18 +6,82 @@ from typing import List, Tuple, Union
 from .abstract_priority_queue import AbstractPriorityQueue
 
 
+# KEYS: queue, in flight sorted set, scores hash
+# ARGV: count, lease deadline, 1 if elements with lowest score must be reserved
+RESERVE_SCRIPT = """
+local elements
+if ARGV[3] == '1' then
+    elements = redis.call('ZRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1, 'WITHSCORES')
+else
+    elements = redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1, 'WITHSCORES')
+end
+for i = 1, #elements, 2 do
+    redis.call('ZREM', KEYS[1], elements[i])
+    redis.call('ZADD', KEYS[2], ARGV[2], elements[i])
+    redis.call('HSET', KEYS[3], elements[i], elements[i + 1])
+end
+return elements
+"""
+
+# KEYS: queue, in flight sorted set, scores hash
+# ARGV: elements to requeue
+REQUEUE_SCRIPT = """
+local requeued = 0
+for _, element in ipairs(ARGV) do
+    local score = redis.call('HGET', KEYS[3], element)
+    if score then
+        redis.call('ZADD', KEYS[1], 'NX', score, element)
+        requeued = requeued + 1
+    end
+    redis.call('ZREM', KEYS[2], element)
+    redis.call('HDEL', KEYS[3], element)
+end
+return requeued
+"""
+
+# KEYS: queue, in flight sorted set, scores hash
+# ARGV: current timestamp
+REQUEUE_EXPIRED_SCRIPT = """
+local elements = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, element in ipairs(elements) do
+    local score = redis.call('HGET', KEYS[3], element)
+    if score then
+        redis.call('ZADD', KEYS[1], 'NX', score, element)
+    end
+    redis.call('ZREM', KEYS[2], element)
+    redis.call('HDEL', KEYS[3], element)
+end
+return #elements
+"""
+
+
 class RedisPriorityQueue(AbstractPriorityQueue):
-    def __init__(self, queue_name: str, redis_config: dict) -> None:
+    """
+    Priority queue on redis sorted set.
+    Reserved elements are kept in sorted set <queue_name>:in_flight with lease deadline as score,
+    their scores in queue are kept in hash <queue_name>:scores.
+    Queue is shared by dispatcher instances and outlives them, it is never deleted by queue object
+    """
+    def __init__(self, queue_name: str, redis_config: dict, redis_client: redis.Redis = None) -> None:
+        """
+        :param queue_name: name of redis sorted set
+        :param redis_config: dictionary with host, port, db, password keys
+        :param redis_client: redis client to use instead of creating new one with redis_config
+        """
         self.queue_name = queue_name
-        self._r = redis.Redis(
-            host=redis_config['host'],
-            port=redis_config['port'],
-            db=redis_config['db'],
-            password=redis_config['password']
-        )
-
-    def __del__(self):
-        self._r.delete(self.queue_name)
+        self.in_flight_name = f'{queue_name}:in_flight'
+        self.scores_name = f'{queue_name}:scores'
+        if redis_client is None:
+            redis_client = redis.Redis(
+                host=redis_config['host'],
+                port=redis_config['port'],
+                db=redis_config['db'],
+                password=redis_config['password']
+            )
+        self._r = redis_client
+        self._reserve_script = self._r.register_script(RESERVE_SCRIPT)
+        self._requeue_script = self._r.register_script(REQUEUE_SCRIPT)
+        self._requeue_expired_script = self._r.register_script(REQUEUE_EXPIRED_SCRIPT)
 
     def __len__(self):
         return self._r.zcard(self.queue_name)
@@ -33,6 +98,15 @@ class RedisPriorityQueue(AbstractPriorityQueue):
 
         self._r.zadd(self.queue_name, mapping)
 
+    def remove(self, *elements: Union[str, bytes]) -> None:
+        """
+        Removes elements from queue
+        :param elements: elements to remove from queue
+        :return:
+        """
+        if elements:
+            self._r.zrem(self.queue_name, *elements)
+
     def pop(self, count: int = 1, min_score=False) -> List[Tuple[bytes, float]]:
         """
         Returns <count> elements from queue with highest score as list of tuples ( binary, score )
@@ -43,6 +117,69 @@ class RedisPriorityQueue(AbstractPriorityQueue):
         else:
             return self._r.zpopmax(self.queue_name, count)
 
+    def reserve(self, count: int = 1, min_score=False, lease_time: float = 60) -> List[Tuple[bytes, float]]:
+        """
+        Pops <count> elements like pop and keeps them in flight until they are acknowledged
+        Elements not acknowledged during lease time are returned to queue by requeue_expired
+        All elements are reserved with one atomic script call
+        """
+        if count < 1:
+            return []
+        elements = self._reserve_script(
+            keys=[self.queue_name, self.in_flight_name, self.scores_name],
+            args=[count, time.time() + lease_time, 1 if min_score else 0]
+        )
+        return [
+            (elements[i], float(elements[i + 1]), ) for i in range(0, len(elements), 2)
+        ]
 
+    def ack(self, *elements: Union[str, bytes]) -> None:
+        """
+        Acknowledges reserved elements, so they will never return to queue
+        """
+        if not elements:
+            return
+        pipe = self._r.pipeline()
+        pipe.zrem(self.in_flight_name, *elements)
+        pipe.hdel(self.scores_name, *elements)
+        pipe.execute()
+
+    def requeue(self, *elements: Union[str, bytes]) -> None:
+        """
+        Returns reserved elements to queue with their scores
+        """
+        if not elements:
+            return
+        self._requeue_script(
+            keys=[self.queue_name, self.in_flight_name, self.scores_name],
+            args=list(elements)
+        )
+
+    def requeue_expired(self, now: float = None) -> int:
+        """
+        Returns to queue reserved elements with expired lease
+        :param now: timestamp, current time if None
+        :return: number of returned elements
+        """
+        if now is None:
+            now = time.time()
+        return self._requeue_expired_script(
+            keys=[self.queue_name, self.in_flight_name, self.scores_name],
+            args=[now]
+        )
 
+    def elements(self) -> List[bytes]:
+        """
+        Returns all elements in queue and reserved elements, queue is not changed
+        """
+        pipe = self._r.pipeline(transaction=True)
+        pipe.zrange(self.queue_name, 0, -1)
+        pipe.zrange(self.in_flight_name, 0, -1)
+        queued_elements, reserved_elements = pipe.execute()
+        return queued_elements + reserved_elements
 
+    def clear(self) -> None:
+        """
+        Removes all elements from queue including reserved elements
+        """
+        self._r.delete(self.queue_name, self.in_flight_name, self.scores_name)
@@ -0,0 +1,16 @@
+import hashlib
+import re
+
+
+def normalize_query(query: str) -> str:
+    """
+    Replaces repeated whitespace characters with one space
+    """
+    return re.sub(r'\s+', ' ', query)
+
+
+def get_query_hash(query: str) -> bytes:
+    """
+    Returns blake2b digest of normalized query
+    """
+    return hashlib.blake2b(normalize_query(query).encode()).digest()
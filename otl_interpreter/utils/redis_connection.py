@@ -0,0 +1,128 @@
+import time
+import logging
+import threading
+
+import redis
+
+from core.settings import REDIS_CONNECTION_STRING
+from otl_interpreter.settings import ini_config
+
+log = logging.getLogger('otl_interpreter.redis_connection')
+
+redis_config = ini_config['redis']
+
+
+class MeteredConnectionPool(redis.BlockingConnectionPool):
+    """
+    Blocking connection pool that counts connections in use and time spent waiting for free connection
+    """
+    def __init__(self, *args, **kwargs):
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+        super().__init__(*args, **kwargs)
+
+    def _reset_stats(self):
+        self.in_use_connections = 0
+        self.peak_in_use_connections = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def reset(self):
+        super().reset()
+        with self._stats_lock:
+            self._reset_stats()
+
+    def get_connection(self, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except redis.ConnectionError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        with self._stats_lock:
+            self.wait_time += time.monotonic() - start
+            self.in_use_connections += 1
+            self.peak_in_use_connections = max(self.peak_in_use_connections, self.in_use_connections)
+        return connection
+
+    def release(self, connection):
+        super().release(connection)
+        with self._stats_lock:
+            self.in_use_connections = max(self.in_use_connections - 1, 0)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                'max_connections': self.max_connections,
+                'in_use_connections': self.in_use_connections,
+                'peak_in_use_connections': self.peak_in_use_connections,
+                'saturation': self.in_use_connections / self.max_connections,
+                'wait_time': self.wait_time,
+                'timeouts': self.timeouts,
+            }
+
+
+# connection pools shared by all redis clients of process, key is connection string or config tuple
+_connection_pools = {}
+_connection_pools_lock = threading.Lock()
+
+
+def _get_connection_pool(pool_key, create_pool):
+    with _connection_pools_lock:
+        if pool_key not in _connection_pools:
+            _connection_pools[pool_key] = create_pool()
+        return _connection_pools[pool_key]
+
+
+def get_redis(connection_config: dict = None) -> redis.Redis:
+    """
+    Returns redis client using connection pool shared inside process
+    :param connection_config: dictionary with host, port, db, password keys.
+    If None REDIS_CONNECTION_STRING is used
+    """
+    pool_kwargs = {
+        'max_connections': int(redis_config['max_connections']),
+        'timeout': int(redis_config['pool_timeout']),
+    }
+    if connection_config is None:
+        pool = _get_connection_pool(
+            REDIS_CONNECTION_STRING,
+            lambda: MeteredConnectionPool.from_url(REDIS_CONNECTION_STRING, **pool_kwargs)
+        )
+    else:
+        pool = _get_connection_pool(
+            (
+                connection_config['host'], connection_config['port'],
+                connection_config['db'], connection_config['password'],
+            ),
+            lambda: MeteredConnectionPool(
+                host=connection_config['host'],
+                port=connection_config['port'],
+                db=connection_config['db'],
+                password=connection_config['password'],
+                **pool_kwargs
+            )
+        )
+    return redis.Redis(connection_pool=pool)
+
+
+def connection_pools_stats() -> list:
+    """
+    Returns list of dictionaries with statistics of every connection pool
+    """
+    with _connection_pools_lock:
+        pools = list(_connection_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def log_connection_pools_stats():
+    """
+    Logs connection pools statistics, warns if pool is almost exhausted
+    """
+    saturation_threshold = float(redis_config['pool_saturation_warning'])
+    for pool_stats in connection_pools_stats():
+        if pool_stats['saturation'] >= saturation_threshold or pool_stats['timeouts']:
+            log.warning(f'Redis connection pool is saturated: {pool_stats}')
+        else:
+            log.debug(f'Redis connection pool: {pool_stats}')
@@ -0,0 +1,14 @@
+from functools import wraps
+
+
+def synchronized(method):
+    """
+    Decorator for methods that change state shared between threads.
+    Method is executed holding _lock attribute of instance, lock must be reentrant
+    if synchronized methods call each other
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
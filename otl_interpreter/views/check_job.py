@@ -30,7 +30,8 @@ class CheckJobView(APIView):
         return SuccessResponse(
             {
                 'job_status': job_status,
-                'job_status_text': job_status_text
+                'job_status_text': job_status_text,
+                'job_progress': otl_job_manager.get_job_progress(job_id),
             },
         )
 
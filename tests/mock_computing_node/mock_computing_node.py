@@ -24,7 +24,8 @@ default_config = {
   "lifetime": 180,             # node will be stopped after 60 seconds
   "fail_job": False,           # every job will failed
   "decline_rate": 0,           # evey n-th job will be declined
-  "resources_occupied": False  # every resource status with max resources
+  "resources_occupied": False,  # every resource status with max resources
+  "protocol_version": 2        # 1 - every job message is sent separately, 2 - job messages are sent in batches
 }
 
 
@@ -67,7 +68,8 @@ class ComputingNode:
             'computing_node_type': self.config['computing_node_type'],
             'host_id': self.config['host_id'],
             'otl_command_syntax': self.command_syntax,
-            'resources': self.config['resources']
+            'resources': self.config['resources'],
+            'protocol_version': self.config['protocol_version'],
         }
 
         control_command = {
@@ -90,12 +92,17 @@ class ComputingNode:
         async with Consumer(self.job_topic, value_deserializer=json.loads) as job_consumer:
             async for job_message in job_consumer:
                 #pp(job_message.value)
-                job = job_message.value
-                # mock computing doesn't calculate anything so just quit
-                if job['status'] == 'CANCELED':
-                    self.job_tasks[job['uuid']].cancel()
+                if 'messages' in job_message.value:
+                    jobs = job_message.value['messages']
                 else:
-                    self.job_tasks[job['uuid']] = asyncio.create_task(self._run_job(job_message.value))
+                    jobs = [job_message.value]
+
+                for job in jobs:
+                    # mock computing doesn't calculate anything so just quit
+                    if job['status'] == 'CANCELED':
+                        self.job_tasks[job['uuid']].cancel()
+                    else:
+                        self.job_tasks[job['uuid']] = asyncio.create_task(self._run_job(job))
 
     async def _run_job(self, job):
         decline_rate = self.config['decline_rate']
@@ -107,7 +114,7 @@ class ComputingNode:
             self.job_counter += 1
             if (decline_rate and self.job_counter % decline_rate == 0) or self.job_counter > self.config['max_jobs']:
                 await self._send_node_job_status(
-                    job['uuid'],
+                    job,
                     'DECLINED_BY_COMPUTING_NODE',
                     f"Node job was declined",
                 )
@@ -116,7 +123,7 @@ class ComputingNode:
 
         if not self.config['fail_job'] and not job_was_declined:
             await self._send_node_job_status(
-                job['uuid'],
+                job,
                 'RUNNING',
                 f"Start executing",
             )
@@ -126,7 +133,7 @@ class ComputingNode:
                 # send status command
 
                 await self._send_node_job_status(
-                    job['uuid'],
+                    job,
                     'RUNNING',
                     f"command {command['name']} finished",
                     command['name']
@@ -134,7 +141,7 @@ class ComputingNode:
             self.job_counter -= 1
             # send status job done
             await self._send_node_job_status(
-                job['uuid'],
+                job,
                 'FINISHED',
                 f"Node job {job['uuid']} successfully finished",
                 job['commands'][-1]['name']
@@ -142,17 +149,19 @@ class ComputingNode:
         # send failed
         if self.config['fail_job']:
             await self._send_node_job_status(
-                job['uuid'],
+                job,
                 'FAILED',
                 f"Node job {job['uuid']} failed",
             )
         await self._send_resources()
 
     async def _send_node_job_status(
-            self, node_job_uuid, status, status_text=None, last_finished_command=None
+            self, job, status, status_text=None, last_finished_command=None
     ):
         message = {
-            'uuid': node_job_uuid,
+            'uuid': job['uuid'],
+            # otl job uuid is sent back, so dispatcher processes statuses of otl job in order
+            'otl_job_uuid': job.get('otl_job_uuid'),
             'status': status,
             'status_text': status_text,
             'last_finished_command': last_finished_command,
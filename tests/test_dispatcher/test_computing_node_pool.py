@@ -1,4 +1,7 @@
+import random
+
 from unittest import TestCase
+from uuid import uuid4
 
 from otl_interpreter.dispatcher.computing_node_pool import ComputingNodePool, ComputingNode
 from otl_interpreter.interpreter_db.enums import ComputingNodeType
@@ -447,3 +450,168 @@ class TestComputingNodePool(TestCase):
 
         least_loaded_node_uuid = computing_node_pool.get_least_loaded_node('SPARK')
         self.assertIn(least_loaded_node_uuid, ['test1', 'test2'])
+
+    def test_full_node_is_not_chosen(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', ComputingNodeType.SPARK.value, {'job_capacity': 4}, False)
+        computing_node_pool.add_computing_node('test2', ComputingNodeType.SPARK.value, {'job_capacity': 4}, False)
+        computing_node_pool.update_node_resources('test1', {'job_capacity': 4})
+        computing_node_pool.update_node_resources('test2', {'job_capacity': 3})
+        self.assertEqual(computing_node_pool.get_least_loaded_node('SPARK'), 'test2')
+
+        computing_node_pool.update_node_resources('test2', {'job_capacity': 4})
+        self.assertIsNone(computing_node_pool.get_least_loaded_node('SPARK'))
+
+        # node released resources
+        computing_node_pool.update_node_resources('test1', {'job_capacity': 1})
+        self.assertEqual(computing_node_pool.get_least_loaded_node('SPARK'), 'test1')
+
+    def test_deleted_node_is_not_chosen(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', ComputingNodeType.SPARK.value, {'job_capacity': 4}, True)
+        computing_node_pool.add_computing_node('test2', ComputingNodeType.SPARK.value, {'job_capacity': 4}, True)
+        computing_node_pool.update_node_resources('test2', {'job_capacity': 1})
+        computing_node_pool.del_computing_node('test1')
+        self.assertEqual(computing_node_pool.get_least_loaded_node('SPARK'), 'test2')
+        self.assertEqual(computing_node_pool.get_least_loaded_node('SPARK', True), 'test2')
+        computing_node_pool.del_computing_node('test2')
+        self.assertIsNone(computing_node_pool.get_least_loaded_node('SPARK'))
+
+    def test_least_loaded_node_after_many_updates(self):
+        computing_node_pool = ComputingNodePool()
+        nodes_number = 100
+        for i in range(nodes_number):
+            computing_node_pool.add_computing_node(
+                f'test{i}', ComputingNodeType.SPARK.value, {'first_resource': 1000, 'second_resource': 1000}, False
+            )
+        resources = {}
+        for _ in range(10):
+            for i in range(nodes_number):
+                resources[f'test{i}'] = {
+                    'first_resource': random.randint(0, 999), 'second_resource': random.randint(0, 999)
+                }
+                computing_node_pool.update_node_resources(f'test{i}', resources[f'test{i}'])
+
+        min_load = min(
+            (node_resources['first_resource'], node_resources['second_resource'])
+            for node_resources in resources.values()
+        )
+        least_loaded_node_uuid = computing_node_pool.get_least_loaded_node('SPARK')
+        self.assertEqual(
+            (
+                resources[least_loaded_node_uuid]['first_resource'],
+                resources[least_loaded_node_uuid]['second_resource']
+            ),
+            min_load
+        )
+
+    def test_free_slots(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', 'SPARK', {'job_capacity': 4, 'cores': 8}, False)
+        computing_node_pool.add_computing_node('test2', 'SPARK', {'job_capacity': 2, 'cores': 8}, True)
+        computing_node_pool.add_computing_node('test3', 'SPARK', {'job_capacity': 4}, False)
+        computing_node_pool.update_node_resources('test1', {'job_capacity': 1, 'cores': 6})
+        computing_node_pool.update_node_resources('test3', {'job_capacity': 4})
+        self.assertEqual(computing_node_pool.free_slots('SPARK'), 4)
+
+        computing_node_pool.reserve_node('SPARK')
+        self.assertEqual(computing_node_pool.free_slots('SPARK'), 3)
+
+    def test_reservations_spread_node_jobs(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', 'SPARK', {'job_capacity': 4}, False)
+        computing_node_pool.add_computing_node('test2', 'SPARK', {'job_capacity': 4}, False)
+
+        node_uuids = [computing_node_pool.reserve_node('SPARK') for _ in range(9)]
+        self.assertListEqual(sorted(node_uuids[:8]), ['test1'] * 4 + ['test2'] * 4)
+        self.assertIsNone(node_uuids[8])
+
+        # resource status resets reservations
+        computing_node_pool.update_node_resources('test1', {'job_capacity': 3})
+        self.assertEqual(computing_node_pool.reserve_node('SPARK'), 'test1')
+
+    def test_reserve_node_with_demand(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', 'SPARK', {'job_capacity': 4, 'cores': 2}, False)
+        computing_node_pool.add_computing_node('test2', 'SPARK', {'job_capacity': 4, 'cores': 8}, False)
+        computing_node_pool.update_node_resources('test2', {'job_capacity': 3, 'cores': 2})
+
+        # least loaded node has not enough cores
+        self.assertEqual(computing_node_pool.reserve_node('SPARK', {'cores': 4}), 'test2')
+        self.assertIsNone(computing_node_pool.reserve_node('SPARK', {'cores': 4}))
+        self.assertFalse(computing_node_pool.has_fitting_node('SPARK', {'cores': 4}))
+        self.assertEqual(computing_node_pool.reserve_node('SPARK', {'cores': 2}), 'test1')
+
+    def test_reserve_local_node(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', 'SPARK', {'job_capacity': 2}, False)
+        computing_node_pool.add_computing_node('test2', 'SPARK', {'job_capacity': 1}, True)
+
+        self.assertEqual(computing_node_pool.reserve_node('SPARK', only_local_nodes=True), 'test2')
+        self.assertIsNone(computing_node_pool.reserve_node('SPARK', only_local_nodes=True))
+        self.assertEqual(computing_node_pool.reserve_node('SPARK'), 'test1')
+
+    def test_best_fit_placement(self):
+        computing_node_pool = ComputingNodePool(node_placement='best_fit')
+        computing_node_pool.add_computing_node('test1', 'SPARK', {'cores': 8}, False)
+        computing_node_pool.add_computing_node('test2', 'SPARK', {'cores': 8}, False)
+        computing_node_pool.update_node_resources('test2', {'cores': 5})
+
+        # node with least cores left after placement
+        self.assertEqual(computing_node_pool.reserve_node('SPARK', {'cores': 2}), 'test2')
+        self.assertEqual(computing_node_pool.reserve_node('SPARK', {'cores': 2}), 'test1')
+        self.assertEqual(computing_node_pool.reserve_node('SPARK', {'cores': 1}), 'test2')
+
+    def test_release_node_job(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', 'SPARK', {'job_capacity': 2}, False)
+        computing_node_pool.add_computing_node('test2', 'SPARK', {'job_capacity': 2}, False)
+        node_job_uuids = [uuid4() for i in range(5)]
+
+        node_uuids = [
+            computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuids[i]) for i in range(4)
+        ]
+        self.assertListEqual(sorted(node_uuids), ['test1', 'test1', 'test2', 'test2'])
+        self.assertIsNone(computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuids[4]))
+
+        # declined node job frees resources on its node only
+        computing_node_pool.release_node_job(node_job_uuids[0])
+        self.assertEqual(computing_node_pool.free_slots('SPARK'), 1)
+        self.assertEqual(computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuids[4]), node_uuids[0])
+
+        # releasing twice doesn't free resources of other node jobs
+        computing_node_pool.release_node_job(node_job_uuids[0])
+        self.assertEqual(computing_node_pool.free_slots('SPARK'), 0)
+
+    def test_release_node_job_uuid_forms(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', 'SPARK', {'job_capacity': 3}, False)
+        node_job_uuids = [uuid4() for i in range(3)]
+
+        # node job dict from database has hex uuid, from queue has UUID object, status message has dashed string
+        computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuids[0].hex)
+        computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuids[1])
+        computing_node_pool.reserve_node('SPARK', node_job_uuid=str(node_job_uuids[2]))
+        self.assertEqual(computing_node_pool.free_slots('SPARK'), 0)
+
+        self.assertTrue(computing_node_pool.release_node_job(node_job_uuids[0]))
+        self.assertTrue(computing_node_pool.release_node_job(str(node_job_uuids[1])))
+        self.assertTrue(computing_node_pool.release_node_job(node_job_uuids[2].hex))
+        self.assertEqual(computing_node_pool.free_slots('SPARK'), 3)
+
+    def test_resource_status_drops_node_job_reservations(self):
+        computing_node_pool = ComputingNodePool()
+        computing_node_pool.add_computing_node('test1', 'SPARK', {'job_capacity': 2}, False)
+        node_job_uuids = [uuid4() for i in range(3)]
+
+        computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuids[0])
+        computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuids[1])
+        computing_node_pool.update_node_resources('test1', {'job_capacity': 2})
+        self.assertEqual(computing_node_pool.free_slots('SPARK'), 0)
+
+        # reservation was already counted in reported usage
+        computing_node_pool.release_node_job(node_job_uuids[0])
+        self.assertEqual(computing_node_pool.free_slots('SPARK'), 0)
+
+        computing_node_pool.update_node_resources('test1', {'job_capacity': 1})
+        self.assertEqual(computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuids[2]), 'test1')
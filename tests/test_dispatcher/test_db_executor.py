@@ -0,0 +1,31 @@
+import time
+import asyncio
+import threading
+
+from unittest import IsolatedAsyncioTestCase
+
+from otl_interpreter.dispatcher.db_executor import DatabaseExecutor
+
+
+class TestDatabaseExecutor(IsolatedAsyncioTestCase):
+    @staticmethod
+    def slow_function():
+        time.sleep(0.2)
+        return threading.current_thread().name
+
+    async def test_worker_threads_run_concurrently(self):
+        db_executor = DatabaseExecutor(3)
+        slow_function = db_executor(self.slow_function)
+
+        start = time.monotonic()
+        thread_names = await asyncio.gather(*(slow_function() for _ in range(3)))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(len(set(thread_names)), 3)
+        db_executor.shutdown()
+
+    async def test_without_workers_one_thread_is_used(self):
+        db_executor = DatabaseExecutor(0)
+        slow_function = db_executor(self.slow_function)
+
+        thread_names = await asyncio.gather(*(slow_function() for _ in range(2)))
+        self.assertEqual(len(set(thread_names)), 1)
@@ -0,0 +1,77 @@
+import json
+import time
+
+from uuid import uuid4
+from unittest import TestCase
+
+from otl_interpreter.dispatcher.job_message_sender import (
+    JobMessageSender, SINGLE_MESSAGE_PROTOCOL_VERSION, BATCH_PROTOCOL_VERSION
+)
+
+
+class RecordingProducer:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, topic, message):
+        self.messages.append((topic, json.loads(message)))
+
+
+class TestJobMessageSender(TestCase):
+    def setUp(self):
+        self.producer = RecordingProducer()
+        self.computing_node_uuid = uuid4()
+        self.topic = f'{self.computing_node_uuid.hex}_job'
+
+    def test_single_message_protocol(self):
+        sender = JobMessageSender(self.producer, batch_size=10, batch_delay=10)
+        node_job_uuid = uuid4()
+        sender.send(
+            self.computing_node_uuid, {'uuid': node_job_uuid, 'status': 'CANCELED'}, SINGLE_MESSAGE_PROTOCOL_VERSION
+        )
+        self.assertListEqual(
+            self.producer.messages, [(self.topic, {'uuid': str(node_job_uuid), 'status': 'CANCELED'})]
+        )
+
+    def test_batch_is_sent_when_full(self):
+        sender = JobMessageSender(self.producer, batch_size=3, batch_delay=10)
+        for i in range(7):
+            sender.send(self.computing_node_uuid, {'number': i}, BATCH_PROTOCOL_VERSION)
+
+        self.assertEqual(len(self.producer.messages), 2)
+        topic, batch = self.producer.messages[0]
+        self.assertEqual(topic, self.topic)
+        self.assertDictEqual(
+            batch, {'protocol_version': BATCH_PROTOCOL_VERSION, 'messages': [{'number': 0}, {'number': 1}, {'number': 2}]}
+        )
+
+        # the rest is sent on flush
+        sender.flush()
+        self.assertListEqual(self.producer.messages[2][1]['messages'], [{'number': 6}])
+        self.assertEqual(sender.sent_messages, 7)
+        self.assertEqual(sender.sent_batches, 3)
+
+    def test_batch_is_sent_after_delay(self):
+        sender = JobMessageSender(self.producer, batch_size=100, batch_delay=0.01)
+        other_computing_node_uuid = uuid4()
+        sender.send(self.computing_node_uuid, {'number': 0}, BATCH_PROTOCOL_VERSION)
+        sender.send(other_computing_node_uuid, {'number': 1}, BATCH_PROTOCOL_VERSION)
+        sender.send(self.computing_node_uuid, {'number': 2}, BATCH_PROTOCOL_VERSION)
+        self.assertListEqual(self.producer.messages, [])
+
+        for i in range(100):
+            if len(self.producer.messages) == 2:
+                break
+            time.sleep(0.01)
+
+        batches = dict(self.producer.messages)
+        self.assertListEqual(batches[self.topic]['messages'], [{'number': 0}, {'number': 2}])
+        self.assertListEqual(batches[f'{other_computing_node_uuid.hex}_job']['messages'], [{'number': 1}])
+
+    def test_stop_sends_collected_messages(self):
+        sender = JobMessageSender(self.producer, batch_size=100, batch_delay=10)
+        sender.send(self.computing_node_uuid, {'number': 0}, BATCH_PROTOCOL_VERSION)
+        sender.stop()
+        self.assertListEqual(self.producer.messages[0][1]['messages'], [{'number': 0}])
+        # producer passed to sender isn't stopped by it
+        self.assertIs(sender.producer, self.producer)
@@ -0,0 +1,75 @@
+import asyncio
+
+from collections import defaultdict, namedtuple
+from unittest import IsolatedAsyncioTestCase
+
+from otl_interpreter.dispatcher.keyed_message_processor import KeyedMessageProcessor, key_index
+
+Message = namedtuple('Message', ['value'])
+
+
+class RecordingHandler:
+    def __init__(self, delays=None):
+        # key -> seconds to process message with that key
+        self.delays = delays or {}
+        self.processed = defaultdict(list)
+        self.order = []
+
+    async def ordering_key(self, message):
+        return message.value['key']
+
+    async def process_message(self, message):
+        key = message.value['key']
+        if key == 'broken':
+            raise ValueError('broken message')
+        await asyncio.sleep(self.delays.get(key, 0))
+        self.processed[key].append(message.value['number'])
+        self.order.append(key)
+
+
+class TestKeyedMessageProcessor(IsolatedAsyncioTestCase):
+    async def test_same_key_messages_are_ordered(self):
+        handler = RecordingHandler()
+        async with KeyedMessageProcessor(handler, concurrency=4) as message_processor:
+            for number in range(20):
+                await message_processor.submit(Message({'key': f'job{number % 3}', 'number': number}))
+
+        for key in ('job0', 'job1', 'job2'):
+            self.assertListEqual(handler.processed[key], sorted(handler.processed[key]))
+        self.assertEqual(sum(len(numbers) for numbers in handler.processed.values()), 20)
+
+    async def test_slow_message_doesnt_stall_other_keys(self):
+        handler = RecordingHandler(delays={'slow': 0.2})
+        message_processor = KeyedMessageProcessor(handler, concurrency=2)
+        # find key processed by other worker than slow key
+        fast_key = next(
+            f'fast{i}' for i in range(100)
+            if message_processor.worker_index(f'fast{i}') != message_processor.worker_index('slow')
+        )
+        async with message_processor:
+            await message_processor.submit(Message({'key': 'slow', 'number': 0}))
+            await message_processor.submit(Message({'key': fast_key, 'number': 1}))
+
+        self.assertListEqual(handler.order, [fast_key, 'slow'])
+
+    async def test_one_worker_processes_message_on_submit(self):
+        handler = RecordingHandler()
+        async with KeyedMessageProcessor(handler) as message_processor:
+            await message_processor.submit(Message({'key': 'job', 'number': 0}))
+            self.assertListEqual(handler.processed['job'], [0])
+
+    async def test_error_doesnt_stop_worker(self):
+        handler = RecordingHandler()
+        message_processor = KeyedMessageProcessor(handler, concurrency=2)
+        async with message_processor:
+            await message_processor.submit(Message({'key': 'broken', 'number': 0}))
+            await message_processor.submit(Message({'key': 'broken', 'number': 1}))
+            await message_processor.submit(Message({'key': 'job', 'number': 2}))
+
+        self.assertListEqual(handler.processed['job'], [2])
+
+    def test_key_index(self):
+        # index must be the same in every process, so builtin hash with random seed is not used
+        self.assertEqual(key_index('SPARK', 4), 1)
+        self.assertEqual(key_index(None, 4), 0)
+        self.assertTrue(all(0 <= key_index(f'key{i}', 3) < 3 for i in range(100)))
@@ -0,0 +1,79 @@
+import uuid
+
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from otl_interpreter.dispatcher.node_job_cache import NodeJobCache
+
+
+def _get_test_node_job_dict(status='PLANNED'):
+    return {
+        'uuid': uuid.uuid4().hex,
+        'status': status,
+        'computing_node_type': 'SPARK',
+        'commands': [],
+        'storage': 'interproc_storage',
+        'path': 'fff',
+        'user_guid': uuid.uuid4().hex
+    }
+
+
+class TestNodeJobCache(TestCase):
+    def test_set_get(self):
+        cache = NodeJobCache()
+        node_job_dict = _get_test_node_job_dict()
+        cache.set(node_job_dict['uuid'], node_job_dict)
+        self.assertDictEqual(cache.get(node_job_dict['uuid']), node_job_dict)
+
+    def test_uuid_and_hex_keys_are_equal(self):
+        cache = NodeJobCache()
+        node_job_dict = _get_test_node_job_dict()
+        cache.set(uuid.UUID(node_job_dict['uuid']), node_job_dict)
+        self.assertIn(node_job_dict['uuid'], cache)
+
+    def test_returns_copy(self):
+        cache = NodeJobCache()
+        node_job_dict = _get_test_node_job_dict()
+        cache.set(node_job_dict['uuid'], node_job_dict)
+        node_job_dict['status'] = 'RUNNING'
+        cached_node_job_dict = cache.get(node_job_dict['uuid'])
+        self.assertEqual(cached_node_job_dict['status'], 'PLANNED')
+        cached_node_job_dict['status'] = 'FINISHED'
+        self.assertEqual(cache.get(node_job_dict['uuid'])['status'], 'PLANNED')
+
+    def test_lru_eviction(self):
+        cache = NodeJobCache(max_size=2)
+        node_job_dicts = [_get_test_node_job_dict() for _ in range(3)]
+        cache.set(node_job_dicts[0]['uuid'], node_job_dicts[0])
+        cache.set(node_job_dicts[1]['uuid'], node_job_dicts[1])
+        # touch first node job so second becomes least recently used
+        cache.get(node_job_dicts[0]['uuid'])
+        cache.set(node_job_dicts[2]['uuid'], node_job_dicts[2])
+
+        self.assertEqual(len(cache), 2)
+        self.assertIn(node_job_dicts[0]['uuid'], cache)
+        self.assertNotIn(node_job_dicts[1]['uuid'], cache)
+        self.assertIn(node_job_dicts[2]['uuid'], cache)
+
+    def test_ttl(self):
+        cache = NodeJobCache(ttl=60)
+        node_job_dict = _get_test_node_job_dict()
+        cache.set(node_job_dict['uuid'], node_job_dict)
+        # make entry old
+        key = cache._key(node_job_dict['uuid'])
+        cache._node_jobs[key] = (node_job_dict, datetime.now() - timedelta(seconds=61))
+        self.assertIsNone(cache.get(node_job_dict['uuid']))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        cache = NodeJobCache()
+        node_job_dict = _get_test_node_job_dict()
+        cache.set(node_job_dict['uuid'], node_job_dict)
+        cache.invalidate(node_job_dict['uuid'])
+        self.assertIsNone(cache.get(node_job_dict['uuid']))
+
+    def test_zero_size_disables_cache(self):
+        cache = NodeJobCache(max_size=0)
+        node_job_dict = _get_test_node_job_dict()
+        cache.set(node_job_dict['uuid'], node_job_dict)
+        self.assertIsNone(cache.get(node_job_dict['uuid']))
@@ -0,0 +1,193 @@
+import uuid
+import datetime
+
+from unittest import TestCase
+
+from core.settings.test import REDIS_CONFIG
+from otl_interpreter.interpreter_db.enums import NodeJobStatus
+from otl_interpreter.utils.redis_connection import get_redis
+from otl_interpreter.dispatcher.node_job_priority import (
+    NodeJobPriority, FifoPolicy, AgingPolicy, FairSharePolicy, ShortestJobFirstPolicy, DeadlinePolicy,
+    RedisNodeJobCounter
+)
+
+
+class FakeOtlJobTimings:
+    def __init__(self):
+        # otl job uuid -> (creation timestamp, timeout)
+        self.timings = {}
+
+    def get(self, node_job_dict):
+        return self.timings.get(node_job_dict['otl_job_uuid'])
+
+
+def _get_test_node_job_dict(user_guid=None, commands=None, otl_job_uuid=None):
+    return {
+        'uuid': uuid.uuid4(),
+        'status': NodeJobStatus.READY_TO_EXECUTE,
+        'computing_node_type': 'SPARK',
+        'commands': commands or [{'name': 'otstats'}],
+        'storage': 'interproc_storage',
+        'path': 'fff',
+        'user_guid': user_guid or uuid.uuid4(),
+        'otl_job_uuid': otl_job_uuid or uuid.uuid4().hex,
+    }
+
+
+class TestNodeJobPriority(TestCase):
+    def setUp(self) -> None:
+        self.otl_job_timings = FakeOtlJobTimings()
+
+    def test_fifo(self):
+        node_job_priority = NodeJobPriority([FifoPolicy(self.otl_job_timings)])
+        score1 = node_job_priority.score(_get_test_node_job_dict())
+        score2 = node_job_priority.score(_get_test_node_job_dict())
+        self.assertLessEqual(score1, score2)
+        self.assertAlmostEqual(score2, datetime.datetime.now().timestamp(), delta=1)
+
+    def test_aging(self):
+        node_job_priority = NodeJobPriority([AgingPolicy(self.otl_job_timings)])
+        old_node_job_dict = _get_test_node_job_dict()
+        self.otl_job_timings.timings[old_node_job_dict['otl_job_uuid']] = (
+            datetime.datetime.now().timestamp() - 100, 0
+        )
+        new_node_job_dict = _get_test_node_job_dict()
+        self.otl_job_timings.timings[new_node_job_dict['otl_job_uuid']] = (datetime.datetime.now().timestamp(), 0)
+
+        self.assertLess(
+            node_job_priority.score(old_node_job_dict) + 90, node_job_priority.score(new_node_job_dict)
+        )
+
+    def test_fair_share(self):
+        node_job_priority = NodeJobPriority([FairSharePolicy(self.otl_job_timings, weight=10)])
+        busy_user = uuid.uuid4()
+        for i in range(3):
+            node_job_dict = _get_test_node_job_dict(user_guid=busy_user)
+            node_job_priority.node_job_status_changed(node_job_dict, NodeJobStatus.READY_TO_EXECUTE, NodeJobStatus.IN_QUEUE)
+
+        busy_user_score = node_job_priority.score(_get_test_node_job_dict(user_guid=busy_user))
+        other_user_score = node_job_priority.score(_get_test_node_job_dict())
+        self.assertAlmostEqual(busy_user_score - other_user_score, 30, delta=1)
+
+        # node job taken from queue
+        node_job_priority.node_job_status_changed(node_job_dict, NodeJobStatus.IN_QUEUE, NodeJobStatus.TAKEN_FROM_QUEUE)
+        busy_user_score = node_job_priority.score(_get_test_node_job_dict(user_guid=busy_user))
+        other_user_score = node_job_priority.score(_get_test_node_job_dict())
+        self.assertAlmostEqual(busy_user_score - other_user_score, 20, delta=1)
+
+    def test_fair_share_between_processes(self):
+        key = f'test_fair_share_{uuid.uuid4().hex}'
+        queueing_process_counter = RedisNodeJobCounter(get_redis(REDIS_CONFIG), key)
+        self.addCleanup(queueing_process_counter.reset, {})
+        queueing_process_priority = NodeJobPriority([
+            FairSharePolicy(self.otl_job_timings, weight=10, node_job_counter=queueing_process_counter)
+        ])
+        taking_process_priority = NodeJobPriority([
+            FairSharePolicy(
+                self.otl_job_timings, weight=10, node_job_counter=RedisNodeJobCounter(get_redis(REDIS_CONFIG), key)
+            )
+        ])
+
+        user_guid = uuid.uuid4()
+        node_job_dicts = [_get_test_node_job_dict(user_guid=user_guid) for i in range(2)]
+        for node_job_dict in node_job_dicts:
+            queueing_process_priority.node_job_status_changed(
+                node_job_dict, NodeJobStatus.READY_TO_EXECUTE, NodeJobStatus.IN_QUEUE
+            )
+        # node job is taken from queue by other process, queue dictionary has other uuid format
+        node_job_dicts[0]['user_guid'] = str(user_guid)
+        taking_process_priority.node_job_status_changed(
+            node_job_dicts[0], NodeJobStatus.IN_QUEUE, NodeJobStatus.TAKEN_FROM_QUEUE
+        )
+        self.assertEqual(queueing_process_counter.get(user_guid.hex), 1)
+
+        taking_process_priority.node_job_status_changed(
+            node_job_dicts[1], NodeJobStatus.IN_QUEUE, NodeJobStatus.CANCELED
+        )
+        self.assertEqual(queueing_process_counter.get(user_guid.hex), 0)
+
+        other_user_score = queueing_process_priority.score(_get_test_node_job_dict())
+        user_score = queueing_process_priority.score(_get_test_node_job_dict(user_guid=user_guid))
+        self.assertAlmostEqual(user_score, other_user_score, delta=1)
+
+    def test_fair_share_reconciliation(self):
+        policy = FairSharePolicy(self.otl_job_timings, weight=10)
+        node_job_priority = NodeJobPriority([policy])
+        user_guid = uuid.uuid4()
+        for i in range(3):
+            node_job_priority.node_job_status_changed(
+                _get_test_node_job_dict(user_guid=user_guid), NodeJobStatus.READY_TO_EXECUTE, NodeJobStatus.IN_QUEUE
+            )
+
+        # only one node job is in queue according to database
+        node_job_priority.node_job_queue_reconciled([_get_test_node_job_dict(user_guid=user_guid.hex)])
+        self.assertEqual(policy.node_job_counter.get(user_guid.hex), 1)
+
+    def test_shortest_job_first(self):
+        policy = ShortestJobFirstPolicy(self.otl_job_timings)
+        node_job_priority = NodeJobPriority([policy])
+
+        long_node_job_dict = _get_test_node_job_dict(commands=[{'name': 'otstats'}, {'name': 'join'}])
+        node_job_priority.node_job_status_changed(
+            long_node_job_dict, NodeJobStatus.SENT_TO_COMPUTING_NODE, NodeJobStatus.RUNNING
+        )
+        policy._start_timestamps[long_node_job_dict['uuid'].hex] -= 100
+        # node job dict with finished status may come from database with hex uuid
+        node_job_priority.node_job_status_changed(
+            dict(long_node_job_dict, uuid=long_node_job_dict['uuid'].hex), NodeJobStatus.RUNNING, NodeJobStatus.FINISHED
+        )
+
+        self.assertAlmostEqual(policy.expected_runtime(long_node_job_dict), 100, delta=1)
+
+        long_score = node_job_priority.score(
+            _get_test_node_job_dict(commands=[{'name': 'otstats'}, {'name': 'join'}])
+        )
+        short_score = node_job_priority.score(_get_test_node_job_dict())
+        self.assertAlmostEqual(long_score - short_score, 100, delta=1)
+
+    def test_shortest_job_first_start_timestamps_limit(self):
+        policy = ShortestJobFirstPolicy(self.otl_job_timings, max_size=2)
+        node_job_dicts = [_get_test_node_job_dict() for i in range(3)]
+        for node_job_dict in node_job_dicts:
+            policy.node_job_status_changed(node_job_dict, NodeJobStatus.SENT_TO_COMPUTING_NODE, NodeJobStatus.RUNNING)
+
+        # node job that started first is forgotten
+        self.assertListEqual(
+            list(policy._start_timestamps.keys()), [node_job_dict['uuid'].hex for node_job_dict in node_job_dicts[1:]]
+        )
+
+        policy.node_job_status_changed(
+            node_job_dicts[1], NodeJobStatus.RUNNING, NodeJobStatus.DECLINED_BY_COMPUTING_NODE
+        )
+        self.assertListEqual(list(policy._start_timestamps.keys()), [node_job_dicts[2]['uuid'].hex])
+
+    def test_deadline(self):
+        node_job_priority = NodeJobPriority([
+            FairSharePolicy(self.otl_job_timings, weight=1000), DeadlinePolicy(self.otl_job_timings)
+        ])
+        user_guid = uuid.uuid4()
+        node_job_priority.node_job_status_changed(
+            _get_test_node_job_dict(user_guid=user_guid), NodeJobStatus.READY_TO_EXECUTE, NodeJobStatus.IN_QUEUE
+        )
+
+        node_job_dict = _get_test_node_job_dict(user_guid=user_guid)
+        now = datetime.datetime.now().timestamp()
+        self.otl_job_timings.timings[node_job_dict['otl_job_uuid']] = (now, 60)
+        self.assertAlmostEqual(node_job_priority.score(node_job_dict), now + 60, delta=1)
+
+        # zero timeout is infinity
+        self.otl_job_timings.timings[node_job_dict['otl_job_uuid']] = (now, 0)
+        self.assertAlmostEqual(node_job_priority.score(node_job_dict), now + 1000, delta=1)
+
+    def test_from_config(self):
+        node_job_priority = NodeJobPriority.from_config({
+            'priority_policy': 'aging fair_share unknown_policy shortest_job_first',
+            'fair_share_weight': '5',
+            'shortest_job_first_weight': '2',
+        })
+        self.assertListEqual(
+            [type(policy) for policy in node_job_priority.policies],
+            [AgingPolicy, FairSharePolicy, ShortestJobFirstPolicy]
+        )
+        self.assertEqual(node_job_priority.policies[1].weight, 5)
+        self.assertEqual(node_job_priority.policies[2].weight, 2)
@@ -0,0 +1,45 @@
+import uuid
+
+from register_test_commands import register_test_commands
+from rest.test import TestCase
+
+from otl_interpreter.interpreter_db import node_commands_manager
+from otl_interpreter.dispatcher.node_job_resources import NodeJobResourceDemand
+
+
+class TestNodeJobResourceDemand(TestCase):
+    def setUp(self) -> None:
+        register_test_commands()
+        self.node_guid = uuid.uuid4().hex
+        node_commands_manager.register_node('SPARK', self.node_guid, 'local')
+        node_commands_manager.register_node_commands(
+            self.node_guid,
+            {
+                "command_with_cores": {"rules": [], "resource_necessity": {"cores": 4}},
+                "command_with_memory": {"rules": [], "resource_necessity": {"cores": 1, "memory": 100}},
+            }
+        )
+
+    def test_demand_is_maximum_over_commands(self):
+        node_job_resource_demand = NodeJobResourceDemand()
+        node_job_dict = {
+            'computing_node_type': 'SPARK',
+            'commands': [{'name': 'command_with_cores'}, {'name': 'command_with_memory'}, {'name': 'otstats'}],
+        }
+        self.assertDictEqual(node_job_resource_demand.get(node_job_dict), {'cores': 4, 'memory': 100})
+
+    def test_demand_reloaded_after_commands_update(self):
+        node_job_resource_demand = NodeJobResourceDemand(check_period=0)
+        node_job_dict = {
+            'computing_node_type': 'SPARK',
+            'commands': [{'name': 'command_with_cores'}],
+        }
+        self.assertDictEqual(node_job_resource_demand.get(node_job_dict), {'cores': 4})
+
+        node_commands_manager.register_node_commands(
+            self.node_guid,
+            {
+                "command_with_cores": {"rules": [], "resource_necessity": {"cores": 8}},
+            }
+        )
+        self.assertDictEqual(node_job_resource_demand.get(node_job_dict), {'cores': 8})
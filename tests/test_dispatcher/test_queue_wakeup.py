@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from unittest import IsolatedAsyncioTestCase
+
+from otl_interpreter.dispatcher.queue_wakeup import QueueWakeup
+
+
+class TestQueueWakeup(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.queue_wakeup = QueueWakeup()
+        self.queue_wakeup.attach()
+
+    async def test_timeout(self):
+        self.assertIsNone(await self.queue_wakeup.wait(0.01))
+
+    async def test_wake_before_wait(self):
+        self.queue_wakeup.wake('SPARK')
+        self.queue_wakeup.wake('EEP')
+        self.queue_wakeup.wake('SPARK')
+        self.assertSetEqual(await self.queue_wakeup.wait(10), {'SPARK', 'EEP'})
+        self.assertIsNone(await self.queue_wakeup.wait(0.01))
+
+    async def test_wake_from_other_thread(self):
+        loop = asyncio.get_running_loop()
+        waiting = asyncio.create_task(self.queue_wakeup.wait(10))
+        await asyncio.sleep(0)
+
+        thread = threading.Thread(target=self.queue_wakeup.wake, args=('SPARK', ))
+        start = loop.time()
+        thread.start()
+        self.assertSetEqual(await waiting, {'SPARK'})
+        self.assertLess(loop.time() - start, 5)
+        thread.join()
+
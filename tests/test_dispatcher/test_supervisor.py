@@ -0,0 +1,196 @@
+import sys
+import asyncio
+
+from pathlib import Path
+from queue import Queue
+from types import SimpleNamespace
+from unittest import TestCase, IsolatedAsyncioTestCase
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.conf import settings
+
+# dispatcher modules import each other as top level modules
+sys.path.insert(0, str(Path(settings.PLUGINS_DIR) / 'otl_interpreter' / 'dispatcher'))
+
+import supervisor  # noqa: E402
+
+from computing_node_pool import ComputingNodePool  # noqa: E402
+from keyed_message_processor import key_index  # noqa: E402
+from reservation_release import ReservationRelease, RELEASED_RESERVATION_TOPIC  # noqa: E402
+
+
+class RecordingQueueWakeup:
+    def __init__(self):
+        self.woken_computing_node_types = []
+
+    def wake(self, computing_node_type):
+        self.woken_computing_node_types.append(computing_node_type)
+
+
+class FakeConsumer:
+    """
+    Consumer of message broker that gives predefined messages
+    """
+    messages = []
+
+    def __init__(self, topic, value_deserializer=None, extra_config=None):
+        self.topic = topic
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        pass
+
+    async def __aiter__(self):
+        for value in self.messages:
+            yield SimpleNamespace(value=value)
+
+
+class TestReservationRelease(TestCase):
+    def setUp(self):
+        self.computing_node_pool = ComputingNodePool()
+        self.computing_node_pool.add_computing_node('test1', 'SPARK', {'job_capacity': 2}, False)
+        self.queue_wakeup = RecordingQueueWakeup()
+        self.reservation_release = ReservationRelease(self.computing_node_pool, self.queue_wakeup)
+
+    def test_release(self):
+        node_job_uuid = uuid4()
+        self.computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuid.hex)
+
+        self.assertTrue(self.reservation_release.release(str(node_job_uuid), 'SPARK'))
+        self.assertEqual(self.computing_node_pool.free_slots('SPARK'), 2)
+
+        # reservation isn't in pool and release isn't forwarded in one process mode
+        self.assertFalse(self.reservation_release.release(node_job_uuid, 'SPARK'))
+
+    def test_release_forwarded_to_supervisor(self):
+        outbox = Queue(1)
+        self.reservation_release.attach(outbox, 1)
+        node_job_uuid = uuid4()
+
+        self.assertFalse(self.reservation_release.release(node_job_uuid, 'SPARK'))
+        self.assertEqual(
+            outbox.get_nowait(), (1, {'node_job_uuid': node_job_uuid.hex, 'computing_node_type': 'SPARK'})
+        )
+
+        # release is dropped when outbox is full
+        outbox.put_nowait(None)
+        with self.assertLogs('otl_interpreter.dispatcher', 'WARNING'):
+            self.assertFalse(self.reservation_release.release(node_job_uuid, 'SPARK'))
+
+    def test_release_forwarded(self):
+        node_job_uuids = [uuid4() for i in range(2)]
+        for node_job_uuid in node_job_uuids:
+            self.computing_node_pool.reserve_node('SPARK', node_job_uuid=node_job_uuid)
+
+        self.reservation_release.release_forwarded(
+            {'node_job_uuid': node_job_uuids[0].hex, 'computing_node_type': 'SPARK'}
+        )
+        self.assertEqual(self.computing_node_pool.free_slots('SPARK'), 1)
+        self.assertListEqual(self.queue_wakeup.woken_computing_node_types, ['SPARK'])
+
+        # queue isn't woken when reservation was made by other worker
+        self.reservation_release.release_forwarded({'node_job_uuid': uuid4().hex, 'computing_node_type': 'SPARK'})
+        self.assertListEqual(self.queue_wakeup.woken_computing_node_types, ['SPARK'])
+
+
+class TestSupervisor(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.supervisor = supervisor.DispatcherSupervisor(workers=3)
+        # worker processes are not started, their queues are read by test
+        self.supervisor._inboxes = [Queue() for shard in range(3)]
+        self.supervisor._outbox = Queue()
+        self.supervisor._shard_metrics = [SimpleNamespace(forwarded_messages=0) for shard in range(3)]
+
+    def received_messages(self, shard):
+        inbox = self.supervisor._inboxes[shard]
+        return [inbox.get_nowait() for i in range(inbox.qsize())]
+
+    def test_shard_computing_node_types(self):
+        computing_node_types = [f'TYPE{i}' for i in range(10)]
+        with patch.object(supervisor, 'node_job_queue', SimpleNamespace(
+            computing_node_types=lambda: computing_node_types[:5]
+        )), patch.object(supervisor, 'computing_node_pool', SimpleNamespace(
+            nodes_by_types={computing_node_type: {} for computing_node_type in computing_node_types[3:]}
+        )):
+            shards_computing_node_types = [supervisor.shard_computing_node_types(shard, 3) for shard in range(3)]
+
+        # queue of every computing node type is checked by one worker
+        self.assertListEqual(
+            sorted(sum(shards_computing_node_types, [])), sorted(computing_node_types)
+        )
+        for shard, shard_computing_node_types in enumerate(shards_computing_node_types):
+            for computing_node_type in shard_computing_node_types:
+                self.assertEqual(key_index(computing_node_type, 3), shard)
+
+    async def test_forward_messages(self):
+        otl_job_uuid = uuid4()
+        FakeConsumer.messages = [
+            {'uuid': str(uuid4()), 'otl_job_uuid': str(otl_job_uuid), 'status': 'RUNNING'}
+            for i in range(3)
+        ]
+        with patch.object(supervisor, 'Consumer', FakeConsumer):
+            await self.supervisor.forward_messages('nodejob_status')
+
+        # statuses of one otl job go to the same worker
+        shard = key_index(otl_job_uuid.hex, 3)
+        self.assertListEqual(
+            self.received_messages(shard), [('nodejob_status', value) for value in FakeConsumer.messages]
+        )
+        self.assertEqual(self.supervisor._shard_metrics[shard].forwarded_messages, 3)
+
+        # otl job commands go to the worker of its node job statuses
+        FakeConsumer.messages = [{'command': {'name': 'cancel', 'otl_job_uuid': otl_job_uuid.hex}}]
+        with patch.object(supervisor, 'Consumer', FakeConsumer):
+            await self.supervisor.forward_messages('otl_job')
+        self.assertListEqual(self.received_messages(shard), [('otl_job', FakeConsumer.messages[0])])
+
+    async def test_forward_broadcast_messages(self):
+        FakeConsumer.messages = [{'computing_node_uuid': str(uuid4()), 'command_name': 'RESOURCE_STATUS'}]
+        with patch.object(supervisor, 'Consumer', FakeConsumer):
+            await self.supervisor.forward_messages('computing_node_control')
+
+        for shard in range(3):
+            self.assertListEqual(
+                self.received_messages(shard), [('computing_node_control', FakeConsumer.messages[0])]
+            )
+
+    async def test_forward_released_reservations(self):
+        released_reservation = {'node_job_uuid': uuid4().hex, 'computing_node_type': 'SPARK'}
+        self.supervisor._outbox.put_nowait((1, released_reservation))
+
+        forwarding = asyncio.create_task(self.supervisor.forward_released_reservations())
+        try:
+            for i in range(100):
+                if self.supervisor._shard_metrics[0].forwarded_messages and \
+                        self.supervisor._shard_metrics[2].forwarded_messages:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            forwarding.cancel()
+
+        # release goes to every worker except the one that sent it
+        self.assertListEqual(self.received_messages(0), [(RELEASED_RESERVATION_TOPIC, released_reservation)])
+        self.assertListEqual(self.received_messages(1), [])
+        self.assertListEqual(self.received_messages(2), [(RELEASED_RESERVATION_TOPIC, released_reservation)])
+
+    async def test_worker_releases_forwarded_reservation(self):
+        inbox = Queue()
+        released_reservation = {'node_job_uuid': uuid4().hex, 'computing_node_type': 'SPARK'}
+        inbox.put_nowait((RELEASED_RESERVATION_TOPIC, released_reservation))
+
+        released_reservations = []
+        reservation_release = SimpleNamespace(release_forwarded=released_reservations.append)
+        with patch.object(supervisor, 'reservation_release', reservation_release):
+            reading = asyncio.create_task(supervisor._read_inbox(inbox, {}))
+            try:
+                for i in range(100):
+                    if released_reservations:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                reading.cancel()
+
+        self.assertListEqual(released_reservations, [released_reservation])
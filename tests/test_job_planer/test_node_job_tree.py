@@ -9,6 +9,8 @@ from otl_interpreter.job_planner.node_job_tree_constructor import _construct_nod
 from otl_interpreter.job_planner.command_tree_constructor import make_command_tree
 from otl_interpreter.job_planner.define_computing_node_type_algorithm import define_computing_node_type_for_command_tree
 from otl_interpreter.job_planner.sys_commands import SysReadWriteCommand
+from otl_interpreter.job_planner.job_planner_class import JobPlanner
+from otl_interpreter.job_planner.plan_cache import PlanCache
 from otl_interpreter.translator import translate_otl
 
 from register_test_commands import register_test_commands
@@ -331,5 +333,28 @@ class TestNodeJobTree(TestCase):
             counter += 1
         self.assertEqual(counter, 2, 'Two node jobs must be created')
 
-
-
+    def test_plan_cache(self):
+        test_otl = "| otstats index='test_index2' | merge_dataframes [readfile 1,2,4]"
+        plan_cache = PlanCache()
+        job_planner = JobPlanner(list(self.computing_node_type_priority_list), plan_cache=plan_cache)
+        other_tws = self.default_tws - datetime.timedelta(days=1)
+
+        top_node_job1 = job_planner.plan_job(translate_otl(test_otl), self.default_tws, self.default_twf)
+        top_node_job2 = job_planner.plan_job(translate_otl(test_otl), other_tws, self.default_twf)
+        self.assertEqual(plan_cache.misses, 1)
+        self.assertEqual(plan_cache.hits, 1)
+
+        # plan from cache is the same as planned without cache
+        not_cached_top_node_job = JobPlanner(list(self.computing_node_type_priority_list)).plan_job(
+            translate_otl(test_otl), other_tws, self.default_twf
+        )
+        node_jobs1 = list(top_node_job1.parent_first_order_traverse_iterator())
+        node_jobs2 = list(top_node_job2.parent_first_order_traverse_iterator())
+        not_cached_node_jobs = list(not_cached_top_node_job.parent_first_order_traverse_iterator())
+        self.assertListEqual(
+            [node_job.command_tree_json for node_job in node_jobs2],
+            [node_job.command_tree_json for node_job in not_cached_node_jobs]
+        )
+        self.assertTrue(
+            set(node_job.uuid for node_job in node_jobs1).isdisjoint(node_job.uuid for node_job in node_jobs2)
+        )
@@ -5,8 +5,15 @@ from datetime import datetime
 import subprocess
 
 from pathlib import Path
+from unittest import TestCase
+from uuid import uuid4
 
 from django.conf import settings
+from pottery import RedisDict
+
+from core.settings.test import REDIS_CONFIG
+from otl_interpreter.utils.redis_connection import get_redis
+from ot_simple_rest_job_proxy.job_proxy_manager import JobProxyManager
 from otl_interpreter.interpreter_db.models import NodeJob, OtlJob
 from base_classes import BaseApiTest, BaseTearDown
 
@@ -71,3 +78,28 @@ class TestOtlJobHandler(BaseTearDown, BaseApiTest):
             format='json'
         )
         self.assertEqual(response.status_code, 200)
+
+
+class TestRedisDictPipeline(TestCase):
+    def setUp(self):
+        self.redis = get_redis(REDIS_CONFIG)
+        self.redis_dict = RedisDict(redis=self.redis, key=f'test_job_proxy_manager_{uuid4().hex}')
+        self.addCleanup(self.redis.delete, self.redis_dict.key)
+
+    def test_items_written_in_pipeline_are_read_by_redis_dict(self):
+        query = {'job_id': uuid4().hex, 'status': 'new', 'path': None, 'timeout': 0}
+
+        pipeline = self.redis.pipeline()
+        JobProxyManager._set_in_pipeline(pipeline, self.redis_dict, 'query_key', query)
+        JobProxyManager._set_in_pipeline(pipeline, self.redis_dict, 'other_query_key', 'value')
+        pipeline.execute()
+        self.assertEqual(self.redis_dict['query_key'], query)
+        self.assertEqual(self.redis_dict.get('other_query_key'), 'value')
+
+        # items written by redis dictionary are deleted in pipeline
+        self.redis_dict['query_key'] = dict(query, status='running')
+        pipeline = self.redis.pipeline()
+        JobProxyManager._delete_in_pipeline(pipeline, self.redis_dict, 'query_key')
+        pipeline.execute()
+        self.assertNotIn('query_key', self.redis_dict)
+        self.assertIn('other_query_key', self.redis_dict)
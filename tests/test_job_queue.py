@@ -2,6 +2,7 @@ import random
 import string
 import uuid
 import datetime
+import time
 
 from core.settings.test import REDIS_CONFIG
 from rest.test import TestCase
@@ -20,6 +21,8 @@ class BaseTestCases:
             self.queue = None
 
         def tearDown(self) -> None:
+            # redis queue outlives queue object
+            self.queue.clear()
             del self.queue
 
         def test_push_pop(self):
@@ -90,6 +93,96 @@ class BaseTestCases:
             self.assertEqual(len(elements), 1)
             self.assertTupleEqual(elements[0], (b'asdf', 1.0))
 
+        def test_decreased_score(self):
+            self.queue.add(3, 'element1')
+            self.queue.add(2, 'element2')
+            self.queue.add(1, 'element1')
+            elements = self.queue.pop(count=2)
+            self.assertListEqual(elements, [(b'element2', 2.0), (b'element1', 1.0)])
+
+        def test_remove(self):
+            self.queue.add(1, 'element1')
+            self.queue.add(2, 'element2')
+            self.queue.add(3, 'element3')
+            self.queue.remove('element3', b'element1', 'not_in_queue')
+            self.assertEqual(len(self.queue), 1)
+            elements = self.queue.pop(count=3)
+            self.assertListEqual(elements, [(b'element2', 2.0)])
+
+        def test_add_after_remove(self):
+            self.queue.add(1, 'element')
+            self.queue.remove('element')
+            self.queue.add(2, 'element')
+            elements = self.queue.pop(count=2, min_score=True)
+            self.assertListEqual(elements, [(b'element', 2.0)])
+
+        def test_order_after_many_updates(self):
+            scores = dict()
+            for i in range(500):
+                element = f'element{random.randint(1, 100)}'.encode()
+                if random.random() < 0.2:
+                    self.queue.remove(element)
+                    scores.pop(element, None)
+                else:
+                    scores[element] = float(random.randint(1, 20))
+                    self.queue.add(scores[element], element)
+
+            expected = sorted(scores.items(), key=lambda item: (item[1], item[0]))
+            self.assertListEqual(self.queue.pop(count=10, min_score=True), expected[:10])
+            self.assertListEqual(self.queue.pop(count=10), list(reversed(expected[10:]))[:10])
+            self.assertEqual(len(self.queue), max(len(expected) - 20, 0))
+
+        def test_reserve_ack(self):
+            self.queue.add(1, 'element1')
+            self.queue.add(2, 'element2')
+            self.queue.add(3, 'element3')
+            elements = self.queue.reserve(count=2, min_score=True)
+            self.assertListEqual(elements, [(b'element1', 1.0), (b'element2', 2.0)])
+            self.assertEqual(len(self.queue), 1)
+
+            self.queue.ack(b'element1', b'element2')
+            self.assertEqual(self.queue.requeue_expired(now=time.time() + 3600), 0)
+            self.assertEqual(len(self.queue), 1)
+
+        def test_requeue_expired(self):
+            self.queue.add(1, 'element1')
+            self.queue.add(2, 'element2')
+            self.queue.reserve(count=2, lease_time=60)
+
+            self.assertEqual(self.queue.requeue_expired(), 0)
+            self.assertEqual(len(self.queue), 0)
+
+            self.assertEqual(self.queue.requeue_expired(now=time.time() + 61), 2)
+            elements = self.queue.pop(count=2, min_score=True)
+            self.assertListEqual(elements, [(b'element1', 1.0), (b'element2', 2.0)])
+
+        def test_requeue(self):
+            self.queue.add(1, 'element1')
+            self.queue.add(2, 'element2')
+            self.queue.reserve(count=2, min_score=True)
+            # element added again after reservation keeps new score
+            self.queue.add(3, 'element2')
+
+            self.queue.requeue(b'element1', b'element2')
+            elements = self.queue.pop(count=2, min_score=True)
+            self.assertListEqual(elements, [(b'element1', 1.0), (b'element2', 3.0)])
+            self.assertEqual(self.queue.requeue_expired(now=time.time() + 3600), 0)
+
+        def test_elements(self):
+            self.queue.add(1, 'element1')
+            self.queue.add(2, 'element2')
+            self.queue.reserve(count=1, min_score=True)
+            self.assertListEqual(sorted(self.queue.elements()), [b'element1', b'element2'])
+            self.assertEqual(len(self.queue), 1)
+
+        def test_clear(self):
+            self.queue.add(1, 'element1')
+            self.queue.add(2, 'element2')
+            self.queue.reserve(count=1)
+            self.queue.clear()
+            self.assertListEqual(self.queue.elements(), [])
+            self.assertEqual(self.queue.requeue_expired(now=time.time() + 3600), 0)
+
         def test_length(self):
             queue_size = random.randint(30, 50)
             for i in range(queue_size):
@@ -135,6 +228,10 @@ class BaseNodeJobQueueTestCases:
         def setUp(self) -> None:
             self.node_job_queue = None
 
+        def tearDown(self) -> None:
+            for queue in self.node_job_queue.queues.values():
+                queue.clear()
+
         def test_queue_class_choice(self):
             node_job_queue = NodeJobQueue(one_process_mode=True)
             self.assertEqual(type(node_job_queue.queues['SPARK']), PriorityQueue)
@@ -156,6 +253,50 @@ class BaseNodeJobQueueTestCases:
             node_job_dict, priority_score = self.node_job_queue.pop('SPARK')
             self.assertDictEqual(node_job_dict, node_job_dict2)
 
+        def test_pop_many(self):
+            node_job_dicts = [_get_test_computing_node_dict(computing_node_type='SPARK') for _ in range(5)]
+            score = datetime.datetime.now().timestamp()
+            for i, node_job_dict in enumerate(node_job_dicts):
+                self.node_job_queue.add(node_job_dict, score + i)
+
+            node_jobs = self.node_job_queue.pop_many('SPARK', 3)
+            self.assertListEqual([node_job_dict for node_job_dict, _ in node_jobs], node_job_dicts[:3])
+
+            node_jobs = self.node_job_queue.pop_many('SPARK', 3)
+            self.assertListEqual([node_job_dict for node_job_dict, _ in node_jobs], node_job_dicts[3:])
+            self.assertEqual(self.node_job_queue.node_jobs_in_queue('SPARK'), 0)
+
+        def test_reserve_many_ack(self):
+            node_job_dicts = [_get_test_computing_node_dict(computing_node_type='SPARK') for _ in range(3)]
+            score = datetime.datetime.now().timestamp()
+            for i, node_job_dict in enumerate(node_job_dicts):
+                self.node_job_queue.add(node_job_dict, score + i)
+
+            node_jobs = self.node_job_queue.reserve_many('SPARK', 2)
+            self.assertListEqual([node_job_dict for node_job_dict, _ in node_jobs], node_job_dicts[:2])
+            self.node_job_queue.ack(node_job_dicts[0]['uuid'])
+
+            # lease of second node job expires
+            self.assertEqual(self.node_job_queue.queues['SPARK'].requeue_expired(now=time.time() + 3600), 1)
+            node_jobs = self.node_job_queue.pop_many('SPARK', 3)
+            self.assertListEqual([node_job_dict for node_job_dict, _ in node_jobs], node_job_dicts[1:])
+
+        def test_queued_node_jobs(self):
+            node_job_dicts = [_get_test_computing_node_dict(computing_node_type='SPARK') for _ in range(3)]
+            score = datetime.datetime.now().timestamp()
+            for i, node_job_dict in enumerate(node_job_dicts):
+                self.node_job_queue.add(node_job_dict, score + i)
+            self.node_job_queue.reserve_many('SPARK', 1)
+
+            queued_node_jobs = self.node_job_queue.queued_node_jobs('SPARK')
+            self.assertSetEqual(
+                set(queued_node_jobs.keys()), {node_job_dict['uuid'] for node_job_dict in node_job_dicts}
+            )
+
+            self.node_job_queue.remove('SPARK', *queued_node_jobs[node_job_dicts[2]['uuid']])
+            node_jobs = self.node_job_queue.pop_many('SPARK', 3)
+            self.assertListEqual([node_job_dict for node_job_dict, _ in node_jobs], node_job_dicts[1:2])
+
         def test_computing_node_type_keys(self):
             node_job_dicts = [
                 _get_test_computing_node_dict(
@@ -46,3 +46,54 @@ class TestGetCommands(TestCase):
 
 
 
+
+    def test_commands_resource_necessity(self):
+        node_guids = [uuid.uuid4().hex for _ in range(2)]
+        for i, node_guid in enumerate(node_guids):
+            node_commands_manager.register_node('RESOURCE_TEST', node_guid, 'local')
+            node_commands_manager.register_node_commands(
+                node_guid,
+                {
+                    "heavy_command": {
+                        "rules": [{"type": "subsearch"}],
+                        "resource_necessity": {"cores": 2 + i, "memory": 10 - i}
+                    },
+                    "light_command": {"rules": [{"type": "subsearch"}]},
+                }
+            )
+        self.assertDictEqual(
+            node_commands_manager.get_commands_resource_necessity('RESOURCE_TEST'),
+            {'heavy_command': {'cores': 3, 'memory': 10}}
+        )
+        self.assertDictEqual(
+            node_commands_manager.get_commands_syntax()['heavy_command'], {"rules": [{"type": "subsearch"}]}
+        )
+
+    def test_command_registry(self):
+        command_registry = node_commands_manager.get_command_registry()
+        self.assertSetEqual(set(command_registry.node_types), node_commands_manager.get_node_types())
+        self.assertSetEqual(
+            set(command_registry.get_command_name_set_for_node_type('SPARK')),
+            node_commands_manager.get_command_name_set_for_node_type('SPARK')
+        )
+
+        # snapshot is reused while commands are not updated
+        with self.assertNumQueries(0):
+            self.assertIs(node_commands_manager.get_command_registry(), command_registry)
+
+        node_guid = uuid.uuid4().hex
+        node_commands_manager.register_node('REGISTRY_TEST', node_guid, 'local')
+        node_commands_manager.register_node_commands(
+            node_guid,
+            {
+                "registry_command": {"rules": [{"type": "subsearch"}], "use_timewindow": True},
+            }
+        )
+        new_command_registry = node_commands_manager.get_command_registry()
+        self.assertIsNot(new_command_registry, command_registry)
+        self.assertIn('REGISTRY_TEST', new_command_registry.node_types)
+        self.assertIn('registry_command', new_command_registry.get_command_name_set_for_node_type('REGISTRY_TEST'))
+        self.assertTrue(new_command_registry.get_command_attributes('registry_command')['use_timewindow'])
+        self.assertDictEqual(
+            new_command_registry.get_command_attributes('sys_unknown'), {'use_timewindow': False, 'idempotent': True}
+        )
@@ -1,10 +1,44 @@
 import datetime
 
+from unittest import skipUnless
+from unittest.mock import patch
 from uuid import uuid4
+from types import SimpleNamespace
+from django.db import connection
+from django.utils import timezone
+from redis import RedisError
 from rest.test import TestCase
-from otl_interpreter.interpreter_db.models import NodeJobResult
-from otl_interpreter.interpreter_db.enums import ResultStorage, ResultStatus
-from otl_interpreter.interpreter_db import node_job_manager
+from otl_interpreter.interpreter_db.models import NodeJobResult, NodeJob, OtlJob
+from otl_interpreter.interpreter_db.enums import ResultStorage, ResultStatus, NodeJobStatus, JobStatus
+from otl_interpreter.interpreter_db import node_job_manager, otl_job_manager
+from otl_interpreter.job_planner.abstract_tree import AbstractTree
+
+
+class JobTree(AbstractTree):
+    """
+    Job planer NodeJobTree without command trees
+    """
+    def __init__(self, path, parent=None, cache_ttl=None):
+        self.uuid = uuid4()
+        self.computing_node_type = 'SPARK'
+        self.cache_ttl = cache_ttl
+        self.result_address = SimpleNamespace(storage_type=ResultStorage.INTERPROCESSING, path=path)
+        self.result_calculated = False
+        self._parent = parent
+        self._children = []
+        if parent is not None:
+            parent._children.append(self)
+
+    @property
+    def children(self):
+        return self._children
+
+    @property
+    def parent(self):
+        return self._parent
+
+    def as_command_dict_list(self):
+        return []
 
 
 class TestNodeJobManager(TestCase):
@@ -32,3 +66,367 @@ class TestNodeJobManager(TestCase):
 
         for storage, path in l:
             self.assertEqual(l[0][0], ResultStorage.INTERPROCESSING)
+
+    def test_expire_results(self):
+        last_touched_timestamp = datetime.datetime.now() - datetime.timedelta(seconds=61)
+        old_result = NodeJobResult(
+            storage=ResultStorage.INTERPROCESSING,
+            path=uuid4(),
+            status=ResultStatus.CALCULATED,
+            last_touched_timestamp=last_touched_timestamp
+        )
+        old_result.save()
+        self.addCleanup(
+            node_job_manager.result_registry.delete, [(ResultStorage.INTERPROCESSING, str(old_result.path))]
+        )
+
+        expired_results = node_job_manager.expire_results()
+        self.assertListEqual(
+            expired_results,
+            [(ResultStorage.INTERPROCESSING, str(old_result.path), last_touched_timestamp + old_result.ttl)]
+        )
+        old_result.refresh_from_db()
+        self.assertEqual(old_result.status, ResultStatus.NOT_EXIST)
+
+        # result is expired once
+        self.assertListEqual(node_job_manager.expire_results(), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'UPDATE ... RETURNING query is used on PostgreSQL')
+    def test_expire_results_returning(self):
+        now = datetime.datetime.now()
+        results = {
+            name: NodeJobResult(
+                storage=ResultStorage.INTERPROCESSING, path=uuid4(), status=status,
+                ttl=datetime.timedelta(seconds=ttl_seconds),
+                last_touched_timestamp=now - datetime.timedelta(seconds=touched_seconds_ago)
+            )
+            for name, status, ttl_seconds, touched_seconds_ago in (
+                ('expired', ResultStatus.CALCULATED, 120, 121),
+                ('fresh', ResultStatus.CALCULATED, 120, 119),
+                ('not_calculated', ResultStatus.CALCULATING, 120, 121),
+            )
+        }
+        for result in results.values():
+            result.save()
+            result.refresh_from_db()
+
+        expired = results['expired']
+        self.assertListEqual(
+            node_job_manager._expire_results_returning(now),
+            [(ResultStorage.INTERPROCESSING, str(expired.path), expired.last_touched_timestamp + expired.ttl)]
+        )
+        for name, status in (
+            ('expired', ResultStatus.NOT_EXIST),
+            ('fresh', ResultStatus.CALCULATED),
+            ('not_calculated', ResultStatus.CALCULATING),
+        ):
+            results[name].refresh_from_db()
+            self.assertEqual(results[name].status, status)
+
+        # result is expired once
+        self.assertListEqual(node_job_manager._expire_results_returning(now), [])
+
+    def test_batch_status_changes(self):
+        otl_job = OtlJob(
+            query='| otstats index=test', user_guid=uuid4(), tws=datetime.datetime.now(), twf=datetime.datetime.now()
+        )
+        otl_job.save()
+        node_jobs = [
+            NodeJob(otl_job=otl_job, computing_node_type='SPARK', commands=[], status=NodeJobStatus.IN_QUEUE)
+            for i in range(5)
+        ]
+        for node_job in node_jobs:
+            node_job.save()
+
+        # status of last node job was changed by someone else
+        NodeJob.objects.filter(uuid=node_jobs[-1].uuid).update(status=NodeJobStatus.TAKEN_FROM_QUEUE)
+
+        with node_job_manager.batch_status_changes() as failed_status_changes:
+            for node_job in node_jobs:
+                node_job_manager.change_node_job_status(
+                    node_job.uuid, NodeJobStatus.CANCELED, 'Canceled', NodeJobStatus.IN_QUEUE
+                )
+            # nothing is written inside batch
+            self.assertEqual(NodeJob.objects.filter(status=NodeJobStatus.CANCELED).count(), 0)
+
+        self.assertEqual(NodeJob.objects.filter(status=NodeJobStatus.CANCELED).count(), 4)
+        self.assertEqual(len(failed_status_changes), 1)
+        self.assertEqual(failed_status_changes[0][0], node_jobs[-1].uuid)
+
+    def test_batch_status_change_made_by_someone_else(self):
+        otl_job = OtlJob(
+            query='| otstats index=test', user_guid=uuid4(), tws=datetime.datetime.now(), twf=datetime.datetime.now()
+        )
+        otl_job.save()
+        node_jobs = [
+            NodeJob(otl_job=otl_job, computing_node_type='SPARK', commands=[], status=NodeJobStatus.RUNNING)
+            for i in range(2)
+        ]
+        for node_job in node_jobs:
+            node_job.save()
+
+        # the same status change of last node job was already written by other dispatcher
+        NodeJob.objects.filter(uuid=node_jobs[-1].uuid).update(
+            status=NodeJobStatus.FINISHED, modified_time=timezone.now() - datetime.timedelta(seconds=1)
+        )
+
+        with node_job_manager.batch_status_changes() as failed_status_changes:
+            for node_job in node_jobs:
+                node_job_manager.change_node_job_status(
+                    node_job.uuid, NodeJobStatus.FINISHED, 'Finished', NodeJobStatus.RUNNING
+                )
+
+        self.assertEqual(NodeJob.objects.filter(status=NodeJobStatus.FINISHED).count(), 2)
+        # status change wasn't made by this flush, so status actions are not repeated
+        self.assertEqual(len(failed_status_changes), 1)
+        self.assertEqual(failed_status_changes[0][0], node_jobs[-1].uuid)
+
+    def test_batch_flushed_before_read(self):
+        otl_job = OtlJob(
+            query='| otstats index=test', user_guid=uuid4(), tws=datetime.datetime.now(), twf=datetime.datetime.now()
+        )
+        otl_job.save()
+        node_job = NodeJob(otl_job=otl_job, computing_node_type='SPARK', commands=[], status=NodeJobStatus.RUNNING)
+        node_job.save()
+
+        with node_job_manager.batch_status_changes():
+            node_job_manager.change_node_job_status(node_job.uuid, NodeJobStatus.FINISHED, 'Finished')
+            self.assertEqual(node_job_manager.get_node_job_status(node_job.uuid), NodeJobStatus.FINISHED)
+
+    def test_not_batched_status_change(self):
+        otl_job = OtlJob(
+            query='| otstats index=test', user_guid=uuid4(), tws=datetime.datetime.now(), twf=datetime.datetime.now()
+        )
+        otl_job.save()
+        node_jobs = [
+            NodeJob(otl_job=otl_job, computing_node_type='SPARK', commands=[], status=NodeJobStatus.RUNNING)
+            for i in range(2)
+        ]
+        for node_job in node_jobs:
+            node_job.save()
+
+        with node_job_manager.batch_status_changes():
+            node_job_manager.change_node_job_status(
+                node_jobs[0].uuid, NodeJobStatus.FINISHED, 'Finished', NodeJobStatus.RUNNING
+            )
+            # status is written immediately and real result is returned
+            self.assertFalse(node_job_manager.change_node_job_status(
+                node_jobs[1].uuid, NodeJobStatus.CANCELED, 'Canceled', NodeJobStatus.IN_QUEUE, batched=False
+            ))
+            self.assertTrue(node_job_manager.change_node_job_status(
+                node_jobs[1].uuid, NodeJobStatus.CANCELED, 'Canceled', NodeJobStatus.RUNNING, batched=False
+            ))
+            # batched status changes are written before
+            self.assertEqual(NodeJob.objects.get(uuid=node_jobs[0].uuid).status, NodeJobStatus.FINISHED)
+            self.assertEqual(NodeJob.objects.get(uuid=node_jobs[1].uuid).status, NodeJobStatus.CANCELED)
+
+    def test_create_node_jobs(self):
+        otl_job = OtlJob(
+            query='| otstats index=test', user_guid=uuid4(), tws=datetime.datetime.now(), twf=datetime.datetime.now()
+        )
+        otl_job.save()
+        calculated_result = NodeJobResult(
+            storage=ResultStorage.INTERPROCESSING, path='calculated', status=ResultStatus.CALCULATED,
+            ttl=datetime.timedelta(seconds=600)
+        )
+        calculated_result.save()
+
+        root = JobTree('root')
+        first_child = JobTree('first_child', root)
+        grandchildren = [JobTree('same_result', first_child), JobTree('calculated', first_child, cache_ttl=100)]
+        second_child = JobTree('same_result', root)
+
+        node_job_manager.create_node_jobs(root, otl_job.uuid, 60, 120)
+
+        self.assertEqual(NodeJob.objects.filter(otl_job=otl_job).count(), 5)
+        self.assertEqual(otl_job_manager.get_progress(otl_job.uuid)['total_node_jobs'], 5)
+        self.assertEqual(NodeJobResult.objects.count(), 4)
+        self.assertTrue(grandchildren[1].result_calculated)
+        self.assertFalse(grandchildren[0].result_calculated)
+
+        # new otl job doesn't reduce ttl of existing result
+        calculated_result.refresh_from_db()
+        self.assertEqual(calculated_result.ttl, datetime.timedelta(seconds=600))
+        self.assertIsNotNone(calculated_result.last_touched_timestamp)
+
+        root_node_job = NodeJob.objects.get(uuid=root.uuid)
+        self.assertIsNone(root_node_job.next_job)
+        self.assertEqual(root_node_job.get_descendant_count(), 4)
+        self.assertEqual(
+            NodeJob.objects.get(uuid=grandchildren[0].uuid).result,
+            NodeJob.objects.get(uuid=second_child.uuid).result,
+        )
+        self.assertListEqual(
+            [node_job.uuid for node_job in NodeJob.objects.get(uuid=grandchildren[1].uuid).get_ancestors()],
+            [root.uuid, first_child.uuid]
+        )
+
+        # tree fields are the same as mptt calculates
+        tree_fields = list(NodeJob.objects.order_by('id').values_list('lft', 'rght', 'level', 'tree_id'))
+        NodeJob.objects.partial_rebuild(root_node_job.tree_id)
+        self.assertListEqual(
+            tree_fields, list(NodeJob.objects.order_by('id').values_list('lft', 'rght', 'level', 'tree_id'))
+        )
+
+    def test_node_job_counters(self):
+        otl_job = OtlJob(
+            query='| otstats index=test', user_guid=uuid4(), tws=datetime.datetime.now(), twf=datetime.datetime.now()
+        )
+        otl_job.save()
+        node_jobs = [
+            NodeJob(
+                otl_job=otl_job, computing_node_type='SPARK', commands=[],
+                status=NodeJobStatus.SENT_TO_COMPUTING_NODE
+            )
+            for i in range(4)
+        ]
+        for node_job in node_jobs:
+            node_job.save()
+
+        for node_job in node_jobs:
+            node_job_manager.change_node_job_status(
+                node_job.uuid, NodeJobStatus.RUNNING, 'Running', NodeJobStatus.SENT_TO_COMPUTING_NODE
+            )
+        node_job_manager.change_node_job_status(
+            node_jobs[0].uuid, NodeJobStatus.FINISHED, 'Finished', NodeJobStatus.RUNNING
+        )
+        # status wasn't changed, counters stay the same
+        node_job_manager.change_node_job_status(
+            node_jobs[0].uuid, NodeJobStatus.FAILED, 'Failed', NodeJobStatus.RUNNING
+        )
+
+        with node_job_manager.batch_status_changes():
+            for node_job in node_jobs[1:]:
+                node_job_manager.change_node_job_status(
+                    node_job.uuid, NodeJobStatus.FAILED, 'Failed', NodeJobStatus.RUNNING
+                )
+
+        self.assertDictEqual(
+            otl_job_manager.get_progress(otl_job.uuid),
+            {'total_node_jobs': 0, 'running_node_jobs': 0, 'finished_node_jobs': 1, 'failed_node_jobs': 3}
+        )
+
+        otl_job_manager.change_otl_job_status(otl_job.uuid, JobStatus.FAILED)
+        status, status_text = otl_job_manager.check_job(otl_job.uuid)
+        self.assertEqual(status_text.count(': Failed'), 3)
+
+    def test_otl_job_node_jobs_for_cancelling(self):
+        otl_job, other_otl_job = [
+            OtlJob(
+                query='| otstats index=test', user_guid=uuid4(),
+                tws=datetime.datetime.now(), twf=datetime.datetime.now()
+            )
+            for i in range(2)
+        ]
+        otl_job.save()
+        other_otl_job.save()
+        awaited_result = NodeJobResult(storage=ResultStorage.INTERPROCESSING, path='awaited')
+        awaited_result.save()
+        not_awaited_result = NodeJobResult(storage=ResultStorage.INTERPROCESSING, path='not_awaited')
+        not_awaited_result.save()
+
+        statuses = [NodeJobStatus.RUNNING, NodeJobStatus.IN_QUEUE, NodeJobStatus.FINISHED, NodeJobStatus.RUNNING]
+        results = [awaited_result, not_awaited_result, not_awaited_result, not_awaited_result]
+        node_jobs = [
+            NodeJob(otl_job=otl_job, computing_node_type='SPARK', commands=[], status=status, result=result)
+            for status, result in zip(statuses, results)
+        ]
+        for node_job in node_jobs:
+            node_job.save()
+        NodeJob(
+            otl_job=other_otl_job, computing_node_type='SPARK', commands=[],
+            status=NodeJobStatus.WAITING_SAME_RESULT, result=awaited_result
+        ).save()
+
+        with self.assertNumQueries(1):
+            cancelling_node_jobs = node_job_manager.get_otl_job_node_jobs_for_cancelling(otl_job.uuid)
+
+        result_is_awaited = {
+            node_job_dict['uuid']: awaited for node_job_dict, computing_node_uuid, awaited in cancelling_node_jobs
+        }
+        # finished node job isn't cancelled, waiting node job of other otl job keeps its result
+        self.assertDictEqual(
+            result_is_awaited,
+            {node_jobs[0].uuid.hex: True, node_jobs[1].uuid.hex: False, node_jobs[3].uuid.hex: False}
+        )
+
+    def test_result_status_touch(self):
+        path = uuid4().hex
+        recently_touched = datetime.datetime.now() - datetime.timedelta(seconds=1)
+        result = NodeJobResult(
+            storage=ResultStorage.INTERPROCESSING, path=path, status=ResultStatus.CALCULATED,
+            last_touched_timestamp=recently_touched
+        )
+        result.save()
+        self.addCleanup(node_job_manager.result_registry.delete, [(ResultStorage.INTERPROCESSING, path)])
+
+        # reading status of recently touched result doesn't write it
+        with self.assertNumQueries(1):
+            status = node_job_manager.get_result_status(ResultStorage.INTERPROCESSING, path)
+        self.assertEqual(status, ResultStatus.CALCULATED)
+        result.refresh_from_db()
+        self.assertEqual(result.last_touched_timestamp, recently_touched)
+
+        # result changed bypassing result registry
+        NodeJobResult.objects.filter(pk=result.pk).update(
+            last_touched_timestamp=recently_touched - node_job_manager.result_touch_interval
+        )
+        node_job_manager.result_registry.delete([(ResultStorage.INTERPROCESSING, path)])
+        self.assertEqual(
+            node_job_manager.get_result_status(ResultStorage.INTERPROCESSING, path), ResultStatus.CALCULATED
+        )
+        result.refresh_from_db()
+        self.assertGreater(result.last_touched_timestamp, recently_touched)
+
+        self.assertEqual(
+            node_job_manager.get_result_status(ResultStorage.INTERPROCESSING, 'not_exist'), ResultStatus.NOT_EXIST
+        )
+
+    def test_result_registry(self):
+        result_registry = node_job_manager.result_registry
+        path = uuid4().hex
+        result = NodeJobResult(
+            storage=ResultStorage.INTERPROCESSING, path=path, status=ResultStatus.NOT_EXIST,
+            ttl=datetime.timedelta(seconds=600), last_touched_timestamp=datetime.datetime.now()
+        )
+        result.save()
+        self.addCleanup(result_registry.delete, [(ResultStorage.INTERPROCESSING, path)])
+
+        node_job_manager.set_result_status(ResultStorage.INTERPROCESSING, path, ResultStatus.CALCULATED)
+        self.assertEqual(
+            result_registry.get(ResultStorage.INTERPROCESSING, path)['status'], ResultStatus.CALCULATED
+        )
+        # recently touched result status is read from registry
+        with self.assertNumQueries(0):
+            status = node_job_manager.get_result_status(ResultStorage.INTERPROCESSING, path)
+        self.assertEqual(status, ResultStatus.CALCULATED)
+
+        # status read from database doesn't overwrite written status and doesn't prolong entry
+        result_key = result_registry._key(ResultStorage.INTERPROCESSING, path)
+        result_registry.redis.expire(result_key, 10)
+        result_registry.write(
+            {(ResultStorage.INTERPROCESSING, path): {'status': ResultStatus.CALCULATING}}, overwrite=False
+        )
+        self.assertEqual(
+            result_registry.get(ResultStorage.INTERPROCESSING, path)['status'], ResultStatus.CALCULATED
+        )
+        self.assertLessEqual(result_registry.redis.ttl(result_key), 10)
+
+        # result changed in database bypassing registry is removed from registry by reconciliation
+        NodeJobResult.objects.filter(pk=result.pk).update(status=ResultStatus.NOT_EXIST)
+        checked_results, removed_results = node_job_manager.reconcile_result_registry()
+        self.assertEqual(removed_results, 1)
+        self.assertIsNone(result_registry.get(ResultStorage.INTERPROCESSING, path))
+        self.assertEqual(
+            node_job_manager.get_result_status(ResultStorage.INTERPROCESSING, path), ResultStatus.NOT_EXIST
+        )
+        self.assertEqual(
+            result_registry.get(ResultStorage.INTERPROCESSING, path)['status'], ResultStatus.NOT_EXIST
+        )
+        # entry created from database gets expiry
+        self.assertGreater(result_registry.redis.ttl(result_key), 10)
+
+        # entry with old status is removed when new status wasn't written
+        with patch.object(type(result_registry.redis.pipeline()), 'execute', side_effect=RedisError('Lost')):
+            result_registry.write({(ResultStorage.INTERPROCESSING, path): {'status': ResultStatus.CALCULATED}})
+        self.assertIsNone(result_registry.get(ResultStorage.INTERPROCESSING, path))
@@ -61,3 +61,21 @@ class TestSimpleParsing(TestCase):
         test_otl = '| pp_command1 | pp_command1 1'
         with self.assertRaises(SyntaxError):
             parsed_otl = self.translate_otl(test_otl)
+
+    def test_translation_cache(self):
+        otl_query = "| readfile arg1, arg2, arg3"
+        parsed_otl = self.translate_otl(otl_query)
+        # commands are changed by planner, so every call gets its own copy
+        parsed_otl[0].arguments.clear()
+
+        cached_parsed_otl = self.translate_otl(otl_query)
+        self.assertIsNot(cached_parsed_otl, parsed_otl)
+        self.assertEqual(len(cached_parsed_otl[0].arguments), 3)
+
+        # queries different only in whitespace are cached separately and don't replace each other
+        other_otl_query = "|  readfile arg1, arg2, arg3"
+        self.assertEqual(len(self.translate_otl(other_otl_query)[0].arguments), 3)
+        hits = self.translate_otl.translation_cache.hits
+        self.translate_otl(otl_query)
+        self.translate_otl(other_otl_query)
+        self.assertEqual(self.translate_otl.translation_cache.hits, hits + 2)
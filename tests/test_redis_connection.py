@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from core.settings.test import REDIS_CONFIG
+from otl_interpreter.utils.redis_connection import get_redis, connection_pools_stats
+
+
+class TestRedisConnection(TestCase):
+    def test_clients_share_connection_pool(self):
+        redis1 = get_redis(REDIS_CONFIG)
+        redis2 = get_redis(REDIS_CONFIG)
+        self.assertIs(redis1.connection_pool, redis2.connection_pool)
+        self.assertIsNot(get_redis().connection_pool, redis1.connection_pool)
+
+    def test_connection_pool_stats(self):
+        redis = get_redis(REDIS_CONFIG)
+        redis.set('test_redis_connection', 1)
+        pipeline = redis.pipeline()
+        pipeline.get('test_redis_connection')
+        pipeline.delete('test_redis_connection')
+        self.assertListEqual(pipeline.execute(), [b'1', 1])
+
+        pool_stats = redis.connection_pool.stats()
+        self.assertEqual(pool_stats['in_use_connections'], 0)
+        self.assertGreaterEqual(pool_stats['peak_in_use_connections'], 1)
+        self.assertIn(pool_stats, connection_pools_stats())